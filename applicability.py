@@ -0,0 +1,140 @@
+from constants import *
+from attack_records import TechniqueRecord
+
+# The applicability of data sources is compiled into integer bitmasks: every ATT&CK data component and DeTT&CT data
+# source has its own bit. The count of applicable data sources of a technique for a platform then is the popcount of
+# (technique mask & platform mask).
+
+# { ATT&CK data component name: bit }
+_attack_data_source_bits = {}
+# { DeTT&CT data source name: bit }
+_dettect_data_source_bits = {}
+# { data source name: mask } with the bit of the ATT&CK data component and the bit of the DeTT&CT data source
+_name_masks = {}
+# { domain: { platform: mask } }
+_platform_masks = {}
+
+
+def _get_bit(bits, name):
+    """
+    Get the bit of a data source, and assign a new bit when the data source does not yet have one.
+    :param bits: '_attack_data_source_bits' or '_dettect_data_source_bits'
+    :param name: name of the data source
+    :return: the bit
+    """
+    if name not in bits:
+        bits[name] = 1 << (len(_attack_data_source_bits) + len(_dettect_data_source_bits))
+        _name_masks[name] = _name_masks.get(name, 0) | bits[name]
+    return bits[name]
+
+
+def _compile():
+    """
+    Compile the data sources per platform (DATA_SOURCES_XX and DETTECT_DATA_SOURCES_PLATFORMS_XX) into bitmasks.
+    :return:
+    """
+    for domain, data_sources, dettect_data_sources in [
+            ('enterprise-attack', DATA_SOURCES_ENTERPRISE, DETTECT_DATA_SOURCES_PLATFORMS_ENTERPRISE),
+            ('ics-attack', DATA_SOURCES_ICS, DETTECT_DATA_SOURCES_PLATFORMS_ICS),
+            ('mobile-attack', DATA_SOURCES_MOBILE, DETTECT_DATA_SOURCES_PLATFORMS_MOBILE)]:
+        masks = {}
+        for bits, platforms in [(_attack_data_source_bits, data_sources), (_dettect_data_source_bits, dettect_data_sources)]:
+            for platform, names in platforms.items():
+                masks[platform] = masks.get(platform, 0)
+                for name in names:
+                    masks[platform] |= _get_bit(bits, name)
+        _platform_masks[domain] = masks
+
+
+def get_platform_mask(platforms, domain):
+    """
+    Get the mask of the ATT&CK data components and DeTT&CT data sources applicable to the provided platform(s).
+    :param platforms: the ATT&CK platform(s)
+    :param domain: the specified domain
+    :return: the mask
+    """
+    if not _platform_masks:
+        _compile()
+
+    masks = _platform_masks[domain]
+    mask = 0
+    for p in platforms:
+        mask |= masks[p]
+    return mask
+
+
+def get_availability_mask(names):
+    """
+    Get the mask of the provided (available) data sources.
+    :param names: ATT&CK data component and/or DeTT&CT data source names
+    :return: the mask
+    """
+    if not _platform_masks:
+        _compile()
+
+    mask = 0
+    for name in names:
+        mask |= _name_masks.get(name, 0)
+    return mask
+
+
+def get_data_source_names(mask):
+    """
+    Get the names of the ATT&CK data components and DeTT&CT data sources having a bit within the provided mask.
+    :param mask: the mask
+    :return: list of data source names
+    """
+    if not _platform_masks:
+        _compile()
+
+    return [name for name, name_mask in _name_masks.items() if name_mask & mask]
+
+
+def _get_technique_data_source_bits(technique):
+    """
+    Get the ATT&CK data components and DeTT&CT data sources of a technique together with their bit. Data sources not
+    applicable to any platform have no bit (0).
+    :param technique: ATT&CK CTI technique object
+    :return: tuple with two lists of (name, bit): the ATT&CK data components and the DeTT&CT data sources
+    """
+    if not _platform_masks:
+        _compile()
+
+    attack_data_sources = []
+    for ds in technique['x_mitre_data_sources']:
+        ds = ds.split(':')[1][1:]
+        attack_data_sources.append((ds, _attack_data_source_bits.get(ds, 0)))
+    dettect_data_sources = [(ds, _dettect_data_source_bits.get(ds, 0)) for ds in technique['dettect_data_sources']]
+    return attack_data_sources, dettect_data_sources
+
+
+def get_technique_mask(technique):
+    """
+    Get the mask of the ATT&CK data components and DeTT&CT data sources of a technique. The mask is stored within
+    technique records, so it is determined only once per technique.
+    :param technique: ATT&CK CTI technique object
+    :return: the mask
+    """
+    if isinstance(technique, TechniqueRecord) and technique.component_mask is not None:
+        return technique.component_mask
+
+    mask = 0
+    for data_sources in _get_technique_data_source_bits(technique):
+        for _, bit in data_sources:
+            mask |= bit
+
+    if isinstance(technique, TechniqueRecord):
+        technique.component_mask = mask
+    return mask
+
+
+def get_technique_data_sources(technique, mask):
+    """
+    Get the names of the technique's ATT&CK data components and DeTT&CT data sources within the provided mask, in the
+    order as listed by the technique.
+    :param technique: ATT&CK CTI technique object
+    :param mask: mask of the data sources to return (e.g. the applicable and available data sources)
+    :return: tuple with two lists: the ATT&CK data components and the DeTT&CT data sources
+    """
+    attack_data_sources, dettect_data_sources = _get_technique_data_source_bits(technique)
+    return [ds for ds, bit in attack_data_sources if bit & mask], [ds for ds, bit in dettect_data_sources if bit & mask]
@@ -0,0 +1,233 @@
+import os
+import pickle
+import simplejson
+import generic
+from constants import *
+from generic import get_attack_id, load_yaml_file
+
+# the ATT&CK data a snapshot consists of
+SNAPSHOT_DATA_TYPES = [DATA_TYPE_STIX_ALL_TECH, DATA_TYPE_STIX_ALL_GROUPS, DATA_TYPE_STIX_ALL_SOFTWARE,
+                       DATA_TYPE_STIX_ALL_RELATIONSHIPS]
+
+# per object type the fields that are compared: {field shown in the diff: function to get the value from the object}
+DIFF_FIELDS = {
+    'techniques': {'name': lambda o: o['name'],
+                   'tactics': lambda o: sorted(p['phase_name'] for p in o.get('kill_chain_phases', [])),
+                   'platforms': lambda o: sorted(o.get('x_mitre_platforms', [])),
+                   'data sources': lambda o: sorted(o.get('x_mitre_data_sources', [])) + sorted(o.get('dettect_data_sources', [])),
+                   'description': lambda o: o.get('description', ''),
+                   'detection': lambda o: o.get('x_mitre_detection', ''),
+                   'deprecated': lambda o: o.get('x_mitre_deprecated', False)},
+    'groups': {'name': lambda o: o['name'],
+               'aliases': lambda o: sorted(o.get('aliases', [])),
+               'description': lambda o: o.get('description', '')},
+    'software': {'name': lambda o: o['name'],
+                 'type': lambda o: o['type'],
+                 'platforms': lambda o: sorted(o.get('x_mitre_platforms', [])),
+                 'description': lambda o: o.get('description', '')}}
+
+
+def _load_snapshot(path):
+    """
+    Load the ATT&CK data of a snapshot: a cache directory of DeTT&CT, or a local STIX repository.
+    :param path: path to the cache directory or the local STIX repository
+    :return: dictionary {data type: ATT&CK data}
+    """
+    if os.path.isdir(os.path.join(path, 'enterprise-attack')):
+        local_stix_path = generic.local_stix_path
+        generic.local_stix_path = path
+        try:
+            return {data_type: generic._load_attack_data(data_type) for data_type in SNAPSHOT_DATA_TYPES}
+        finally:
+            generic.local_stix_path = local_stix_path
+
+    snapshot = {}
+    for data_type in SNAPSHOT_DATA_TYPES:
+        filename = os.path.join(path, data_type)
+        if not os.path.isfile(filename):
+            print('[!] Not a valid cache directory or local STIX path: ' + path + ' (missing \'' + data_type + '\')')
+            quit()
+        with open(filename, 'rb') as f:
+            # the first item in the list contains the ATT&CK data. The expiry time does not apply to snapshots.
+            snapshot[data_type] = pickle.load(f)[0]
+    return snapshot
+
+
+def _index_snapshot(snapshot):
+    """
+    Index the ATT&CK data of a snapshot on ATT&CK ID.
+    :param snapshot: dictionary {data type: ATT&CK data} (see '_load_snapshot')
+    :return: dictionary with per object type {ATT&CK ID: object}, the data components {name: {technique ID, ...}}, the
+    relationships {'groups': {(group ID, technique ID), ...}, 'software': {...}} and the revoked objects
+    {STIX ID: ATT&CK ID of the revoking object}
+    """
+    index = {'techniques': {}, 'groups': {}, 'software': {}}
+    stix_ids = {}
+    for object_type, data_type in [('techniques', DATA_TYPE_STIX_ALL_TECH), ('groups', DATA_TYPE_STIX_ALL_GROUPS),
+                                   ('software', DATA_TYPE_STIX_ALL_SOFTWARE)]:
+        for o in snapshot[data_type]:
+            attack_id = get_attack_id(o)
+            if attack_id is not None:
+                index[object_type][attack_id] = o
+                stix_ids[o['id']] = attack_id
+
+    index['data_components'] = {}
+    for tech_id, t in index['techniques'].items():
+        for ds in list(t.get('x_mitre_data_sources', [])) + list(t.get('dettect_data_sources', [])):
+            ds = ds.split(':')[1][1:].lstrip().rstrip() if ':' in ds else ds
+            index['data_components'].setdefault(ds, set()).add(tech_id)
+
+    index['relationships'] = {'groups': set(), 'software': set()}
+    index['revoked'] = {}
+    for r in snapshot[DATA_TYPE_STIX_ALL_RELATIONSHIPS]:
+        if r['relationship_type'] == 'uses' and r['target_ref'].startswith('attack-pattern--') and \
+                r['source_ref'] in stix_ids and r['target_ref'] in stix_ids:
+            object_type = 'groups' if r['source_ref'].startswith('intrusion-set--') else 'software'
+            index['relationships'][object_type].add((stix_ids[r['source_ref']], stix_ids[r['target_ref']]))
+        elif r['relationship_type'] == 'revoked-by':
+            index['revoked'][r['source_ref']] = stix_ids.get(r['target_ref'], r['target_ref'])
+    return index
+
+
+def _get_digests(objects, fields):
+    """
+    Get the digest of the compared fields per object.
+    :param objects: dictionary {ATT&CK ID: object}
+    :param fields: the fields to compare (see DIFF_FIELDS)
+    :return: set of (ATT&CK ID, digest)
+    """
+    return set((attack_id, hash(repr([get_value(o) for get_value in fields.values()])))
+               for attack_id, o in objects.items())
+
+
+def _diff_objects(old_objects, new_objects, new_revoked, fields):
+    """
+    Compare the objects of one type between two snapshots.
+    :param old_objects: dictionary {ATT&CK ID: object} of the old snapshot
+    :param new_objects: dictionary {ATT&CK ID: object} of the new snapshot
+    :param new_revoked: the revoked objects of the new snapshot {STIX ID: ATT&CK ID of the revoking object}
+    :param fields: the fields to compare (see DIFF_FIELDS)
+    :return: dictionary with the 'added', 'removed', 'revoked' and 'modified' objects
+    """
+    old_ids, new_ids = set(old_objects.keys()), set(new_objects.keys())
+    changed_ids = set(i for i, _ in _get_digests(old_objects, fields) - _get_digests(new_objects, fields)) & new_ids
+
+    diff = {'added': [{'id': i, 'name': new_objects[i]['name']} for i in sorted(new_ids - old_ids)],
+            'removed': [], 'revoked': [], 'modified': []}
+    for i in sorted(old_ids - new_ids):
+        if old_objects[i]['id'] in new_revoked:
+            diff['revoked'].append({'id': i, 'name': old_objects[i]['name'], 'revoked_by': new_revoked[old_objects[i]['id']]})
+        else:
+            diff['removed'].append({'id': i, 'name': old_objects[i]['name']})
+    for i in sorted(changed_ids):
+        diff['modified'].append({'id': i, 'name': new_objects[i]['name'],
+                                 'fields': [f for f, get_value in fields.items()
+                                            if get_value(old_objects[i]) != get_value(new_objects[i])]})
+    return diff
+
+
+def get_attack_diff(old_path, new_path):
+    """
+    Compare two ATT&CK snapshots: the added, removed, revoked and modified techniques, groups and software, the added,
+    removed and modified data components (i.e. used by other techniques) and the added and removed group-to-technique
+    and software-to-technique relationships.
+    :param old_path: path to the cache directory or local STIX repository of the old snapshot
+    :param new_path: path to the cache directory or local STIX repository of the new snapshot
+    :return: dictionary with the changes
+    """
+    old, new = _index_snapshot(_load_snapshot(old_path)), _index_snapshot(_load_snapshot(new_path))
+
+    diff = {}
+    for object_type, fields in DIFF_FIELDS.items():
+        diff[object_type] = _diff_objects(old[object_type], new[object_type], new['revoked'], fields)
+
+    old_ds, new_ds = old['data_components'], new['data_components']
+    diff['data_components'] = {
+        'added': [{'name': ds, 'techniques': sorted(new_ds[ds])} for ds in sorted(new_ds.keys() - old_ds.keys())],
+        'removed': [{'name': ds, 'techniques': sorted(old_ds[ds])} for ds in sorted(old_ds.keys() - new_ds.keys())],
+        'modified': [{'name': ds, 'added_techniques': sorted(new_ds[ds] - old_ds[ds]),
+                      'removed_techniques': sorted(old_ds[ds] - new_ds[ds])}
+                     for ds in sorted(old_ds.keys() & new_ds.keys()) if old_ds[ds] != new_ds[ds]]}
+
+    for object_type, key in [('groups', 'group_techniques'), ('software', 'software_techniques')]:
+        old_relationships, new_relationships = old['relationships'][object_type], new['relationships'][object_type]
+        diff[key] = {'added': [list(r) for r in sorted(new_relationships - old_relationships)],
+                     'removed': [list(r) for r in sorted(old_relationships - new_relationships)]}
+    return diff
+
+
+def _get_file_references(filename):
+    """
+    Get the ATT&CK objects referenced by an administration YAML file or a Navigator layer file.
+    :param filename: the YAML or layer (JSON) file
+    :return: dictionary with the referenced 'techniques', 'data_components', 'groups' and 'software' (sets), or None
+    when the file is not a DeTT&CT administration file or layer
+    """
+    references = {'techniques': set(), 'data_components': set(), 'groups': set(), 'software': set()}
+    if filename.endswith('.json'):
+        with open(filename, 'r') as f:
+            layer = simplejson.load(f)
+        if not isinstance(layer, dict) or 'techniques' not in layer:
+            return None
+        references['techniques'].update(t['techniqueID'] for t in layer['techniques'] if 'techniqueID' in t)
+        return references
+
+    yaml_content = load_yaml_file(filename)
+    if not isinstance(yaml_content, dict) or 'file_type' not in yaml_content:
+        return None
+    if yaml_content['file_type'] == FILE_TYPE_TECHNIQUE_ADMINISTRATION:
+        references['techniques'].update(t['technique_id'] for t in yaml_content['techniques'])
+    elif yaml_content['file_type'] == FILE_TYPE_DATA_SOURCE_ADMINISTRATION:
+        references['data_components'].update(ds['data_source_name'] for ds in yaml_content['data_sources'])
+    elif yaml_content['file_type'] == FILE_TYPE_GROUP_ADMINISTRATION:
+        for g in yaml_content['groups']:
+            references['techniques'].update(g.get('technique_id') or [])
+            references['software'].update(g.get('software_id') or [])
+    else:
+        return None
+    return references
+
+
+def get_affected_files(diff, paths):
+    """
+    Get the administration files and layers affected by the changes between two ATT&CK snapshots.
+    :param diff: the changes (see 'get_attack_diff')
+    :param paths: list of administration YAML files, layer files and/or directories containing these files
+    :return: dictionary {filename: list of changes affecting the file}
+    """
+    # {(kind, ATT&CK ID or data component name): [change, ...]}
+    changes = {}
+    for object_type, name in [('techniques', 'technique'), ('groups', 'group'), ('software', 'software')]:
+        for change_type in ['added', 'removed', 'revoked', 'modified']:
+            for o in diff[object_type][change_type]:
+                changes.setdefault((object_type, o['id']), []).append(change_type + ' ' + name + ' ' + o['id'])
+    for change_type in ['added', 'removed', 'modified']:
+        for ds in diff['data_components'][change_type]:
+            changes.setdefault(('data_components', ds['name']), []).append(change_type + ' data component ' + ds['name'])
+    for key, object_type, name in [('group_techniques', 'groups', 'group'), ('software_techniques', 'software', 'software')]:
+        for change_type in ['added', 'removed']:
+            for attack_id, tech_id in diff[key][change_type]:
+                change = change_type + ' ' + name + ' relationship ' + attack_id + ' -> ' + tech_id
+                changes.setdefault(('techniques', tech_id), []).append(change)
+                changes.setdefault((object_type, attack_id), []).append(change)
+
+    filenames = []
+    for path in paths:
+        if os.path.isdir(path):
+            filenames.extend(os.path.join(path, f) for f in sorted(os.listdir(path))
+                             if f.endswith(('.yaml', '.yml', '.json')) and os.path.isfile(os.path.join(path, f)))
+        else:
+            filenames.append(path)
+
+    affected = {}
+    for filename in dict.fromkeys(filenames):
+        references = _get_file_references(filename)
+        if references is None:
+            continue
+        file_changes = []
+        for kind, ids in references.items():
+            for i in sorted(ids):
+                file_changes.extend(changes.get((kind, i), []))
+        if file_changes:
+            affected[filename] = list(dict.fromkeys(file_changes))
+    return affected
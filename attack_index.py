@@ -0,0 +1,104 @@
+from constants import *
+
+# The indexes are derived from the ATT&CK data (see the DATA_TYPE_INDEX_XX constants) and are cached alongside it by
+# 'generic.load_attack_data', so the statistics of the generic mode do not need to go through all ATT&CK objects.
+
+
+def _get_data_source_platforms(domain):
+    """
+    Get per ATT&CK data component and DeTT&CT data source the ATT&CK platforms it applies to.
+    :param domain: the ATT&CK domain
+    :return: dictionary {data source: [platform, ...]}
+    """
+    attack_data_sources = DATA_SOURCES_ENTERPRISE if domain == 'enterprise-attack' else DATA_SOURCES_ICS if domain == 'ics-attack' else DATA_SOURCES_MOBILE
+    dettect_data_sources = DETTECT_DATA_SOURCES_PLATFORMS_ENTERPRISE if domain == 'enterprise-attack' else DETTECT_DATA_SOURCES_PLATFORMS_ICS if domain == 'ics-attack' else DETTECT_DATA_SOURCES_PLATFORMS_MOBILE
+
+    platforms = {}
+    for data_sources_platforms in [attack_data_sources, dettect_data_sources]:
+        for platform, data_sources in data_sources_platforms.items():
+            for ds in data_sources:
+                platforms.setdefault(ds, []).append(platform)
+    return platforms
+
+
+def get_data_source_index(techniques_per_domain):
+    """
+    Create the index from data source to the techniques in which the data source is used.
+    :param techniques_per_domain: dictionary {domain: list of ATT&CK techniques}
+    :return: dictionary per domain with: 'techniques' (list of [technique ID, platforms]), 'data_sources' (dictionary
+    {data source: list of [technique position, position of the data source within the technique]}, in the order of
+    first use) and 'platforms' (dictionary {data component / DeTT&CT data source: platforms})
+    """
+    index = {}
+    for domain, techniques in techniques_per_domain.items():
+        domain_techniques = []
+        data_sources = {}
+        for tech in techniques:
+            domain_techniques.append([tech['technique_id'], list(tech.get('x_mitre_platforms', []))])
+            all_data_sources = list(tech.get('x_mitre_data_sources', [])) + list(tech.get('dettect_data_sources', []))
+            for ds_pos, ds in enumerate(all_data_sources):
+                data_sources.setdefault(ds, []).append([len(domain_techniques) - 1, ds_pos])
+        index[domain] = {'techniques': domain_techniques, 'data_sources': data_sources,
+                         'platforms': _get_data_source_platforms(domain)}
+    return index
+
+
+def get_mitigation_index(mitigations_per_domain, relationships, techniques):
+    """
+    Create the index from mitigation to the techniques it mitigates.
+    :param mitigations_per_domain: dictionary {domain: list of ATT&CK mitigations}
+    :param relationships: all ATT&CK relationships
+    :param techniques: all ATT&CK techniques
+    :return: dictionary per domain {mitigation ID: {'name': ..., 'techniques': [technique ID, ...]}}, in the order of
+    the relationships
+    """
+    technique_ids = {t['id']: t['technique_id'] for t in techniques}
+    mitigations = {}
+    for domain, domain_mitigations in mitigations_per_domain.items():
+        for m in domain_mitigations:
+            if m['external_references'][0]['external_id'].startswith('M'):
+                mitigations[m['id']] = (domain, m['external_references'][0]['external_id'], m['name'])
+
+    index = {domain: {} for domain in mitigations_per_domain.keys()}
+    for r in relationships:
+        if r['relationship_type'] == 'mitigates' and r['source_ref'].startswith('course-of-action') and \
+                r['target_ref'].startswith('attack-pattern') and r['source_ref'] in mitigations:
+            domain, m_id, name = mitigations[r['source_ref']]
+            index[domain].setdefault(m_id, {'name': name, 'techniques': []})
+            index[domain][m_id]['techniques'].append(technique_ids.get(r['target_ref'], r['target_ref']))
+    return index
+
+
+def _get_date_index(objects):
+    """
+    Create the index of objects by their creation and modification date.
+    :param objects: list with dictionaries, each having a 'created' and 'modified' date
+    :return: dictionary with the 'objects', and per sort key ('created' and 'modified') the positions of the objects
+    in sorted order
+    """
+    return {'objects': objects,
+            'created': sorted(range(len(objects)), key=lambda i: objects[i]['created']),
+            'modified': sorted(range(len(objects)), key=lambda i: objects[i]['modified'])}
+
+
+def get_updates_index(techniques, groups, software):
+    """
+    Create the index of techniques, groups and software by their creation and modification date. Only the fields
+    shown by the generic mode are kept.
+    :param techniques: all ATT&CK techniques
+    :param groups: all ATT&CK groups
+    :param software: all ATT&CK software
+    :return: dictionary {'techniques': ..., 'groups': ..., 'software': ...} (see '_get_date_index')
+    """
+    from generic import get_attack_id, get_tactics
+
+    return {'techniques': _get_date_index([{'id': t['technique_id'], 'name': t['name'], 'created': t['created'],
+                                            'modified': t['modified'], 'domain': t.matrix[6:],
+                                            'tactics': get_tactics(t)} for t in techniques]),
+            'groups': _get_date_index([{'id': get_attack_id(g), 'name': g['name'], 'created': g['created'],
+                                        'modified': g['modified']} for g in groups]),
+            'software': _get_date_index([{'id': get_attack_id(s), 'name': s['name'], 'created': s['created'],
+                                          'modified': s['modified'],
+                                          'domain': s['external_references'][0]['source_name'][6:], 'type': s['type'],
+                                          'platforms': list(s['x_mitre_platforms']) if 'x_mitre_platforms' in s else None}
+                                         for s in software])}
@@ -0,0 +1,96 @@
+import sys
+
+# the keys of the technique dictionaries (see 'generic._convert_stix_techniques_to_dict') that are stored within a slot
+# of TechniqueRecord
+RECORD_KEYS = {'id': 'id', 'technique_id': 'technique_id', 'name': 'name', 'x_mitre_platforms': 'platforms',
+               'x_mitre_data_sources': 'data_sources', 'dettect_data_sources': 'dettect_data_sources',
+               'x_mitre_domains': 'domains', 'created': 'created', 'modified': 'modified'}
+
+
+class TechniqueRecord:
+    """
+    Compact, read-only ATT&CK technique. It holds the fields DeTT&CT works with and can be used as the technique
+    dictionary it replaces: all other keys (e.g. 'description') are read from the full STIX payload, which is loaded
+    on demand.
+    """
+    __slots__ = ('id', 'technique_id', 'name', 'tactics', 'platforms', 'data_sources', 'dettect_data_sources',
+                 'domains', 'matrix', 'created', 'modified', 'data_type', 'component_mask')
+
+    def __init__(self, technique, data_type, values):
+        """
+        Constructor of the TechniqueRecord class.
+        :param technique: technique dictionary (see 'generic._convert_stix_techniques_to_dict')
+        :param data_type: the data type the technique belongs to, used to load the full STIX payload
+        :param values: dictionary used to share equal strings and tuples between the records
+        """
+        self.id = technique['id']
+        self.technique_id = technique['technique_id']
+        self.name = technique['name']
+        self.tactics = _share([p['phase_name'] for p in technique.get('kill_chain_phases', [])], values)
+        self.platforms = _share(technique['x_mitre_platforms'], values) if 'x_mitre_platforms' in technique else None
+        self.data_sources = _share(technique['x_mitre_data_sources'], values)
+        self.dettect_data_sources = _share(technique['dettect_data_sources'], values)
+        self.domains = _share(technique['x_mitre_domains'], values) if 'x_mitre_domains' in technique else None
+        self.matrix = sys.intern(technique['external_references'][0]['source_name'])
+        self.created = technique['created']
+        self.modified = technique['modified']
+        self.data_type = data_type
+        # the mask of the data sources, set on first use (see 'applicability.get_technique_mask')
+        self.component_mask = None
+
+    def __getitem__(self, key):
+        if key in RECORD_KEYS:
+            value = getattr(self, RECORD_KEYS[key])
+            if value is None:
+                raise KeyError(key)
+            return value
+        return self.stix[key]
+
+    def __contains__(self, key):
+        if key in RECORD_KEYS:
+            return getattr(self, RECORD_KEYS[key]) is not None
+        return key in self.stix
+
+    def __repr__(self):
+        return 'TechniqueRecord(%s)' % ', '.join('%s=%r' % (k, getattr(self, k)) for k in self.__slots__)
+
+    def get(self, key, default=None):
+        """
+        Get the value of a key of the technique, like 'dict.get'.
+        :param key: key of the technique dictionary
+        :param default: value returned when the technique does not have the key
+        :return: the value
+        """
+        return self[key] if key in self else default
+
+    @property
+    def stix(self):
+        """
+        The full technique dictionary, as created by 'generic._convert_stix_techniques_to_dict'.
+        :return: technique dictionary
+        """
+        from generic import get_technique_payload
+        return get_technique_payload(self.data_type, self.id)
+
+
+def _share(items, values):
+    """
+    Get the items as tuple of interned strings. Equal tuples are shared between the records, as many techniques have
+    the same tactics, platforms or data sources.
+    :param items: list of strings
+    :param values: dictionary with the tuples already in use
+    :return: tuple
+    """
+    items = tuple(sys.intern(i) for i in items)
+    return values.setdefault(items, items)
+
+
+def get_technique_records(techniques, data_type):
+    """
+    Convert the technique dictionaries into compact technique records.
+    :param techniques: list with technique dictionaries (see 'generic._convert_stix_techniques_to_dict')
+    :param data_type: the data type the techniques belong to, see DATATYPE_XX constants.
+    :return: list with TechniqueRecord objects
+    """
+    values = {}
+    return [TechniqueRecord(t, data_type, values) for t in techniques]
@@ -0,0 +1,231 @@
+"""
+Generator for synthetic technique, data source and group administration files at a configurable scale. The files are
+valid DeTT&CT administration files for the techniques in the fixture ATT&CK dataset (see attack_fixture.py).
+
+Usage: python benchmarks/admin_files.py OUTPUT_DIR [--systems N] [--techniques N] [--logbook-depth N]
+       [--applicable-to N] [--groups N] [--seed N]
+"""
+import argparse
+import os
+import random
+import sys
+from datetime import date, datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+# noinspection PyPep8
+from constants import *
+# noinspection PyPep8
+from attack_fixture import get_technique_ids, load_data_file
+
+PLATFORMS = ['Windows', 'Linux', 'macOS']
+SYSTEM_NAME_WORDS = ['alpha', 'bravo', 'charlie', 'delta', 'echo', 'foxtrot', 'golf', 'hotel', 'india', 'juliett', 'kilo',
+                     'lima', 'mike', 'november', 'oscar', 'papa', 'quebec', 'romeo', 'sierra', 'tango', 'uniform',
+                     'victor', 'whiskey', 'xray', 'yankee', 'zulu']
+
+
+def _get_system_name(index):
+    """
+    Get the name of a system, which is an applicable_to value. Names are made of words, instead of a number, to
+    prevent the health check from reporting very similar applicable_to values.
+    :param index: index of the system
+    :return: the name
+    """
+    words = []
+    while True:
+        words.append(SYSTEM_NAME_WORDS[index % len(SYSTEM_NAME_WORDS)])
+        index //= len(SYSTEM_NAME_WORDS)
+        if index == 0:
+            return ' '.join(words)
+        index -= 1
+
+
+def _get_systems(systems):
+    """
+    Get the systems of the synthetic data source administration file.
+    :param systems: number of systems
+    :return: list with dictionaries holding the applicable_to value and platform(s)
+    """
+    return [{'applicable_to': _get_system_name(i), 'platform': [PLATFORMS[i % len(PLATFORMS)]]} for i in range(systems)]
+
+
+def _get_applicable_to_chunks(systems, applicable_to):
+    """
+    Divide the applicable to values of the systems over objects with the provided applicable_to cardinality.
+    :param systems: list with the systems
+    :param applicable_to: number of applicable_to values per object
+    :return: list with lists of applicable_to values
+    """
+    values = [s['applicable_to'] for s in systems]
+    return [values[i:i + applicable_to] for i in range(0, len(values), applicable_to)]
+
+
+def _get_score_logbook(rnd, logbook_depth, max_score, auto_generated=False):
+    """
+    Get a score logbook with the provided number of score objects, the most recent first. Like in the sample files,
+    the logbook mixes dates and timestamps.
+    :param rnd: random number generator
+    :param logbook_depth: number of score objects
+    :param max_score: highest possible score
+    :param auto_generated: add the 'auto_generated' key to the score objects
+    :return: list with score objects
+    """
+    score_logbook = []
+    for i in range(logbook_depth):
+        score_date = date(2022, 1, 1) - timedelta(days=30 * i)
+        if i % 2 == 1:
+            score_date = datetime(score_date.year, score_date.month, score_date.day, tzinfo=timezone.utc)
+        score_obj = {'date': score_date, 'score': rnd.randint(0, max_score), 'comment': 'Score %d' % i}
+        if auto_generated:
+            score_obj['auto_generated'] = rnd.random() < 0.5
+        score_logbook.append(score_obj)
+    return score_logbook
+
+
+def get_data_source_administration(systems=4, applicable_to=1, seed=1):
+    """
+    Get a synthetic data source administration file.
+    :param systems: number of systems
+    :param applicable_to: number of applicable_to values per data source details object
+    :param seed: seed of the random number generator
+    :return: the content of the file as dictionary
+    """
+    rnd = random.Random(seed)
+    all_systems = _get_systems(systems)
+    platforms = load_data_file('data_source_platforms.json')
+    data_source_names = sorted(set(ds for p in PLATFORMS for ds in platforms['ATT&CK-Enterprise'].get(p, [])) |
+                               set(ds for p in PLATFORMS for ds in platforms['DeTT&CT-Enterprise'].get(p, [])))
+
+    data_sources = []
+    for ds_name in data_source_names:
+        ds_details = []
+        for chunk in _get_applicable_to_chunks(all_systems, applicable_to):
+            if rnd.random() < 0.3:
+                continue
+            ds_details.append({'applicable_to': chunk, 'date_registered': date(2021, 6, 8),
+                               'date_connected': date(2020, 3, 10), 'products': ['Product %d' % rnd.randint(1, 20)],
+                               'available_for_data_analytics': rnd.random() < 0.8, 'comment': '',
+                               'data_quality': {k: rnd.randint(0, 5) for k in ['device_completeness',
+                                                                                'data_field_completeness', 'timeliness',
+                                                                                'consistency', 'retention']}})
+        if ds_details:
+            data_sources.append({'data_source_name': ds_name, 'data_source': ds_details})
+
+    return {'version': FILE_TYPE_DATA_SOURCE_ADMINISTRATION_VERSION, 'file_type': FILE_TYPE_DATA_SOURCE_ADMINISTRATION,
+            'name': 'Synthetic data sources', 'domain': 'enterprise-attack', 'systems': all_systems,
+            'exceptions': [], 'data_sources': data_sources}
+
+
+def get_technique_administration(techniques=600, systems=4, applicable_to=1, logbook_depth=2, seed=1):
+    """
+    Get a synthetic technique administration file.
+    :param techniques: number of techniques
+    :param systems: number of systems of which the applicable_to values are used
+    :param applicable_to: number of applicable_to values per detection and visibility object
+    :param logbook_depth: number of score objects within the score logbooks
+    :param seed: seed of the random number generator
+    :return: the content of the file as dictionary
+    """
+    rnd = random.Random(seed)
+    chunks = _get_applicable_to_chunks(_get_systems(systems), applicable_to)
+
+    admin_techniques = []
+    for technique_id in get_technique_ids(techniques, seed):
+        admin_techniques.append({
+            'technique_id': technique_id, 'technique_name': 'Technique ' + technique_id,
+            'detection': [{'applicable_to': chunk, 'location': ['Location %d' % rnd.randint(1, 10)], 'comment': '',
+                           'score_logbook': _get_score_logbook(rnd, logbook_depth, 5)} for chunk in chunks],
+            'visibility': [{'applicable_to': chunk, 'comment': '',
+                            'score_logbook': _get_score_logbook(rnd, logbook_depth, 4, auto_generated=True)}
+                           for chunk in chunks]})
+
+    return {'version': FILE_TYPE_TECHNIQUE_ADMINISTRATION_VERSION, 'file_type': FILE_TYPE_TECHNIQUE_ADMINISTRATION,
+            'name': 'Synthetic techniques', 'domain': 'enterprise-attack', 'platform': PLATFORMS,
+            'techniques': admin_techniques}
+
+
+def get_group_administration(groups=10, techniques=600, techniques_per_group=25, seed=1):
+    """
+    Get a synthetic group administration file.
+    :param groups: number of groups
+    :param techniques: number of techniques in the fixture ATT&CK dataset
+    :param techniques_per_group: number of techniques per group
+    :param seed: seed of the random number generator
+    :return: the content of the file as dictionary
+    """
+    rnd = random.Random(seed)
+    technique_ids = get_technique_ids(techniques, seed)
+
+    admin_groups = []
+    for i in range(groups):
+        admin_groups.append({'group_name': 'Synthetic group %d' % (i // 2), 'campaign': 'Campaign %d' % i,
+                             'technique_id': sorted(rnd.sample(technique_ids, min(len(technique_ids), techniques_per_group))),
+                             'software_id': ['S%04d' % rnd.randint(0, 99)], 'enabled': True})
+
+    return {'version': FILE_TYPE_GROUP_ADMINISTRATION_VERSION, 'file_type': FILE_TYPE_GROUP_ADMINISTRATION,
+            'domain': 'enterprise-attack', 'platform': PLATFORMS, 'groups': admin_groups}
+
+
+def write_admin_files(output_dir, systems=4, techniques=600, logbook_depth=2, applicable_to=1, groups=10, seed=1):
+    """
+    Write a synthetic technique, data source and group administration file to the provided directory.
+    :param output_dir: directory to write the files to
+    :param systems: number of systems
+    :param techniques: number of techniques
+    :param logbook_depth: number of score objects within the score logbooks
+    :param applicable_to: number of applicable_to values per object
+    :param groups: number of groups
+    :param seed: seed of the random number generator
+    :return: dictionary with per file type the filename
+    """
+    from generic import write_yaml_file
+
+    os.makedirs(output_dir, exist_ok=True)
+    files = {FILE_TYPE_DATA_SOURCE_ADMINISTRATION: (
+                 'data-sources-synthetic.yaml', get_data_source_administration(systems, applicable_to, seed)),
+             FILE_TYPE_TECHNIQUE_ADMINISTRATION: (
+                 'techniques-administration-synthetic.yaml',
+                 get_technique_administration(techniques, systems, applicable_to, logbook_depth, seed)),
+             FILE_TYPE_GROUP_ADMINISTRATION: (
+                 'groups-synthetic.yaml', get_group_administration(groups, techniques, seed=seed))}
+
+    filenames = {}
+    for file_type, (filename, content) in files.items():
+        filenames[file_type] = os.path.join(output_dir, filename)
+        write_yaml_file(content, filenames[file_type])
+    return filenames
+
+
+def _init_menu():
+    """
+    Initialise the command line parameter menu.
+    :return: the argparse menu
+    """
+    menu_parser = argparse.ArgumentParser(description='Generate synthetic DeTT&CT administration files.')
+    menu_parser.add_argument('output_dir', help='directory to write the files to')
+    add_scale_arguments(menu_parser)
+    return menu_parser
+
+
+def add_scale_arguments(parser):
+    """
+    Add the arguments for the scale of the synthetic administration files to the provided parser.
+    :param parser: argparse parser
+    :return:
+    """
+    parser.add_argument('--systems', help='number of systems (default = 4)', type=int, default=4)
+    parser.add_argument('--techniques', help='number of techniques (default = 600)', type=int, default=600)
+    parser.add_argument('--logbook-depth', help='number of score objects in a score logbook (default = 2)', type=int,
+                        default=2)
+    parser.add_argument('--applicable-to', help='number of applicable_to values per detection, visibility and data '
+                                                'source details object (default = 1)', type=int, default=1)
+    parser.add_argument('--groups', help='number of groups in the group administration file (default = 10)', type=int,
+                        default=10)
+    parser.add_argument('--seed', help='seed of the random number generator (default = 1)', type=int, default=1)
+
+
+if __name__ == '__main__':
+    args = _init_menu().parse_args()
+    for name in write_admin_files(args.output_dir, args.systems, args.techniques, args.logbook_depth,
+                                  args.applicable_to, args.groups, args.seed).values():
+        print('File written:   ' + name)
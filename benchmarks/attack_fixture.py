@@ -0,0 +1,200 @@
+"""
+Offline fixture ATT&CK dataset for the benchmarks. The dataset is written to a DeTT&CT cache directory, in the same
+format as the ATT&CK data cached by 'load_attack_data', so DeTT&CT does not need to connect to MITRE's TAXII server.
+
+The dataset is synthetic, but has the shape of the real ATT&CK data: the Enterprise techniques use the technique IDs
+and DeTT&CT data sources from 'data/dettect_data_sources.json', and their data components are taken from
+'data/data_source_platforms.json' for the technique's platforms.
+"""
+import json
+import os
+import pickle
+import random
+from datetime import datetime as dt, timezone
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+TACTICS = ['initial-access', 'execution', 'persistence', 'privilege-escalation', 'defense-evasion', 'credential-access',
+           'discovery', 'lateral-movement', 'collection', 'command-and-control', 'exfiltration', 'impact']
+
+
+def load_data_file(filename):
+    """
+    Load a JSON file from the 'data' directory of DeTT&CT.
+    :param filename: name of the file
+    :return: the content of the JSON file
+    """
+    with open(os.path.join(ROOT_DIR, 'data', filename), 'r') as f:
+        return json.load(f)
+
+
+def _get_technique(rnd, technique_id, domain, source_name, platforms, dettect_data_sources):
+    """
+    Create a technique in the format of 'generic._convert_stix_techniques_to_dict'.
+    :param rnd: random number generator
+    :param technique_id: ATT&CK technique ID
+    :param domain: ATT&CK domain
+    :param source_name: source name of the external reference holding the technique ID
+    :param platforms: dictionary with per ATT&CK platform the data components
+    :param dettect_data_sources: list with DeTT&CT data sources of the technique
+    :return: technique dictionary
+    """
+    technique_platforms = rnd.sample(sorted(platforms.keys()), k=min(len(platforms), rnd.randint(1, 4)))
+    data_components = set()
+    for p in technique_platforms:
+        data_components.update(rnd.sample(platforms[p], k=min(len(platforms[p]), rnd.randint(0, 4))))
+
+    return {'type': 'attack-pattern', 'id': 'attack-pattern--%s-%s' % (domain, technique_id),
+            'name': 'Technique ' + technique_id, 'technique_id': technique_id,
+            'created': dt(2018, 1, 1, tzinfo=timezone.utc), 'modified': dt(2022, rnd.randint(1, 12), 1, tzinfo=timezone.utc),
+            'external_references': [{'source_name': source_name, 'external_id': technique_id}],
+            'kill_chain_phases': [{'kill_chain_name': source_name, 'phase_name': rnd.choice(TACTICS)}],
+            'x_mitre_platforms': technique_platforms, 'x_mitre_domains': [domain],
+            'x_mitre_data_sources': ['Data source: ' + dc for dc in sorted(data_components)],
+            'dettect_data_sources': dettect_data_sources, 'description': 'Description of ' + technique_id}
+
+
+def _add_relationship(relationships, relationship_type, source_ref, target_ref):
+    """
+    Add a relationship object to the list of relationships.
+    :param relationships: list of relationships
+    :param relationship_type: 'uses' or 'mitigates'
+    :param source_ref: ID of the source object
+    :param target_ref: ID of the target object
+    :return:
+    """
+    relationships.append({'type': 'relationship', 'id': 'relationship--%d' % len(relationships),
+                          'relationship_type': relationship_type, 'source_ref': source_ref, 'target_ref': target_ref})
+
+
+def get_technique_ids(techniques, seed=1):
+    """
+    Get the IDs of the Enterprise techniques within the fixture ATT&CK dataset.
+    :param techniques: number of Enterprise techniques
+    :param seed: seed of the random number generator
+    :return: sorted list with technique IDs
+    """
+    rnd = random.Random(seed)
+    technique_ids = sorted(t['technique_id'] for t in load_data_file('dettect_data_sources.json'))[:techniques]
+    while len(technique_ids) < techniques:
+        technique_ids = sorted(set(technique_ids + ['T%04d' % rnd.randint(1000, 1999)]))
+    return technique_ids
+
+
+def get_attack_fixture(techniques=600, groups=130, software=300, mitigations=40, techniques_per_group=25, seed=1):
+    """
+    Create the fixture ATT&CK dataset.
+    :param techniques: number of Enterprise techniques
+    :param groups: number of groups
+    :param software: number of software
+    :param mitigations: number of mitigations per domain
+    :param techniques_per_group: number of techniques used by a group
+    :param seed: seed of the random number generator
+    :return: dictionary with per DeTT&CT data type (see DATA_TYPE_* within constants.py) the ATT&CK data
+    """
+    rnd = random.Random(seed)
+    platforms = load_data_file('data_source_platforms.json')
+    dettect_data_sources = {t['technique_id']: [ds for ds in t['dettect_data_sources'] if ds.endswith('[DeTT&CT data source]')]
+                            for t in load_data_file('dettect_data_sources.json')}
+
+    technique_ids = get_technique_ids(techniques, seed)
+    domain_techniques = {
+        'enterprise-attack': [_get_technique(rnd, t, 'enterprise-attack', 'mitre-attack', platforms['ATT&CK-Enterprise'],
+                                             dettect_data_sources.get(t, [])) for t in technique_ids],
+        'ics-attack': [_get_technique(rnd, 'T08%02d' % i, 'ics-attack', 'mitre-ics-attack', platforms['ATT&CK-ICS'], [])
+                       for i in range(80)],
+        'mobile-attack': [_get_technique(rnd, 'T14%02d' % i, 'mobile-attack', 'mitre-mobile-attack',
+                                         {p: [] for p in platforms['ATT&CK-Mobile']}, []) for i in range(60)]}
+
+    all_groups = []
+    for i in range(groups):
+        domain = 'ics-attack' if i % 10 == 8 else 'mobile-attack' if i % 10 == 9 else 'enterprise-attack'
+        all_groups.append({'type': 'intrusion-set', 'id': 'intrusion-set--%d' % i, 'name': 'Group%d' % i,
+                           'aliases': ['Group%d' % i, 'Alias%dA' % i], 'group_id': 'G%04d' % i,
+                           'created': dt(2017, 1, 1, tzinfo=timezone.utc),
+                           'modified': dt(2021, 1 + i % 12, 1, tzinfo=timezone.utc),
+                           'external_references': [{'source_name': 'mitre-attack', 'external_id': 'G%04d' % i}],
+                           'x_mitre_domains': [domain]})
+
+    all_software = []
+    for i in range(software):
+        all_software.append({'type': rnd.choice(['malware', 'tool']), 'id': 'malware--%d' % i, 'name': 'Software%d' % i,
+                             'created': dt(2017, 1, 1, tzinfo=timezone.utc),
+                             'modified': dt(2021, 1 + i % 12, 1, tzinfo=timezone.utc),
+                             'external_references': [{'source_name': 'mitre-attack', 'external_id': 'S%04d' % i}],
+                             'x_mitre_platforms': rnd.sample(sorted(platforms['ATT&CK-Enterprise'].keys()), 2)})
+
+    relationships = []
+    techniques_by_id = {t['id']: t for d in domain_techniques.values() for t in d}
+    groups_by_id = {g['id']: g for g in all_groups}
+    software_by_id = {s['id']: s for s in all_software}
+    for g in all_groups:
+        group_techniques = domain_techniques[g['x_mitre_domains'][0]]
+        for t in rnd.sample(group_techniques, min(len(group_techniques), techniques_per_group)):
+            _add_relationship(relationships, 'uses', g['id'], t['id'])
+        for s in rnd.sample(all_software, min(len(all_software), 3)):
+            _add_relationship(relationships, 'uses', g['id'], s['id'])
+    for s in all_software:
+        for t in rnd.sample(domain_techniques['enterprise-attack'], min(techniques, 10)):
+            _add_relationship(relationships, 'uses', s['id'], t['id'])
+
+    all_mitigations = {}
+    for domain, source_name in [('enterprise-attack', 'mitre-attack'), ('ics-attack', 'mitre-ics-attack'),
+                                ('mobile-attack', 'mitre-mobile-attack')]:
+        all_mitigations[domain] = []
+        for i in range(mitigations):
+            m = {'type': 'course-of-action', 'id': 'course-of-action--%s-%d' % (domain, i), 'name': 'Mitigation %d' % i,
+                 'external_references': [{'source_name': source_name, 'external_id': 'M%04d' % (1000 + i)}]}
+            all_mitigations[domain].append(m)
+            for t in rnd.sample(domain_techniques[domain], min(len(domain_techniques[domain]), 12)):
+                _add_relationship(relationships, 'mitigates', m['id'], t['id'])
+
+    techniques_by_group, techniques_by_software, software_by_group = [], [], []
+    for r in relationships:
+        if r['relationship_type'] != 'uses':
+            continue
+        if r['source_ref'] in groups_by_id and r['target_ref'] in techniques_by_id:
+            g, t = groups_by_id[r['source_ref']], techniques_by_id[r['target_ref']]
+            techniques_by_group.append({'group_id': g['group_id'], 'name': g['name'], 'aliases': g['aliases'],
+                                        'technique_id': t['technique_id'], 'x_mitre_platforms': t['x_mitre_platforms'],
+                                        'x_mitre_domains': g['x_mitre_domains'],
+                                        'matrix': t['external_references'][0]['source_name']})
+        elif r['source_ref'] in software_by_id and r['target_ref'] in techniques_by_id:
+            techniques_by_software.append({'software_id': software_by_id[r['source_ref']]['external_references'][0]['external_id'],
+                                           'technique_id': techniques_by_id[r['target_ref']]['technique_id']})
+        elif r['source_ref'] in groups_by_id and r['target_ref'] in software_by_id:
+            g, s = groups_by_id[r['source_ref']], software_by_id[r['target_ref']]
+            software_by_group.append({'group_id': g['group_id'], 'name': g['name'], 'aliases': g['aliases'],
+                                      'software_id': s['external_references'][0]['external_id'],
+                                      'x_mitre_platforms': s['x_mitre_platforms'], 'x_mitre_domains': g['x_mitre_domains'],
+                                      'matrix': 'mitre-attack'})
+
+    return {'mitre_all_techniques_enterprise': domain_techniques['enterprise-attack'],
+            'mitre_all_techniques_ics': domain_techniques['ics-attack'],
+            'mitre_all_techniques_mobile': domain_techniques['mobile-attack'],
+            'mitre_all_techniques': [t for d in domain_techniques.values() for t in d],
+            'mitre_all_groups': all_groups,
+            'mitre_all_software': all_software,
+            'mitre_all_relationships': relationships,
+            'mitre_techniques_used_by_group': techniques_by_group,
+            'mitre_techniques_used_by_software': techniques_by_software,
+            'mitre_software_used_by_group': software_by_group,
+            'mitre_all_mitigations_enterprise': all_mitigations['enterprise-attack'],
+            'mitre_all_mitigations_ics': all_mitigations['ics-attack'],
+            'mitre_all_mitigations_mobile': all_mitigations['mobile-attack']}
+
+
+def write_attack_fixture(cache_dir, **kwargs):
+    """
+    Write the fixture ATT&CK dataset to the provided cache directory.
+    :param cache_dir: the DeTT&CT cache directory (i.e. 'cache' within the working directory of DeTT&CT)
+    :param kwargs: the arguments for 'get_attack_fixture'
+    :return: dictionary with per data type the number of objects
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    now = dt.now()
+    fixture = get_attack_fixture(**kwargs)
+    for data_type, attack_data in fixture.items():
+        with open(os.path.join(cache_dir, data_type), 'wb') as f:
+            pickle.dump([attack_data, now], f)
+    return {data_type: len(attack_data) for data_type, attack_data in fixture.items()}
@@ -0,0 +1,207 @@
+"""
+Benchmarks for the major entry points of DeTT&CT. The benchmarks run offline in a temporary working directory, using
+the fixture ATT&CK dataset (attack_fixture.py) and synthetic administration files (admin_files.py) at the provided
+scale. The results are written as JSON, so regressions can be tracked over time.
+
+Usage: python benchmarks/run_benchmarks.py [-o RESULTS_FILE] [--repeat N] [--warm] [--filter TEXT]
+       [--systems N] [--techniques N] [--logbook-depth N] [--applicable-to N] [--groups N] [--seed N]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime as dt
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.normpath(os.path.join(BENCHMARKS_DIR, '..'))
+sys.path.insert(0, ROOT_DIR)
+
+# noinspection PyPep8
+from attack_fixture import write_attack_fixture
+# noinspection PyPep8
+from admin_files import write_admin_files, add_scale_arguments
+
+QUERY_VISIBILITY = 'techniques where visibility.score_logbook.score >= 2'
+QUERY_DETECTION = 'techniques where detection.score_logbook.score >= 2'
+QUERY_DATA_SOURCES = 'data_sources where available_for_data_analytics = true'
+FILE_VISIBILITY_UPDATE_POLICY = os.path.join(ROOT_DIR, 'sample-data', 'visibility-update-policy.yaml')
+
+
+def _get_benchmarks(files):
+    """
+    Get the benchmarks: the name and the function to time.
+    :param files: dictionary with per file type the synthetic administration file
+    :return: list with tuples (name, function)
+    """
+    from constants import FILE_TYPE_DATA_SOURCE_ADMINISTRATION, FILE_TYPE_TECHNIQUE_ADMINISTRATION, \
+        FILE_TYPE_GROUP_ADMINISTRATION
+    from generic import load_techniques, load_data_sources, check_file
+    from data_source_mapping import generate_data_sources_layer, export_data_source_list_to_excel, \
+        generate_technique_administration_file, update_technique_administration_file_with_policy
+    from technique_mapping import generate_visibility_layer, generate_detection_layer, export_techniques_list_to_excel
+    from group_mapping import generate_group_heat_map
+    from eql_yaml import techniques_search, data_source_search
+    from health import check_yaml_file_health, check_health_files
+
+    file_ds = files[FILE_TYPE_DATA_SOURCE_ADMINISTRATION]
+    file_tech = files[FILE_TYPE_TECHNIQUE_ADMINISTRATION]
+    file_groups = files[FILE_TYPE_GROUP_ADMINISTRATION]
+
+    def update_with_policy():
+        # the update is applied to a copy, so every run starts from the same technique administration file
+        file_tech_copy = os.path.join(os.path.dirname(file_tech), 'techniques-update.yaml')
+        shutil.copyfile(file_tech, file_tech_copy)
+        update_technique_administration_file_with_policy(file_ds, file_tech_copy, FILE_VISIBILITY_UPDATE_POLICY)
+
+    return [
+        ('load_techniques', lambda: load_techniques(file_tech)),
+        ('load_data_sources', lambda: load_data_sources(file_ds)),
+        ('check_file techniques', lambda: check_file(file_tech, FILE_TYPE_TECHNIQUE_ADMINISTRATION)),
+        ('check_file data_sources', lambda: check_file(file_ds, FILE_TYPE_DATA_SOURCE_ADMINISTRATION)),
+        ('check_yaml_file_health techniques',
+         lambda: check_yaml_file_health(file_tech, FILE_TYPE_TECHNIQUE_ADMINISTRATION, True)),
+        ('check_yaml_file_health data_sources',
+         lambda: check_yaml_file_health(file_ds, FILE_TYPE_DATA_SOURCE_ADMINISTRATION, True)),
+        ('check_yaml_file_health groups', lambda: check_yaml_file_health(file_groups, FILE_TYPE_GROUP_ADMINISTRATION, True)),
+        ('check_health_files', lambda: check_health_files([os.path.dirname(file_tech)], processes=1)),
+        ('generate_data_sources_layer', lambda: generate_data_sources_layer(file_ds, None, None, {})),
+        ('generate_visibility_layer', lambda: generate_visibility_layer(file_tech, False, None, None, {})),
+        ('generate_visibility_layer overlay', lambda: generate_visibility_layer(file_tech, True, None, None, {})),
+        ('generate_detection_layer', lambda: generate_detection_layer(file_tech, False, None, None, {})),
+        ('generate_detection_layer overlay', lambda: generate_detection_layer(file_tech, True, None, None, {})),
+        ('generate_group_heat_map all', lambda: generate_group_heat_map(
+            ['all'], None, None, None, False, None, None, False, None, None, 'enterprise', {})),
+        ('generate_group_heat_map file overlay visibility', lambda: generate_group_heat_map(
+            [file_groups], [file_tech], 'visibility', None, False, None, None, False, None, None, 'enterprise', {})),
+        ('techniques_search visibility', lambda: techniques_search(file_tech, query_visibility=QUERY_VISIBILITY)),
+        ('techniques_search detection', lambda: techniques_search(file_tech, query_detection=QUERY_DETECTION)),
+        ('data_source_search', lambda: data_source_search(file_ds, QUERY_DATA_SOURCES)),
+        ('generate_technique_administration_file', lambda: generate_technique_administration_file(file_ds, None)),
+        ('update_technique_administration_file_with_policy', update_with_policy),
+        ('export_techniques_list_to_excel', lambda: export_techniques_list_to_excel(file_tech, None)),
+        ('export_data_source_list_to_excel', lambda: export_data_source_list_to_excel(file_ds, None)),
+    ]
+
+
+def _reset_state():
+    """
+    Remove the state of previous runs, so every run starts cold: the state store and the parsed YAML files kept in
+    memory. The ATT&CK data (the fixture within the cache directory) is kept.
+    :return:
+    """
+    import generic
+    from constants import FILE_STATE_DB
+
+    generic._yaml_files_in_memory.clear()
+    if os.path.exists(FILE_STATE_DB):
+        os.remove(FILE_STATE_DB)
+
+
+def _run_benchmark(function, repeat, warm):
+    """
+    Time the provided function. The output of the function (printed to stdout) is suppressed.
+    :param function: the function to time
+    :param repeat: number of runs
+    :param warm: keep the state of previous runs
+    :return: dictionary with the timings in seconds, or with the error when the function failed
+    """
+    times = []
+    for _ in range(repeat):
+        if not warm:
+            _reset_state()
+        start = time.perf_counter()
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                function()
+        except (Exception, SystemExit) as e:
+            return {'error': '%s: %s' % (type(e).__name__, e)}
+        times.append(time.perf_counter() - start)
+
+    return {'min': min(times), 'median': statistics.median(times), 'mean': statistics.mean(times), 'max': max(times),
+            'times': times}
+
+
+def _get_git_commit():
+    """
+    Get the current git commit of DeTT&CT.
+    :return: commit hash or None when not available
+    """
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT_DIR, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(scale, repeat=3, warm=False, name_filter=None):
+    """
+    Run the benchmarks in a temporary working directory.
+    :param scale: dictionary with the scale of the synthetic administration files (see 'write_admin_files')
+    :param repeat: number of runs per benchmark
+    :param warm: keep the state of previous runs (state store and parsed YAML files)
+    :param name_filter: only run the benchmarks of which the name contains this text
+    :return: dictionary with the results
+    """
+    cwd = os.getcwd()
+    work_dir = tempfile.mkdtemp(prefix='dettect-benchmarks-')
+    try:
+        # DeTT&CT uses the 'cache' and 'output' directories within the working directory
+        os.chdir(work_dir)
+        os.mkdir('output')
+        fixture = write_attack_fixture('cache', techniques=scale['techniques'], seed=scale['seed'])
+        files = write_admin_files('input', **scale)
+
+        from constants import VERSION
+        results = {'dettect_version': VERSION, 'git_commit': _get_git_commit(), 'date': dt.now().isoformat(),
+                   'python': platform.python_version(), 'platform': platform.platform(), 'cpu_count': os.cpu_count(),
+                   'repeat': repeat, 'warm': warm, 'scale': scale, 'attack_fixture': fixture, 'benchmarks': []}
+
+        for name, function in _get_benchmarks(files):
+            if name_filter and name_filter not in name:
+                continue
+            result = _run_benchmark(function, repeat, warm)
+            results['benchmarks'].append(dict(name=name, **result))
+            if 'error' in result:
+                print('%-50s %s' % (name, result['error']))
+            else:
+                print('%-50s %9.3f s (median)  %9.3f s (min)' % (name, result['median'], result['min']))
+        return results
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def _init_menu():
+    """
+    Initialise the command line parameter menu.
+    :return: the argparse menu
+    """
+    menu_parser = argparse.ArgumentParser(description='Run the DeTT&CT benchmarks.')
+    menu_parser.add_argument('-o', '--output', help='JSON file to write the results to (default = '
+                                                    'benchmark_results_<date>.json)')
+    menu_parser.add_argument('--repeat', help='number of runs per benchmark (default = 3)', type=int, default=3)
+    menu_parser.add_argument('--warm', help='keep the state store and parsed YAML files between runs, instead of '
+                                            'starting every run cold', action='store_true')
+    menu_parser.add_argument('--filter', help='only run the benchmarks of which the name contains this text')
+    add_scale_arguments(menu_parser)
+    return menu_parser
+
+
+if __name__ == '__main__':
+    args = _init_menu().parse_args()
+    scale = {'systems': args.systems, 'techniques': args.techniques, 'logbook_depth': args.logbook_depth,
+             'applicable_to': args.applicable_to, 'groups': args.groups, 'seed': args.seed}
+    results = run_benchmarks(scale, args.repeat, args.warm, args.filter)
+
+    output_filename = args.output or 'benchmark_results_%s.json' % dt.now().strftime('%Y%m%d_%H%M%S')
+    with open(output_filename, 'w') as f:
+        json.dump(results, f, indent=2)
+    print('File written:   ' + output_filename)
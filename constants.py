@@ -23,6 +23,16 @@ DATA_TYPE_STIX_ALL_ENTERPRISE_MITIGATIONS = 'mitre_all_mitigations_enterprise'
 DATA_TYPE_STIX_ALL_MOBILE_MITIGATIONS = 'mitre_all_mitigations_mobile'
 DATA_TYPE_STIX_ALL_ICS_MITIGATIONS = 'mitre_all_mitigations_ics'
 
+# indexes derived from the ATT&CK data, cached alongside the ATT&CK data (see attack_index.py)
+DATA_TYPE_INDEX_TECH_BY_DATA_SOURCE = 'index_techniques_by_data_source'
+DATA_TYPE_INDEX_TECH_BY_MITIGATION = 'index_techniques_by_mitigation'
+DATA_TYPE_INDEX_UPDATES = 'index_updates'
+DATA_TYPES_INDEXES = [DATA_TYPE_INDEX_TECH_BY_DATA_SOURCE, DATA_TYPE_INDEX_TECH_BY_MITIGATION, DATA_TYPE_INDEX_UPDATES]
+
+# data types holding ATT&CK techniques, which are kept in memory as compact technique records
+DATA_TYPES_STIX_TECHNIQUES = [DATA_TYPE_STIX_ALL_TECH, DATA_TYPE_STIX_ALL_TECH_ENTERPRISE, DATA_TYPE_STIX_ALL_TECH_ICS,
+                              DATA_TYPE_STIX_ALL_TECH_MOBILE]
+
 # ATT&CK matrix support:
 DETTECT_DOMAIN_SUPPORT = ['enterprise-attack', 'ics-attack', 'mobile-attack']
 
@@ -89,6 +99,7 @@ OVERLAY_TYPE_DETECTION = 'detection'
 FILE_TYPE_DATA_SOURCE_ADMINISTRATION = 'data-source-administration'
 FILE_TYPE_TECHNIQUE_ADMINISTRATION = 'technique-administration'
 FILE_TYPE_GROUP_ADMINISTRATION = 'group-administration'
+FILE_TYPE_VISIBILITY_UPDATE_POLICY = 'visibility-update-policy'
 
 # YAML administration file versions
 FILE_TYPE_DATA_SOURCE_ADMINISTRATION_VERSION = 1.1
@@ -126,6 +137,20 @@ FILE_TYPE_DATA_SOURCE_UPGRADE_TEXT = {
    """
 }
 
+# Default policy for the non-interactive visibility update. Keys:
+# - update_auto_generated / update_manual: add a new score to visibility objects with an exact match on applicable_to,
+#   for which the current score is auto generated / set manually
+# - replace_auto_generated / replace_manual: replace visibility objects without a match on applicable_to, for which
+#   at least one current score is auto generated / none of the current scores is auto generated
+# - add_techniques: add techniques which are not yet part of the technique administration file
+# - comment: the comment for the new visibility scores
+VISIBILITY_UPDATE_POLICY = {'update_auto_generated': True,
+                            'update_manual': False,
+                            'replace_auto_generated': True,
+                            'replace_manual': False,
+                            'add_techniques': True,
+                            'comment': ''}
+
 # Text for user to enter key to continue
 TXT_ANY_KEY_TO_CONTINUE = 'Press a key to continue'
 
@@ -139,6 +164,8 @@ REGEX_YAML_INDENT_CHARS = re.compile(r'(^[\s-]+).*', re.IGNORECASE)
 REGEX_YAML_VALID_DATE = re.compile(r'([12]\d{3}-(0[1-9]|1[0-2])-(0[1-9]|[12]\d|3[01]))', re.IGNORECASE)
 REGEX_YAML_DATE = re.compile(r'^[\s-]+date:.*$', re.IGNORECASE)
 REGEX_YAML_TECHNIQUE_ID_GROUP = re.compile(r'^-\s+technique_id:\s+(T\d{4})\s*$', re.IGNORECASE)
+REGEX_YAML_FILE_TYPE_DATA_SOURCE = re.compile(r'^file_type:\s*[\'"]?data-source-administration[\'"]?\s*$', re.MULTILINE)
+REGEX_YAML_FILE_TYPE_TECHNIQUE = re.compile(r'^file_type:\s*[\'"]?technique-administration[\'"]?\s*$', re.MULTILINE)
 
 # YAML objects
 YAML_OBJ_VISIBILITY = {'applicable_to': ['all'],
@@ -175,6 +202,31 @@ EQL_INVALID_RESULT_TECH = '[!] Invalid technique administration content. Check y
 HEALTH_ERROR_TXT = '[!] The below YAML file contains possible errors. It\'s recommended to check via the ' \
                    '\'--health\' argument: \n    - '
 
+# Increase the version when the health checks change to invalidate the cached health check results per block
+HEALTH_RULES_VERSION = 1
+
+# State store for the YAML files (health state, file type, version and cached results)
+FILE_STATE_DB = 'cache/file-state.db'
+FILE_STATE_DB_TIMEOUT = 30  # seconds to wait for a lock held by another DeTT&CT process
+
+# Phases of the pipeline measured with '--timings' (see instrumentation.py)
+PHASE_CACHE_LOAD = 'cache load'
+PHASE_YAML_PARSE = 'YAML parse'
+PHASE_UPGRADE_CHECK = 'upgrade check'
+PHASE_HEALTH = 'health'
+PHASE_MAPPING = 'mapping'
+PHASE_LAYER_SERIALIZATION = 'layer serialization'
+PHASE_FILE_WRITE = 'file write'
+PROFILE_PRINT_LIMIT = 25  # number of functions printed with '--profile'
+
+# Watch mode
+WATCH_POLL_INTERVAL = 0.5  # seconds between two checks for changes when inotify is not available
+WATCH_INOTIFY_TIMEOUT = 5  # seconds after which the files are also checked for changes when using inotify
+WATCH_DEBOUNCE_TIME = 0.05  # seconds to wait after a change is reported, before the file is read
+
+# command line arguments controlling the run, which do not change the output and are not part of the output fingerprint
+RUN_CONTROL_ARGUMENTS = ['force', 'timings', 'profile', 'watch']
+
 PLATFORMS_ENTERPRISE = {'pre': 'PRE', 'windows': 'Windows', 'macos': 'macOS', 'linux': 'Linux', 'office 365': 'Office 365',
                         'azure ad': 'Azure AD', 'google workspace': 'Google Workspace', 'iaas': 'IaaS', 'saas': 'SaaS',
                         'network': 'Network', 'containers': 'Containers'}
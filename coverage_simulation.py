@@ -0,0 +1,409 @@
+import simplejson
+from itertools import chain
+from generic import *
+from file_output import write_file, create_output_filename
+from applicability import get_technique_mask, get_availability_mask, get_data_source_names
+from data_source_mapping import get_systems_data_sources
+
+
+class VisibilityModel:
+    """
+    The visibility of the techniques given the data sources available per system, as determined for the data source
+    layer: per technique the average over the systems matching its platforms of (available data sources / applicable
+    data sources). Data sources can be enabled for a system (see 'enable'), and the visibility gained by enabling a
+    data source is evaluated from the techniques using that data source only (see 'gain').
+    """
+
+    def __init__(self, filename, weights=None):
+        """
+        Constructor of the VisibilityModel class.
+        :param filename: the filename of the YAML file containing the data sources administration, or a dict
+        :param weights: dictionary {technique ID: weight}. When provided, techniques not in the dictionary have a
+        weight of 0. Otherwise, all techniques have a weight of 1.
+        """
+        my_ds, self.name, systems, exceptions, self.domain = load_data_sources(filename)
+        techniques = load_attack_data(DATA_TYPE_STIX_ALL_TECH_ENTERPRISE if self.domain == 'enterprise-attack' else DATA_TYPE_STIX_ALL_TECH_ICS if self.domain == 'ics-attack' else DATA_TYPE_STIX_ALL_TECH_MOBILE)
+        _, self.systems = get_systems_data_sources(my_ds, systems, self.domain)
+        self.applicable_to = [s['applicable_to'] for s in systems]
+        exceptions = set(map(lambda x: x.upper(), exceptions))
+
+        # per technique: ID, weight, and per matching system {system: (applicable count, available count)}
+        self.technique_ids = []
+        self.weights = []
+        self.counts = []
+        # { bit: [technique, ...] }
+        self._postings = {}
+        # { (system, data source name): [(technique, number of data sources enabled), ...] }
+        self._effects = {}
+
+        for t in techniques:
+            if t['technique_id'] in exceptions:
+                continue
+            weight = 1 if weights is None else weights.get(t['technique_id'], 0)
+            technique_mask = get_technique_mask(t)
+            tech_platforms = set(t.get('x_mitre_platforms', []))
+            counts = {}
+            for i, (_, platforms, applicable_mask, available_mask) in enumerate(self.systems):
+                if platforms.intersection(tech_platforms):
+                    counts[i] = [(technique_mask & applicable_mask).bit_count(),
+                                 (technique_mask & applicable_mask & available_mask).bit_count()]
+            if not weight or not counts:
+                continue
+
+            tech = len(self.technique_ids)
+            self.technique_ids.append(t['technique_id'])
+            self.weights.append(weight)
+            self.counts.append(counts)
+            mask = technique_mask
+            while mask:
+                bit = mask & -mask
+                self._postings.setdefault(bit, []).append(tech)
+                mask ^= bit
+
+    def _get_technique_score(self, tech):
+        """
+        Get the visibility score of a technique, as shown in the data source layer (between 0 and 1).
+        :param tech: position of the technique
+        :return: the score
+        """
+        counts = self.counts[tech]
+        return sum(available / applicable for applicable, available in counts.values() if applicable) / len(counts)
+
+    def get_score(self):
+        """
+        Get the weighted visibility score of all techniques.
+        :return: tuple with the score and the maximum score (all applicable data sources available)
+        """
+        score = sum(w * self._get_technique_score(t) for t, w in enumerate(self.weights))
+        max_score = sum(w * sum(1 for applicable, _ in self.counts[t].values() if applicable) / len(self.counts[t])
+                        for t, w in enumerate(self.weights))
+        return score, max_score
+
+    def get_visible_techniques(self):
+        """
+        Get the weighted count of techniques having visibility (a score above 0).
+        :return: the weighted count
+        """
+        return sum(w for t, w in enumerate(self.weights) if any(c[1] for c in self.counts[t].values()))
+
+    def get_candidates(self):
+        """
+        Get per system the data sources that are applicable to the system, not yet available and used by at least one
+        of the techniques.
+        :return: list of (system, data source name)
+        """
+        candidates = []
+        for i, (_, _, applicable_mask, available_mask) in enumerate(self.systems):
+            mask = applicable_mask & ~available_mask
+            for name in get_data_source_names(mask):
+                if self._get_effects((i, name)):
+                    candidates.append((i, name))
+        return candidates
+
+    def _get_effects(self, candidate):
+        """
+        Get the techniques of which the count of available data sources increases when enabling the data source.
+        :param candidate: tuple (system, data source name)
+        :return: list of (technique, number of data sources enabled)
+        """
+        if candidate not in self._effects:
+            system, name = candidate
+            _, _, applicable_mask, available_mask = self.systems[system]
+            enabled = {}
+            mask = get_availability_mask([name]) & applicable_mask & ~available_mask
+            while mask:
+                bit = mask & -mask
+                for tech in self._postings.get(bit, []):
+                    if system in self.counts[tech]:
+                        enabled[tech] = enabled.get(tech, 0) + 1
+                mask ^= bit
+            self._effects[candidate] = list(enabled.items())
+        return self._effects[candidate]
+
+    def gain(self, candidate):
+        """
+        Get the visibility gained by enabling a data source for a system.
+        :param candidate: tuple (system, data source name)
+        :return: tuple with the gain in weighted visibility score and the weighted count of techniques that gain
+        visibility while having none before
+        """
+        system = candidate[0]
+        score = 0
+        techniques = 0
+        for tech, count in self._get_effects(candidate):
+            counts = self.counts[tech]
+            score += self.weights[tech] * count / counts[system][0] / len(counts)
+            if not any(c[1] for c in counts.values()):
+                techniques += self.weights[tech]
+        return score, techniques
+
+    def enable(self, candidate):
+        """
+        Enable a data source for a system.
+        :param candidate: tuple (system, data source name)
+        :return:
+        """
+        system, name = candidate
+        for tech, count in self._get_effects(candidate):
+            self.counts[tech][system][1] += count
+        app_to, platforms, applicable_mask, available_mask = self.systems[system]
+        self.systems[system] = (app_to, platforms, applicable_mask,
+                                available_mask | (get_availability_mask([name]) & applicable_mask))
+        # the effects of the other data sources of this system remain valid, as they use other bits
+        del self._effects[candidate]
+
+
+def get_technique_weights(groups, domain, platform):
+    """
+    Get the weight of the techniques: the number of provided groups using the technique (or the weight of the
+    technique within a group administration YAML file).
+    :param groups: list of group IDs/names/aliases, or a list with one group administration YAML file
+    :param domain: the specified domain
+    :param platform: the ATT&CK platforms of the groups' techniques
+    :return: dictionary {technique ID: weight}, or None when the groups could not be loaded
+    """
+    from group_mapping import _get_group_techniques
+
+    if len(groups) == 1 and os.path.isfile(groups[0]):
+        if not check_file(groups[0], FILE_TYPE_GROUP_ADMINISTRATION):
+            return None
+        groups_dict = _get_group_techniques(groups[0], platform, FILE_TYPE_GROUP_ADMINISTRATION, domain)
+    else:
+        groups_dict = _get_group_techniques(list(map(lambda x: x.strip().lower(), groups)), platform, None, domain)
+    if groups_dict == -1:
+        return None
+
+    weights = {}
+    for group in groups_dict.values():
+        for tech_id in group['techniques']:
+            weights[tech_id] = weights.get(tech_id, 0) + group['weight'][tech_id]
+    return weights
+
+
+def _load_visibility_model(filename, groups):
+    """
+    Load the visibility model of a data source administration file, weighted by the techniques of the groups.
+    :param filename: the filename of the YAML file containing the data sources administration, or a dict
+    :param groups: list of group IDs/names/aliases or a group administration YAML file, or None
+    :return: VisibilityModel object, or None when the groups could not be loaded
+    """
+    weights = None
+    if groups:
+        my_ds, name, systems, exceptions, domain = load_data_sources(filename)
+        weights = get_technique_weights(groups, domain, set(chain.from_iterable(s['platform'] for s in systems)))
+        if weights is None:
+            return None
+    return VisibilityModel(filename, weights)
+
+
+def rank_data_sources(filename, groups, top):
+    """
+    Rank the data sources that are not yet available per system, by the visibility they would add when enabled for
+    that system. The visibility is weighted by the techniques of the provided groups.
+    :param filename: the filename of the YAML file containing the data sources administration, or a dict
+    :param groups: list of group IDs/names/aliases or a group administration YAML file, or None
+    :param top: the number of data sources to print
+    :return:
+    """
+    model = _load_visibility_model(filename, groups)
+    if model is None:
+        return
+
+    score, max_score = model.get_score()
+    ranking = sorted(((model.gain(c), c) for c in model.get_candidates()), key=lambda r: (-r[0][0], -r[0][1]))
+
+    print('Current visibility score: ' + '{:.2f}'.format(score) + ' of ' + '{:.2f}'.format(max_score) +
+          (' ({:.1f}%)'.format(score / max_score * 100) if max_score else ''))
+    print('Techniques with visibility: ' + str(model.get_visible_techniques()) + ' of ' + str(sum(model.weights)))
+    print('')
+    str_format = '{:<5s} {:<24s} {:<48s} {:>11s} {:>11s}'
+    print(str_format.format('Rank', 'Applicable to', 'Data source', 'Score gain', 'Techniques'))
+    print('-' * 103)
+    for rank, ((score_gain, techniques), (system, name)) in enumerate(ranking[:top], start=1):
+        print(str_format.format(str(rank), model.applicable_to[system][:24], name[:48], '{:.2f}'.format(score_gain),
+                                '+' + str(techniques)))
+
+
+def _load_costs(filename):
+    """
+    Load the cost of the data sources from a YAML file with per data source name its cost.
+    :param filename: the YAML file
+    :return: dictionary {data source name: cost}, or None when the file contains invalid costs
+    """
+    costs = {}
+    for name, cost in (load_yaml_file(filename) or {}).items():
+        if not isinstance(cost, (int, float)) or cost <= 0:
+            print('[!] Invalid cost for the data source \'' + str(name) + '\' in ' + filename + ': the cost must be a '
+                  'number above 0')
+            return None
+        costs[str(name)] = cost
+    return costs
+
+
+def _get_plan_gain(model, candidate, objective):
+    """
+    Get the gain of a data source for the objective of the plan.
+    :param model: VisibilityModel object
+    :param candidate: tuple (system, data source name)
+    :param objective: 'score' (the visibility score) or 'techniques' (the techniques with visibility)
+    :return: the gain
+    """
+    return model.gain(candidate)[0 if objective == 'score' else 1]
+
+
+def _plan_greedy(model, candidates, costs, budget, objective):
+    """
+    Select the data sources to enable using greedy selection with lazy evaluation: the gain of a data source only
+    decreases when other data sources are enabled, so the gain is only evaluated again when the data source is on top
+    of the priority queue (with its previous gain per cost). The selected data sources are enabled within the model.
+    :param model: VisibilityModel object
+    :param candidates: list of (system, data source name)
+    :param costs: dictionary {candidate: cost}
+    :param budget: the budget for the total cost of the selected data sources
+    :param objective: 'score' or 'techniques'
+    :return: list of selected candidates, in order of selection
+    """
+    import heapq
+
+    heap = [(-_get_plan_gain(model, c, objective) / costs[c], i, c) for i, c in enumerate(candidates)]
+    heapq.heapify(heap)
+    plan = []
+    spent = 0
+    while heap:
+        _, i, c = heapq.heappop(heap)
+        if spent + costs[c] > budget:
+            # the budget only decreases, so this data source will not fit anymore
+            continue
+        ratio = _get_plan_gain(model, c, objective) / costs[c]
+        if heap and ratio < -heap[0][0]:
+            heapq.heappush(heap, (-ratio, i, c))
+            continue
+        if ratio <= 0:
+            break
+        plan.append(c)
+        spent += costs[c]
+        model.enable(c)
+    return plan
+
+
+def _plan_optimal(model, candidates, costs, budget, objective):
+    """
+    Select the data sources to enable by solving the integer linear program with the PuLP solver.
+    :param model: VisibilityModel object
+    :param candidates: list of (system, data source name)
+    :param costs: dictionary {candidate: cost}
+    :param budget: the budget for the total cost of the selected data sources
+    :param objective: 'score' or 'techniques'
+    :return: list of selected candidates (not ordered), or None when the solver is not available or did not find the
+    optimal solution
+    """
+    try:
+        import pulp
+    except ImportError:
+        print('[!] The --plan-optimal argument requires the Python package \'pulp\'. Greedy selection is used instead.')
+        return None
+
+    problem = pulp.LpProblem('data_source_plan', pulp.LpMaximize)
+    x = dict((c, pulp.LpVariable('x_%d' % i, cat='Binary')) for i, c in enumerate(candidates))
+    problem += pulp.lpSum(costs[c] * x[c] for c in candidates) <= budget
+    if objective == 'score':
+        problem += pulp.lpSum(model.gain(c)[0] * x[c] for c in candidates)
+    else:
+        # a technique without visibility gets visibility when one of the data sources it uses is enabled
+        enabled_by = {}
+        for c in candidates:
+            for tech, _ in model._get_effects(c):
+                if not any(counts[1] for counts in model.counts[tech].values()):
+                    enabled_by.setdefault(tech, []).append(c)
+        y = dict((tech, pulp.LpVariable('y_%d' % tech, cat='Binary')) for tech in enabled_by)
+        for tech, tech_candidates in enabled_by.items():
+            problem += y[tech] <= pulp.lpSum(x[c] for c in tech_candidates)
+        problem += pulp.lpSum(model.weights[tech] * y[tech] for tech in enabled_by)
+
+    problem.solve(pulp.PULP_CBC_CMD(msg=False))
+    if pulp.LpStatus[problem.status] != 'Optimal':
+        print('[!] The solver did not find the optimal solution (' + pulp.LpStatus[problem.status] + '). Greedy '
+              'selection is used instead.')
+        return None
+    return [c for c in candidates if x[c].value() > 0.5]
+
+
+def plan_data_sources(filename, budget, groups, costs_file, objective, optimal, output_filename):
+    """
+    Plan which data sources to enable for which system, to maximize the visibility within the budget. The visibility
+    is weighted by the techniques of the provided groups. The sequence of data sources and the cumulative visibility
+    are printed and written to a JSON file.
+    :param filename: the filename of the YAML file containing the data sources administration, or a dict
+    :param budget: the number of data sources to enable, or the total cost when costs are provided
+    :param groups: list of group IDs/names/aliases or a group administration YAML file, or None
+    :param costs_file: YAML file with per data source name its cost (default cost is 1), or None
+    :param objective: 'score' (the visibility score) or 'techniques' (the techniques with visibility)
+    :param optimal: select the data sources using an integer linear program solver instead of greedy selection
+    :param output_filename: output filename defined by the user
+    :return:
+    """
+    costs = _load_costs(costs_file) if costs_file else {}
+    if costs is None:
+        return
+    model = _load_visibility_model(filename, groups)
+    if model is None:
+        return
+
+    candidates = model.get_candidates()
+    candidate_costs = dict((c, costs.get(c[1], 1)) for c in candidates)
+    start_score, max_score = model.get_score()
+    start_techniques = model.get_visible_techniques()
+
+    method = 'greedy'
+    selected = _plan_optimal(model, candidates, candidate_costs, budget, objective) if optimal else None
+    if selected is not None:
+        method = 'optimal'
+        # order the selected data sources by their gain
+        plan = _plan_greedy(model, selected, candidate_costs, float('inf'), objective)
+    else:
+        affordable = [c for c in candidates if candidate_costs[c] <= budget]
+        best_single = max(affordable, key=lambda c: _get_plan_gain(model, c, objective), default=None)
+        best_single_gain = _get_plan_gain(model, best_single, objective) if best_single is not None else 0
+        plan = _plan_greedy(model, candidates, candidate_costs, budget, objective)
+        # with costs, the greedy selection by gain per cost can be worse than the best data source on its own
+        if costs and (model.get_score()[0] - start_score if objective == 'score'
+                      else model.get_visible_techniques() - start_techniques) < best_single_gain:
+            model = _load_visibility_model(filename, groups)
+            plan = _plan_greedy(model, [best_single], candidate_costs, budget, objective)
+
+    # the cumulative visibility when enabling the data sources in the order of the plan
+    model = _load_visibility_model(filename, groups)
+    curve = []
+    spent = 0
+    for c in plan:
+        spent += candidate_costs[c]
+        model.enable(c)
+        score = model.get_score()[0]
+        curve.append({'applicable_to': model.applicable_to[c[0]], 'data_source': c[1], 'cost': candidate_costs[c],
+                      'total_cost': spent, 'score': round(score, 2),
+                      'coverage': round(score / max_score * 100, 1) if max_score else 0,
+                      'techniques': model.get_visible_techniques()})
+
+    print('Plan (' + method + ', objective: ' + objective + ', budget: ' + '{:g}'.format(budget) + ')')
+    print('Current visibility score: ' + '{:.2f}'.format(start_score) + ' of ' + '{:.2f}'.format(max_score) +
+          (' ({:.1f}%)'.format(start_score / max_score * 100) if max_score else ''))
+    print('Techniques with visibility: ' + str(start_techniques) + ' of ' + str(sum(model.weights)))
+    print('')
+    str_format = '{:<5s} {:<24s} {:<40s} {:>6s} {:>8s} {:>9s} {:>11s}'
+    print(str_format.format('Step', 'Applicable to', 'Data source', 'Cost', 'Score', 'Coverage', 'Techniques'))
+    print('-' * 109)
+    for step, p in enumerate(curve, start=1):
+        print(str_format.format(str(step), p['applicable_to'][:24], p['data_source'][:40], '{:g}'.format(p['cost']),
+                                '{:.2f}'.format(p['score']), str(p['coverage']) + '%', str(p['techniques'])))
+    print('')
+
+    plan_json = {'name': model.name, 'method': method, 'objective': objective, 'budget': budget,
+                 'start': {'score': round(start_score, 2), 'max_score': round(max_score, 2),
+                           'coverage': round(start_score / max_score * 100, 1) if max_score else 0,
+                           'techniques': start_techniques},
+                 'plan': curve}
+    if not output_filename:
+        output_filename = create_output_filename('data_source_plan', model.name)
+    elif output_filename.endswith('.json'):
+        output_filename = output_filename.replace('.json', '')
+    write_file(output_filename, simplejson.dumps(plan_json, indent=4))
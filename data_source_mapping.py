@@ -1,3 +1,4 @@
+import hashlib
 import xlsxwriter
 import simplejson
 from copy import deepcopy
@@ -6,30 +7,21 @@ from itertools import chain
 from generic import *
 from file_output import *
 from navigator_layer import *
+from file_state import get_file_cache, update_file_cache
+from instrumentation import phase
+from applicability import get_platform_mask, get_availability_mask, get_technique_mask, get_technique_data_sources
 # Imports for pandas and plotly are because of performance reasons in the function that uses these libraries.
 
 
-def _count_applicable_data_sources(technique, applicable_data_sources, applicable_dettect_data_sources):
+def _count_applicable_data_sources(technique, applicable_mask):
     """
     get the count of applicable (DeTT&CT) data sources for the provided technique.
     This takes into account which data sources are applicable for a platform(s).
     :param technique: ATT&CK CTI technique object
-    :param applicable_data_sources: a list of applicable ATT&CK data sources
-    :param applicable_dettect_data_sources: a list of applicable DeTT&CT data sources
+    :param applicable_mask: mask of the applicable data sources (see 'applicability.get_platform_mask')
     :return: a count of the applicable data sources for this technique
     """
-    applicable_ds_count = 0
-
-    for ds in technique['x_mitre_data_sources']:
-        ds = ds.split(':')[1][1:]
-        if ds in applicable_data_sources:
-            applicable_ds_count += 1
-
-    for ds in technique['dettect_data_sources']:
-        if ds in applicable_dettect_data_sources:
-            applicable_ds_count += 1
-
-    return applicable_ds_count
+    return (get_technique_mask(technique) & applicable_mask).bit_count()
 
 
 def _system_in_data_source_details_object(data_source, system):
@@ -45,10 +37,117 @@ def _system_in_data_source_details_object(data_source, system):
     return False
 
 
-def _map_and_colorize_techniques(my_ds, systems, exceptions, domain):
+def _get_data_source_technique_index(techniques):
+    """
+    Create an index from (DeTT&CT) data source to the techniques in which the data source is used.
+    :param techniques: list of ATT&CK CTI technique objects
+    :return: dictionary {data source: set(technique IDs)}
+    """
+    index = {}
+    for t in techniques:
+        for ds in chain((ds.split(':')[1][1:] for ds in t['x_mitre_data_sources']), t['dettect_data_sources']):
+            index.setdefault(ds, set()).add(t['technique_id'])
+    return index
+
+
+def _get_technique_visibility_record(technique, systems_data_sources):
+    """
+    Determine per system which of the technique's applicable data sources are available.
+    :param technique: ATT&CK CTI technique object
+    :param systems_data_sources: list with per system a tuple: (applicable_to value in lowercase, set of ATT&CK
+    platforms, mask of the applicable data sources, mask of the available data sources)
+    :return: list with per system None when the system's platform(s) do not match the technique, otherwise a tuple
+    with the count of applicable data sources and the list of available data sources
+    """
+    record = []
+    mitre_platforms = set(technique.get('x_mitre_platforms', []))
+    technique_mask = get_technique_mask(technique)
+    for app_to, platforms, applicable_mask, available_mask in systems_data_sources:
+        # the system is relevant for this technique due to a match in ATT&CK platform
+        if not platforms.intersection(mitre_platforms):
+            record.append(None)
+            continue
+
+        applicable = technique_mask & applicable_mask
+        available_data_sources = []
+        # the data sources that are applicable to this system and available
+        if applicable & available_mask:
+            available_data_sources = list(chain(*get_technique_data_sources(technique, applicable & available_mask)))
+
+        record.append((applicable.bit_count(), available_data_sources))
+
+    return record
+
+
+def get_systems_data_sources(my_ds, systems, domain):
+    """
+    Get per data source the systems for which it is available, and per system the applicable and available data
+    sources (as masks).
+    :param my_ds: the configured data sources
+    :param systems: the systems YAML object from the data source file
+    :param domain: the specified domain
+    :return: tuple with a dictionary {data source: set of applicable_to values in lowercase} and a list with per system
+    a tuple: (applicable_to value in lowercase, set of ATT&CK platforms, mask of the applicable data sources, mask of
+    the available data sources)
+    """
+    ds_systems = {k: set(a.lower() for ds_detail in v['data_source'] for a in ds_detail['applicable_to'] if a is not None)
+                  for k, v in my_ds.items()}
+    systems_data_sources = []
+    for s in systems:
+        app_to = s['applicable_to'].lower()
+        systems_data_sources.append((app_to, set(s['platform']), get_platform_mask(s['platform'], domain),
+                                     get_availability_mask(k for k, v in ds_systems.items() if app_to in v)))
+    return ds_systems, systems_data_sources
+
+
+def _get_visibility_records(filename, my_ds, systems, domain, techniques):
+    """
+    Get per technique and system the applicable and available data sources. The result is cached per data source
+    administration file, together with the systems per available data source. When only data sources changed since
+    the previous run, only the techniques in which these data sources are used are determined again (using an index
+    from data source to techniques).
+    :param filename: the filename of the YAML file containing the data sources administration, or a dict
+    :param my_ds: the configured data sources
+    :param systems: the systems YAML object from the data source file
+    :param domain: the specified domain
+    :param techniques: list of ATT&CK CTI technique objects
+    :return: dictionary {technique ID: record} (see '_get_technique_visibility_record')
+    """
+    ds_systems, systems_data_sources = get_systems_data_sources(my_ds, systems, domain)
+
+    # the records only remain valid for the same ATT&CK data, systems and domain
+    fingerprint = hashlib.sha1(repr((domain, [(s[0], sorted(s[1]), s[2]) for s in systems_data_sources],
+                                     [(t['technique_id'], t.get('x_mitre_platforms', []), t['x_mitre_data_sources'],
+                                       t['dettect_data_sources']) for t in techniques])).encode()).hexdigest()
+
+    cache = get_file_cache(filename, 'visibility_records') if isinstance(filename, str) else None
+    if cache and cache['fingerprint'] == fingerprint:
+        records = cache['records']
+        changed_ds = [ds for ds in set(ds_systems).union(cache['ds_systems']) if ds_systems.get(ds) != cache['ds_systems'].get(ds)]
+        if not changed_ds:
+            return records
+        index = _get_data_source_technique_index(techniques)
+        affected_tech_ids = set(chain.from_iterable(index.get(ds, ()) for ds in changed_ds))
+    else:
+        records = {}
+        affected_tech_ids = None
+
+    for t in techniques:
+        if affected_tech_ids is None or t['technique_id'] in affected_tech_ids:
+            records[t['technique_id']] = _get_technique_visibility_record(t, systems_data_sources)
+
+    if isinstance(filename, str):
+        update_file_cache(filename, 'visibility_records', {'fingerprint': fingerprint, 'ds_systems': ds_systems, 'records': records})
+
+    return records
+
+
+@phase(PHASE_MAPPING)
+def _map_and_colorize_techniques(filename, my_ds, systems, exceptions, domain):
     """
     Determine the color of the technique based on how many data sources are available per technique. Also, it will
     create much of the content for the Navigator layer.
+    :param filename: the filename of the YAML file containing the data sources administration, or a dict
     :param my_ds: the configured data sources
     :param systems: the systems YAML object from the data source file
     :param exceptions: the list of ATT&CK technique exception within the data source YAML file
@@ -56,52 +155,26 @@ def _map_and_colorize_techniques(my_ds, systems, exceptions, domain):
     :return: a dictionary with techniques that can be used in the layer's output file
     """
     techniques = load_attack_data(DATA_TYPE_STIX_ALL_TECH_ENTERPRISE if domain == 'enterprise-attack' else DATA_TYPE_STIX_ALL_TECH_ICS if domain == 'ics-attack' else DATA_TYPE_STIX_ALL_TECH_MOBILE)
+    records = _get_visibility_records(filename, my_ds, systems, domain, techniques)
+    exceptions = set(map(lambda x: x.upper(), exceptions))
+    systems_applicable_masks = [get_platform_mask(s['platform'], domain) for s in systems]
     output_techniques = []
 
     for t in techniques:
         tech_id = t['technique_id']
-        if tech_id not in list(map(lambda x: x.upper(), exceptions)):
-            scores_idx = 0
+        if tech_id not in exceptions:
+            # calculate visibility score per system for which the system is relevant for this technique due to a
+            # match in ATT&CK platform
             ds_scores = []
-            system_available_data_sources = {}
-
-            # calculate visibility score per system
-            for system in systems:
-                # the system is relevant for this technique due to a match in ATT&CK platform
-                if len(set(system['platform']).intersection(set(t['x_mitre_platforms']))) > 0:
-                    applicable_data_sources = get_applicable_data_sources_platform(system['platform'], domain)
-                    applicable_dettect_data_sources = get_applicable_dettect_data_sources_platform(system['platform'], domain)
-                    total_ds_count = _count_applicable_data_sources(t, applicable_data_sources, applicable_dettect_data_sources)
-
-                    if total_ds_count > 0:  # the system's platform has a data source applicable to this technique
-                        ds_count = 0
-                        for ds in t['x_mitre_data_sources']:
-                            ds = ds.split(':')[1][1:]
-                            # the ATT&CK data source is applicable to this system and available
-                            if ds in applicable_data_sources and ds in my_ds.keys() and _system_in_data_source_details_object(my_ds[ds], system):
-                                if ds_count == 0:
-                                    system_available_data_sources[scores_idx] = [ds]
-                                else:
-                                    system_available_data_sources[scores_idx].append(ds)
-                                ds_count += 1
-
-                        for cdc in t['dettect_data_sources']:
-                            if cdc in applicable_dettect_data_sources and cdc in my_ds.keys() and _system_in_data_source_details_object(my_ds[cdc], system):
-                                if ds_count == 0:
-                                    system_available_data_sources[scores_idx] = [cdc]
-                                else:
-                                    system_available_data_sources[scores_idx].append(cdc)
-                                ds_count += 1
-
-                        if ds_count > 0:
-                            ds_scores.append((float(ds_count) / float(total_ds_count)) * 100)
-                        else:
-                            ds_scores.append(0)  # none of the applicable data sources are available for this system
+            for system_record in records[tech_id]:
+                if system_record is not None:
+                    total_ds_count, available_data_sources = system_record
+                    if total_ds_count > 0 and available_data_sources:
+                        ds_scores.append((float(len(available_data_sources)) / float(total_ds_count)) * 100)
                     else:
-                        # the technique is applicable to this system (and thus its platform(s)),
-                        # but none of the technique's listed data source are applicable for its platform(s)
+                        # none of the applicable data sources are available for this system, or none of the
+                        # technique's listed data source are applicable for its platform(s)
                         ds_scores.append(0)
-                    scores_idx += 1
 
             # Populate the metadata.
             avg_ds_score = 0
@@ -120,26 +193,19 @@ def _map_and_colorize_techniques(my_ds, systems, exceptions, domain):
             d['metadata'] = []
 
             scores_idx = 0
-            divider = 0
-            for system in systems:
-                # the system is relevant for this technique due to a match in ATT&CK platform
-                if len(set(system['platform']).intersection(set(t['x_mitre_platforms']))) > 0:
+            for system, system_record, applicable_mask in zip(systems, records[tech_id], systems_applicable_masks):
+                if system_record is not None:
                     score = ds_scores[scores_idx]
 
-                    if divider != 0:
+                    if scores_idx != 0:
                         d['metadata'].append({'divider': True})
-                    divider += 1
 
                     d['metadata'].append({'name': 'Applicable to', 'value': system['applicable_to']})
 
-                    app_data_sources = get_applicable_data_sources_technique(
-                        t['x_mitre_data_sources'], get_applicable_data_sources_platform(system['platform'], domain))
-                    app_dettect_data_sources = get_applicable_dettect_data_sources_technique(
-                        t['dettect_data_sources'], get_applicable_dettect_data_sources_platform(system['platform'], domain))
+                    app_data_sources, app_dettect_data_sources = get_technique_data_sources(t, applicable_mask)
 
                     if score > 0:
-                        d['metadata'].append({'name': 'Available data sources', 'value': ', '.join(
-                            system_available_data_sources[scores_idx])})
+                        d['metadata'].append({'name': 'Available data sources', 'value': ', '.join(system_record[1])})
                     else:
                         d['metadata'].append({'name': 'Available data sources', 'value': ''})
 
@@ -194,7 +260,7 @@ def generate_data_sources_layer(filename, output_filename, layer_name, layer_set
     my_data_sources, name, systems, exceptions, domain = load_data_sources(filename)
 
     # Do the mapping between my data sources and MITRE data sources:
-    my_techniques = _map_and_colorize_techniques(my_data_sources, systems, exceptions, domain)
+    my_techniques = _map_and_colorize_techniques(filename, my_data_sources, systems, exceptions, domain)
 
     if not layer_name:
         layer_name = 'Data sources ' + name
@@ -203,12 +269,257 @@ def generate_data_sources_layer(filename, output_filename, layer_name, layer_set
     layer = get_layer_template_data_sources(layer_name, 'description', platforms, domain, layer_settings)
     layer['techniques'] = my_techniques
 
-    json_string = simplejson.dumps(layer).replace('}, ', '},\n')
+    with phase(PHASE_LAYER_SERIALIZATION):
+        json_string = simplejson.dumps(layer).replace('}, ', '},\n')
     if not output_filename:
         output_filename = create_output_filename('data_sources', name)
     write_file(output_filename, json_string)
 
 
+def _get_data_source_files(paths):
+    """
+    Get the data source administration YAML files from the provided files and/or directories. Within a directory,
+    only YAML files with the file_type 'data-source-administration' are selected.
+    :param paths: list of files and/or directories
+    :return: list of files
+    """
+    filenames = []
+    for path in paths:
+        if os.path.isdir(path):
+            for f in sorted(os.listdir(path)):
+                f = os.path.join(path, f)
+                if f.endswith(('.yaml', '.yml')) and os.path.isfile(f):
+                    # only look for the file_type, instead of loading the complete YAML file
+                    with open(f, 'r') as yaml_file:
+                        if REGEX_YAML_FILE_TYPE_DATA_SOURCE.search(yaml_file.read()):
+                            filenames.append(f)
+        else:
+            filenames.append(path)
+    return list(dict.fromkeys(filenames))
+
+
+def _load_data_source_file_for_matrix(filename):
+    """
+    Load a data source administration file for the coverage matrix. This function is executed within the worker
+    processes of 'generate_data_source_coverage_matrix'.
+    :param filename: the filename of the YAML file containing the data sources administration
+    :return: tuple with the name, domain, systems, the systems per available data source and the exceptions
+    """
+    my_ds, name, systems, exceptions, domain = load_data_sources(filename)
+    systems = [{'applicable_to': s['applicable_to'], 'platform': list(s['platform'])} for s in systems]
+    ds_systems = {k: set(a.lower() for ds_detail in v['data_source'] for a in ds_detail['applicable_to'] if a is not None)
+                  for k, v in my_ds.items()}
+    return str(name), domain, systems, ds_systems, set(map(lambda x: x.upper(), exceptions))
+
+
+@phase(PHASE_MAPPING)
+def _get_coverage_matrix(data_source_files, domain, techniques):
+    """
+    Calculate the data source coverage per technique for multiple data source administration files, in the same way
+    as for the data source layer. Systems with the same ATT&CK platform(s) and available data sources are very common
+    across files. Therefore, the coverage is calculated once per unique system profile and shared by all files.
+    :param data_source_files: list of tuples with per file the systems, the systems per available data source and
+    the exceptions
+    :param domain: the specified domain
+    :param techniques: list of ATT&CK CTI technique objects
+    :return: dictionary {technique ID: list with per file the coverage percentage or None when not applicable}
+    """
+    # {(platforms, available data sources): profile index} and per file the profile index of every system
+    profiles = {}
+    files_profiles = []
+    for systems, ds_systems, _ in data_source_files:
+        file_profiles = []
+        for system in systems:
+            app_to = system['applicable_to'].lower()
+            available = frozenset(k for k, v in ds_systems.items() if app_to in v)
+            file_profiles.append(profiles.setdefault((frozenset(system['platform']), available), len(profiles)))
+        files_profiles.append(file_profiles)
+
+    # every profile is handled as a system with its index as applicable_to value
+    systems_data_sources = []
+    for (platforms, available), idx in profiles.items():
+        systems_data_sources.append((str(idx), set(platforms), get_platform_mask(platforms, domain),
+                                     get_availability_mask(available)))
+
+    matrix = {}
+    for t in techniques:
+        profile_scores = []
+        for system_record in _get_technique_visibility_record(t, systems_data_sources):
+            if system_record is None:
+                profile_scores.append(None)
+            elif system_record[0] > 0 and system_record[1]:
+                profile_scores.append((float(len(system_record[1])) / float(system_record[0])) * 100)
+            else:
+                profile_scores.append(0)
+
+        scores = []
+        for (_, _, exceptions), file_profiles in zip(data_source_files, files_profiles):
+            ds_scores = [profile_scores[idx] for idx in file_profiles if profile_scores[idx] is not None]
+            if t['technique_id'] in exceptions or not ds_scores:
+                scores.append(None)
+            else:
+                scores.append(float(sum(ds_scores)) / float(len(ds_scores)))
+        matrix[t['technique_id']] = scores
+
+    return matrix
+
+
+def _export_coverage_matrix_to_excel(matrix, names, techniques, domain, output_filename):
+    """
+    Write the data source coverage matrix (technique x data source administration file) to an Excel sheet.
+    :param matrix: dictionary {technique ID: list with per file the coverage percentage or None}
+    :param names: the names of the data source administration files
+    :param techniques: dictionary {technique ID: ATT&CK CTI technique object}
+    :param domain: the specified domain
+    :param output_filename: output filename without extension
+    :return:
+    """
+    excel_filename = get_non_existing_filename('output/' + output_filename, 'xlsx')
+    workbook = xlsxwriter.Workbook(excel_filename)
+    worksheet = workbook.add_worksheet('Coverage matrix')
+
+    # Formatting:
+    format_bold_left = workbook.add_format({'align': 'left', 'bold': True})
+    format_title = workbook.add_format({'align': 'left', 'bold': True, 'font_size': '14'})
+    format_score = [workbook.add_format({'align': 'center'}),
+                    workbook.add_format({'align': 'center', 'bg_color': COLOR_DS_25p}),
+                    workbook.add_format({'align': 'center', 'bg_color': COLOR_DS_50p}),
+                    workbook.add_format({'align': 'center', 'bg_color': COLOR_DS_75p, 'font_color': '#ffffff'}),
+                    workbook.add_format({'align': 'center', 'bg_color': COLOR_DS_99p, 'font_color': '#ffffff'}),
+                    workbook.add_format({'align': 'center', 'bg_color': COLOR_DS_100p, 'font_color': '#ffffff'})]
+
+    # Title
+    worksheet.write(0, 0, 'Data source coverage per technique (% of data sources available)', format_title)
+    worksheet.write(1, 0, 'Domain: ' + domain)
+
+    # Header columns
+    y = 3
+    header = ['Technique ID', 'Technique name'] + names + ['Min', 'Avg', 'Max']
+    for x, value in enumerate(header):
+        worksheet.write(y, x, value, format_bold_left)
+    worksheet.autofilter(y, 0, y, len(header) - 1)
+    worksheet.freeze_panes(y + 1, 2)
+    worksheet.set_column(0, 0, 14)
+    worksheet.set_column(1, 1, 40)
+    worksheet.set_column(2, len(header) - 1, 12)
+
+    for tech_id, scores in sorted(matrix.items()):
+        applicable_scores = [s for s in scores if s is not None]
+        if not applicable_scores:
+            continue
+        y += 1
+        worksheet.write(y, 0, tech_id)
+        worksheet.write(y, 1, techniques[tech_id]['name'])
+        aggregates = [min(applicable_scores), sum(applicable_scores) / len(applicable_scores), max(applicable_scores)]
+        for x, score in enumerate(scores + aggregates, 2):
+            if score is not None:
+                idx = 0 if score == 0 else 1 if score <= 25 else 2 if score <= 50 else 3 if score <= 75 else 4 if score <= 99 else 5
+                worksheet.write_number(y, x, int(score), format_score[idx])
+
+    try:
+        workbook.close()
+        print('File written:   ' + excel_filename)
+    except Exception as e:
+        print('[!] Error while writing Excel file: %s' % str(e))
+
+
+def generate_data_source_coverage_matrix(paths, aggregate, health_is_called, output_filename, layer_name, layer_settings):
+    """
+    Compare the data source coverage of multiple data source administration files (e.g. one per business unit). The
+    coverage per technique and file is calculated in the same way as for the data source layer, and written to a
+    matrix (JSON and Excel) and an aggregate Navigator layer with the minimum, average and maximum coverage. The
+    files are loaded in parallel using one worker process per CPU core.
+    :param paths: list of data source administration YAML files and/or directories containing these files
+    :param aggregate: the aggregate (min, avg or max) that determines the color of a technique in the layer
+    :param health_is_called: boolean that specifies if detailed errors in the file will be printed
+    :param output_filename: output filename defined by the user
+    :param layer_name: the name of the Navigator layer
+    :param layer_settings: settings for the Navigator layer
+    :return: returns None when something went wrong
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    filenames = _get_data_source_files(paths)
+    if not filenames:
+        print('[!] No data source administration YAML files found.')
+        return None
+
+    for filename in filenames:
+        if not check_file(filename, FILE_TYPE_DATA_SOURCE_ADMINISTRATION, health_is_called):
+            return None
+
+    with ProcessPoolExecutor() as executor:
+        results = list(executor.map(_load_data_source_file_for_matrix, filenames))
+
+    data_source_files = []
+    names = []
+    platforms = set()
+    domain = results[0][1]
+    for filename, (name, file_domain, systems, ds_systems, exceptions) in zip(filenames, results):
+        if file_domain != domain:
+            print('[!] All data source administration files should have the same value for \'domain\'. The file: ' +
+                  filename + ' has the domain: ' + file_domain + ' instead of: ' + domain)
+            return None
+        data_source_files.append((systems, ds_systems, exceptions))
+        # the name of the file is used to identify it, unless another file has the same name
+        names.append(name if name not in names else '%s (%s)' % (name, os.path.basename(filename)))
+        platforms.update(chain.from_iterable(map(lambda k: k['platform'], systems)))
+
+    techniques = load_attack_data(DATA_TYPE_STIX_ALL_TECH_ENTERPRISE if domain == 'enterprise-attack' else DATA_TYPE_STIX_ALL_TECH_ICS if domain == 'ics-attack' else DATA_TYPE_STIX_ALL_TECH_MOBILE)
+    matrix = _get_coverage_matrix(data_source_files, domain, techniques)
+
+    if not output_filename:
+        output_filename = 'data_sources_matrix'
+    elif output_filename.endswith('.json'):
+        output_filename = output_filename.replace('.json', '')
+
+    # matrix: technique x data source administration file
+    matrix_json = {'domain': domain, 'files': [{'name': n, 'file': f} for n, f in zip(names, filenames)], 'techniques': []}
+    layer_techniques = []
+    for t in techniques:
+        scores = matrix[t['technique_id']]
+        applicable_scores = [s for s in scores if s is not None]
+        if not applicable_scores:
+            continue
+        aggregates = {'min': min(applicable_scores), 'avg': sum(applicable_scores) / len(applicable_scores),
+                      'max': max(applicable_scores)}
+        matrix_json['techniques'].append({'technique_id': t['technique_id'], 'technique_name': t['name'],
+                                          'scores': [round(s, 1) if s is not None else None for s in scores],
+                                          'min': round(aggregates['min'], 1), 'avg': round(aggregates['avg'], 1),
+                                          'max': round(aggregates['max'], 1)})
+
+        score = aggregates[aggregate]
+        d = {'techniqueID': t['technique_id'], 'score': int(score), 'comment': '', 'enabled': True, 'metadata': []}
+        if score > 0:
+            d['color'] = COLOR_DS_25p if score <= 25 else COLOR_DS_50p if score <= 50 else COLOR_DS_75p \
+                if score <= 75 else COLOR_DS_99p if score <= 99 else COLOR_DS_100p
+        for k in ['min', 'avg', 'max']:
+            d['metadata'].append({'name': k.capitalize() + ' score', 'value': str(int(aggregates[k])) + '%'})
+        d['metadata'].append({'divider': True})
+        for n, s in zip(names, scores):
+            d['metadata'].append({'name': n, 'value': str(int(s)) + '%' if s is not None else 'n/a'})
+        d['metadata'] = make_layer_metadata_compliant(d['metadata'])
+        layer_techniques.append(d)
+
+    matrix_json['techniques'].sort(key=lambda k: k['technique_id'])
+    with phase(PHASE_LAYER_SERIALIZATION):
+        json_string = simplejson.dumps(matrix_json, indent=2)
+    write_file(output_filename, json_string)
+
+    determine_and_set_show_sub_techniques(layer_techniques)
+    if not layer_name:
+        layer_name = 'Data sources coverage - %s of %d files' % (aggregate, len(filenames))
+    all_platforms = PLATFORMS_ENTERPRISE if domain == 'enterprise-attack' else PLATFORMS_ICS if domain == 'ics-attack' else PLATFORMS_MOBILE
+    layer = get_layer_template_data_sources(layer_name, 'description', [p for p in all_platforms.values() if p in platforms],
+                                            domain, layer_settings)
+    layer['techniques'] = layer_techniques
+    with phase(PHASE_LAYER_SERIALIZATION):
+        json_string = simplejson.dumps(layer).replace('}, ', '},\n')
+    write_file(output_filename + '_layer', json_string)
+
+    _export_coverage_matrix_to_excel(matrix, names, {t['technique_id']: t for t in techniques}, domain, output_filename)
+
+
 def plot_data_sources_graph(filename, output_filename):
     """
     Generates a line graph which shows the improvements on numbers of data sources through time.
@@ -472,22 +783,18 @@ def _add_visibility_object_to_dict(dict_vis_objects, tech_id, vis_obj):
     return dict_vis_objects
 
 
-def update_technique_administration_file(file_data_sources, file_tech_admin):
+def _check_visibility_update(new_visibility_scores, file_data_sources, file_tech_admin):
     """
-    Update the visibility scores in the provided technique administration file
+    Check if the visibility scores within the technique administration file can be updated with the new visibility
+    scores derived from the data source administration file: the platform(s), domain and applicable_to values of
+    the technique administration file need to be present within the data source administration file.
+    :param new_visibility_scores: the new visibility scores as generated by 'generate_technique_administration_file'
     :param file_data_sources: file location of the data source admin. file
     :param file_tech_admin: file location of the tech. admin. file
-    :return:
+    :return: tuple with the current visibility scores and the platform(s) of the tech. admin. file, or (None, None)
+    when the update cannot continue
     """
-    file_updated = False
-
-    # first we generate the new visibility scores contained within a temporary tech. admin YAML 'file'
-    new_visibility_scores = generate_technique_administration_file(file_data_sources, None, write_file=False, all_techniques=True)
-
-    # we get the date to remove the single quotes from the date at the end of of this function's code
-    today = new_visibility_scores['techniques'][0]['visibility'][0]['score_logbook'][0]['date']
-
-    # next, we load the current visibility scores from the tech. admin file
+    # load the current visibility scores from the tech. admin file
     cur_visibility_scores, _, platform_tech_admin, domain_tech_admin = load_techniques(file_tech_admin)
 
     # last, we get the systems kv-pair from the data source file
@@ -505,7 +812,7 @@ def update_technique_administration_file(file_data_sources, file_tech_admin):
         _print_ds_systems(systems)
         print('\nVisibility update canceled.')
 
-        return
+        return None, None
 
     # if the tech admin. file has an applicable_to value not present in the DS admin. file we return
     app_ds = set([s['applicable_to'].lower() for s in systems])
@@ -527,7 +834,7 @@ def update_technique_administration_file(file_data_sources, file_tech_admin):
               'the data source administration file. This should be fixed before the visibility update can continue.')
         print('\nVisibility update canceled.')
 
-        return
+        return None, None
 
     if len(set(app_tech).difference(app_ds)) > 0:
         print('[!] The technique administration file has visibility objects with \'applicable_to\' values that are not '
@@ -541,6 +848,26 @@ def update_technique_administration_file(file_data_sources, file_tech_admin):
         _print_ds_systems(systems)
         print('\nVisibility update canceled.')
 
+        return None, None
+
+    return cur_visibility_scores, platform_tech_admin
+
+
+def update_technique_administration_file(file_data_sources, file_tech_admin):
+    """
+    Update the visibility scores in the provided technique administration file
+    :param file_data_sources: file location of the data source admin. file
+    :param file_tech_admin: file location of the tech. admin. file
+    :return:
+    """
+    file_updated = False
+
+    # first we generate the new visibility scores contained within a temporary tech. admin YAML 'file'
+    new_visibility_scores = generate_technique_administration_file(file_data_sources, None, write_file=False, all_techniques=True)
+
+    # check if the technique and data source administration files are in line with each other
+    cur_visibility_scores, platform_tech_admin = _check_visibility_update(new_visibility_scores, file_data_sources, file_tech_admin)
+    if cur_visibility_scores is None:
         return
 
     # we did not return, so init and start the upgrade :-)
@@ -843,14 +1170,231 @@ def update_technique_administration_file(file_data_sources, file_tech_admin):
         print('')
         backup_file(file_tech_admin)
 
-        yaml_file_tech_admin_updated = fix_date_and_remove_null(yaml_file_tech_admin_updated, today, input_type='ruamel')
-
-        with open(file_tech_admin, 'w') as fd:
-            fd.writelines(yaml_file_tech_admin_updated)
+        write_yaml_file(yaml_file_tech_admin_updated, file_tech_admin)
         print('File written:   ' + file_tech_admin)
     else:
         print('No visibility scores have been updated.')
 
+def _load_visibility_update_policy(filename):
+    """
+    Load the policy for the non-interactive visibility update. Keys that are not present in the policy file get the
+    value from the default policy.
+    :param filename: file location of the policy YAML file
+    :return: dictionary with the policy or None when the policy file is invalid
+    """
+    _yaml = init_yaml()
+    try:
+        with open(filename, 'r') as yaml_file:
+            yaml_content = _yaml.load(yaml_file)
+    except Exception as e:
+        print('[!] The visibility update policy file could not be loaded: ' + str(e))
+        return None
+
+    if not hasattr(yaml_content, 'keys') or yaml_content.get('file_type', None) != FILE_TYPE_VISIBILITY_UPDATE_POLICY:
+        print('[!] File: \'' + filename + '\' is not a visibility update policy file (file_type: ' +
+              FILE_TYPE_VISIBILITY_UPDATE_POLICY + ').')
+        return None
+
+    policy = dict(VISIBILITY_UPDATE_POLICY)
+    for key, value in yaml_content.items():
+        if key in ['version', 'file_type', 'name']:
+            continue
+        elif key not in policy:
+            print('[!] Unknown key-value pair in the visibility update policy file: ' + str(key))
+            return None
+        elif key == 'comment':
+            policy[key] = '' if value is None else str(value)
+        elif not isinstance(value, bool):
+            print('[!] The key-value pair \'' + key + '\' in the visibility update policy file should be true or false.')
+            return None
+        else:
+            policy[key] = value
+
+    return policy
+
+
+def _get_visibility_list(tech):
+    """
+    Get the visibility objects of a technique within the technique administration file as a list, which is the
+    form needed to add and remove visibility objects.
+    :param tech: technique object within the technique administration file
+    :return: list of visibility objects
+    """
+    if isinstance(tech.get('visibility', None), dict):
+        tech['visibility'] = [tech['visibility']]
+    elif not isinstance(tech.get('visibility', None), list):
+        tech['visibility'] = []
+    return tech['visibility']
+
+
+def _get_visibility_changes(new_visibility_scores, yaml_file_tech_admin, policy):
+    """
+    Determine and apply the changes to the visibility objects within the technique administration file, according to
+    the provided policy. The current visibility objects are indexed on technique ID and applicable_to values, which
+    allows the changes to be determined in one pass over the new visibility scores.
+    :param new_visibility_scores: the new visibility scores as generated by 'generate_technique_administration_file'
+    :param yaml_file_tech_admin: ruamel.yaml instance of the technique administration file, which will be updated
+    :param policy: the visibility update policy
+    :return: list of changes: dicts with the keys action, technique_id, applicable_to and (when applicable) the old
+    and new score
+    """
+    # {tech_id: [technique object, ...]} and {(tech_id, frozenset(applicable_to)): [visibility object, ...]}
+    cur_techniques = {}
+    cur_vis_objects = {}
+    for tech in yaml_file_tech_admin['techniques']:
+        cur_techniques.setdefault(tech['technique_id'], []).append(tech)
+        visibility = tech.get('visibility', [])
+        for vis_obj in [visibility] if isinstance(visibility, dict) else visibility or []:
+            key = (tech['technique_id'], frozenset(a.lower() for a in vis_obj['applicable_to']))
+            cur_vis_objects.setdefault(key, []).append(vis_obj)
+
+    changes = []
+    for new_tech in new_visibility_scores['techniques']:
+        tech_id = new_tech['technique_id']
+
+        if tech_id not in cur_techniques:
+            # the technique is only added when we now have visibility
+            if policy['add_techniques'] and any(v['score_logbook'][0]['score'] > 0 for v in new_tech['visibility']):
+                yaml_file_tech_admin['techniques'].append(new_tech)
+                for new_vis_obj in new_tech['visibility']:
+                    changes.append({'action': 'technique-added', 'technique_id': tech_id,
+                                    'applicable_to': new_vis_obj['applicable_to'],
+                                    'new_score': new_vis_obj['score_logbook'][0]['score']})
+            continue
+
+        # visibility objects with an EXACT match on the applicable_to value(s): add a new score if it has changed
+        matched_keys = set()
+        unmatched_new_vis_objects = []
+        for new_vis_obj in new_tech['visibility']:
+            key = (tech_id, frozenset(a.lower() for a in new_vis_obj['applicable_to']))
+            if key not in cur_vis_objects:
+                unmatched_new_vis_objects.append(new_vis_obj)
+                continue
+
+            matched_keys.add(key)
+            new_score_obj = new_vis_obj['score_logbook'][0]
+            for old_vis_obj in cur_vis_objects[key]:
+                old_score = get_latest_score(old_vis_obj)
+                if new_score_obj['score'] != old_score:
+                    auto_generated = get_latest_auto_generated(old_vis_obj)
+                    change = {'technique_id': tech_id, 'applicable_to': list(old_vis_obj['applicable_to']),
+                              'old_score': old_score, 'new_score': new_score_obj['score']}
+                    if policy['update_auto_generated' if auto_generated else 'update_manual']:
+                        old_vis_obj['score_logbook'].insert(0, deepcopy(new_score_obj))
+                        change['action'] = 'score-updated'
+                    else:
+                        change['action'] = 'score-not-updated'
+                    changes.append(change)
+
+        if not unmatched_new_vis_objects:
+            continue
+
+        # visibility objects with NO match on the applicable_to value(s): add them, or replace the current
+        # visibility objects without a match
+        unmatched_old_vis_objects = [(tech, vis_obj) for tech in cur_techniques[tech_id]
+                                     for vis_obj in _get_visibility_list(tech)
+                                     if (tech_id, frozenset(a.lower() for a in vis_obj['applicable_to'])) not in matched_keys]
+        # decide per current visibility object if it may be replaced: manually assigned scores are kept, unless the
+        # policy allows to replace these
+        replaced = [(tech, vis_obj) for tech, vis_obj in unmatched_old_vis_objects
+                    if policy['replace_auto_generated' if get_latest_auto_generated(vis_obj) else 'replace_manual']]
+        kept = [vis_obj for _, vis_obj in unmatched_old_vis_objects if not any(vis_obj is v for _, v in replaced)]
+
+        # the applicable_to values of the kept visibility objects are not added again
+        kept_applicable_to = set(a.lower() for v in kept for a in v['applicable_to'])
+        new_vis_objects = []
+        if 'all' not in kept_applicable_to:
+            for new_vis_obj in unmatched_new_vis_objects:
+                new_vis_obj['applicable_to'] = [a for a in new_vis_obj['applicable_to'] if a.lower() not in kept_applicable_to]
+                if new_vis_obj['applicable_to']:
+                    new_vis_objects.append(new_vis_obj)
+
+        for tech, vis_obj in replaced:
+            # remove in place (on identity), to keep the comments and formatting of the sequence
+            del tech['visibility'][next(i for i, v in enumerate(tech['visibility']) if v is vis_obj)]
+        if new_vis_objects:
+            _get_visibility_list(cur_techniques[tech_id][0]).extend(new_vis_objects)
+            changes.append({'action': 'visibility-replaced' if replaced else 'visibility-added', 'technique_id': tech_id,
+                            'applicable_to': list(chain.from_iterable(v['applicable_to'] for v in new_vis_objects)),
+                            'old_score': [get_latest_score(v) for _, v in replaced],
+                            'new_score': [v['score_logbook'][0]['score'] for v in new_vis_objects]})
+        if kept:
+            changes.append({'action': 'visibility-not-replaced', 'technique_id': tech_id,
+                            'applicable_to': list(chain.from_iterable(v['applicable_to'] for v in kept)),
+                            'old_score': [get_latest_score(v) for v in kept], 'new_score': []})
+
+    return changes
+
+
+def update_technique_administration_file_with_policy(file_data_sources, file_tech_admin, file_policy):
+    """
+    Update the visibility scores in the provided technique administration file without user interaction. Which
+    changes are applied is decided by the policy file. The changes are written to a patch file (unified diff) in
+    the output directory, which can be reviewed and used to revert the update.
+    :param file_data_sources: file location of the data source admin. file
+    :param file_tech_admin: file location of the tech. admin. file
+    :param file_policy: file location of the visibility update policy file
+    :return:
+    """
+    import difflib
+
+    policy = _load_visibility_update_policy(file_policy)
+    if policy is None:
+        return
+
+    new_visibility_scores = generate_technique_administration_file(file_data_sources, None, write_file=False, all_techniques=True)
+
+    cur_visibility_scores, platform_tech_admin = _check_visibility_update(new_visibility_scores, file_data_sources, file_tech_admin)
+    if cur_visibility_scores is None:
+        return
+
+    if policy['comment'] != '':
+        for new_tech in new_visibility_scores['techniques']:
+            for visibility_obj in new_tech['visibility']:
+                visibility_obj['score_logbook'][0]['comment'] = policy['comment']
+
+    _yaml = init_yaml()
+    with open(file_tech_admin) as fd:
+        yaml_file_tech_admin_updated = _yaml.load(fd)
+
+    changes = []
+    for p in sorted(set(new_visibility_scores['platform']).difference(set(platform_tech_admin))):
+        yaml_file_tech_admin_updated['platform'].append(p)
+        changes.append({'action': 'platform-added', 'platform': p})
+
+    changes.extend(_get_visibility_changes(new_visibility_scores, yaml_file_tech_admin_updated, policy))
+
+    change_txt = {'platform-added': ' - Added the platform: {platform}',
+                  'technique-added': ' - A new technique was added: {technique_id:<10} (applicable to: {applicable_to}, score: {new_score})',
+                  'score-updated': ' - Updated a visibility score in technique: {technique_id:<10} (applicable to: {applicable_to}, score: {old_score} -> {new_score})',
+                  'score-not-updated': ' - A visibility score in this technique was NOT updated: {technique_id:<10} (applicable to: {applicable_to}, score: {old_score} -> {new_score})',
+                  'visibility-added': ' - A new visibility object was added to technique: {technique_id:<10} (applicable to: {applicable_to})',
+                  'visibility-replaced': ' - Replaced a visibility score in technique: {technique_id:<10} (applicable to: {applicable_to})',
+                  'visibility-not-replaced': ' - A visibility score in this technique was NOT updated: {technique_id:<10} (applicable to: {applicable_to})'}
+    for change in changes:
+        values = dict(change)
+        if 'applicable_to' in values:
+            values['applicable_to'] = ', '.join(values['applicable_to'])
+        print(change_txt[change['action']].format(**values))
+
+    if not [c for c in changes if c['action'] not in ['score-not-updated', 'visibility-not-replaced']]:
+        print('No visibility scores have been updated.')
+        return
+
+    with open(file_tech_admin) as fd:
+        old_lines = fd.readlines()
+    new_lines = get_yaml_lines(yaml_file_tech_admin_updated)
+    patch = ''.join(difflib.unified_diff(old_lines, new_lines, fromfile=file_tech_admin, tofile=file_tech_admin))
+
+    print('')
+    backup_file(file_tech_admin)
+    with atomic_open(file_tech_admin) as fd:
+        fd.writelines(new_lines)
+    print('File written:   ' + file_tech_admin)
+
+    patch_filename = create_output_filename('visibility_update', os.path.splitext(os.path.basename(file_tech_admin))[0])
+    write_file(patch_filename, patch, extension='patch')
+
 # pylint: disable=redefined-outer-name
 
 
@@ -879,37 +1423,27 @@ def generate_technique_administration_file(filename, output_filename, write_file
     yaml_file['techniques'] = []
     today = dt.now()
 
+    records = _get_visibility_records(filename, my_ds, systems, domain, techniques)
+    exceptions = set(map(lambda x: x.upper(), exceptions))
+
     # Score visibility based on the number of available data sources and the exceptions
     for t in techniques:
-        mitre_platforms = t.get('x_mitre_platforms', [])
         tech_id = t['technique_id']
         tech = None
         visibility_obj_count = 0
 
-        if tech_id not in list(map(lambda x: x.upper(), exceptions)):
+        if tech_id not in exceptions:
             # calculate visibility score per system
-            for system in systems:
+            for system, system_record in zip(systems, records[tech_id]):
                 ds_score = -1
                 platform_match = False
                 # the system is relevant for this technique due to a match in ATT&CK platform
-                if len(set(system['platform']).intersection(set(mitre_platforms))) > 0:
+                if system_record is not None:
                     platform_match = True
-                    applicable_data_sources = get_applicable_data_sources_platform(system['platform'], domain)
-                    applicable_dettect_data_sources = get_applicable_dettect_data_sources_platform(system['platform'], domain)
-                    total_ds_count = _count_applicable_data_sources(t, applicable_data_sources, applicable_dettect_data_sources)
+                    total_ds_count, available_data_sources = system_record
 
                     if total_ds_count > 0:  # the system's platform has data source applicable to this technique
-                        ds_count = 0
-                        for ds in t['x_mitre_data_sources']:
-                            ds = ds.split(':')[1][1:]
-                            # the ATT&CK data source is applicable to this system and available
-                            if ds in applicable_data_sources and ds in my_ds.keys() and _system_in_data_source_details_object(my_ds[ds], system):
-                                ds_count += 1
-
-                        for cdc in t['dettect_data_sources']:
-                            if cdc in applicable_dettect_data_sources and cdc in my_ds.keys() and _system_in_data_source_details_object(my_ds[cdc], system):
-                                ds_count += 1
-
+                        ds_count = len(available_data_sources)
                         if ds_count > 0:
                             result = (float(ds_count) / float(total_ds_count)) * 100
                             ds_score = 1 if result <= 49 else 2 if result <= 74 else 3 if result <= 99 else 4
@@ -955,25 +1489,12 @@ def generate_technique_administration_file(filename, output_filename, write_file
     yaml_file['techniques'] = sorted(yaml_file['techniques'], key=lambda k: k['technique_id'])
 
     if write_file:
-        # remove the single quotes around the date key-value pair
-        _yaml = init_yaml()
-        file = StringIO()
-
-        # create the file lines by writing it to memory
-        _yaml.dump(yaml_file, file)
-        file.seek(0)
-        file_lines = file.readlines()
-
-        # remove the single quotes from the date
-        yaml_file_lines = fix_date_and_remove_null(file_lines, today, input_type='list')
-
         if not output_filename:
             output_filename = 'techniques-administration-' + normalize_name_to_filename(name)
         elif output_filename.endswith('.yaml'):
             output_filename = output_filename.replace('.yaml', '')
         output_filename = get_non_existing_filename('output/' + output_filename, 'yaml')
-        with open(output_filename, 'w') as f:
-            f.writelines(yaml_file_lines)
+        write_yaml_file(yaml_file, output_filename)
         print("File written:   " + output_filename)
     else:
         return yaml_file
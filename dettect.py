@@ -3,12 +3,19 @@ from technique_mapping import *
 from group_mapping import *
 from eql_yaml import *
 from generic_mode import *
+from multi_domain import generate_multi_domain_layers
+from coverage_simulation import rank_data_sources, plan_data_sources
 from editor import DeTTECTEditor
 import generic
+import file_output
+import instrumentation
+from file_state import get_output_fingerprint, get_outputs, update_outputs
+from file_watch import watch_files
 import argparse
 import os
 import signal
 import sys
+import time
 from logging import getLogger, ERROR as LOGERROR
 getLogger("taxii2client").setLevel(LOGERROR)
 
@@ -21,12 +28,19 @@ def _init_menu():
     menu_parser = argparse.ArgumentParser(description='Detect Tactics, Techniques & Combat Threats',
                                           epilog='Source: https://github.com/rabobank-cdc/DeTTECT')
     menu_parser.add_argument('--version', action='version', version='%(prog)s ' + VERSION)
+    menu_parser.add_argument('--timings', help='print the wall time, number of calls and peak memory per phase: ' +
+                             ', '.join([PHASE_CACHE_LOAD, PHASE_YAML_PARSE, PHASE_UPGRADE_CHECK, PHASE_HEALTH,
+                                        PHASE_MAPPING, PHASE_LAYER_SERIALIZATION, PHASE_FILE_WRITE]) +
+                             '. Tracing the memory slows down the run', action='store_true')
+    menu_parser.add_argument('--profile', help='profile the run with cProfile, print the functions with the highest '
+                                               'cumulative time and write the statistics (pstats) to the provided file',
+                             metavar='FILE')
 
     # add subparsers
     subparsers = menu_parser.add_subparsers(title='MODE',
                                             description='Select the mode to use. Every mode has its own arguments and '
                                                         'help info displayed using: {editor, datasource, visibility, detection, '
-                                                        'group, generic} --help', metavar='', dest='subparser')
+                                                        'group, health, generic} --help', metavar='', dest='subparser')
 
     parser_editor = subparsers.add_parser('editor', aliases=['e'], help='DeTT&CT Editor',
                                           description='Start the DeTT&CT Editor for easy editing the YAML administration files')
@@ -43,7 +57,19 @@ def _init_menu():
                                                                 'the visibility scores)',
                                      required='-u' in sys.argv or '--update' in sys.argv)
     parser_data_sources.add_argument('-fd', '--file-ds', help='path to the data source administration YAML file',
-                                     required=True)
+                                     required='-m' not in sys.argv and '--matrix' not in sys.argv and
+                                     '--multi-domain' not in sys.argv)
+    parser_data_sources.add_argument('-m', '--matrix', help='compare the data source coverage of multiple data source '
+                                     'administration YAML files (e.g. one per business unit): generate a coverage '
+                                     'matrix (JSON and Excel) and an aggregate layer for the ATT&CK Navigator. Provide '
+                                     'the files and/or directories containing these files', nargs='+', metavar='PATH')
+    parser_data_sources.add_argument('--multi-domain', help='generate the data source layers for administration YAML files '
+                                     'of multiple ATT&CK domains (Enterprise, ICS and Mobile) and a combined summary. '
+                                     'The domains are processed concurrently. Provide the files and/or directories '
+                                     'containing these files', nargs='+', metavar='PATH')
+    parser_data_sources.add_argument('--matrix-aggregate', help='the aggregate of the coverage of all files which '
+                                     'determines the color of a technique in the layer (default = avg)',
+                                     choices=['min', 'avg', 'max'], default='avg')
     parser_data_sources.add_argument('-a', '--applicable-to', action='append', help='specify which data source objects '
                                      'to include by filtering on applicable to value(s) (used to define the type of '
                                      'system). You can provide multiple applicable to values with extra '
@@ -69,11 +95,46 @@ def _init_menu():
                                                             'not updated without your approval. The updated visibility '
                                                             'scores are calculated in the same way as with the option: '
                                                             '-y, --yaml', action='store_true')
+    parser_data_sources.add_argument('--update-policy', help='update the visibility scores (when the argument -u, '
+                                     '--update is provided) without user interaction, based on the provided visibility '
+                                     'update policy YAML file. The changes are written to a patch file',
+                                     metavar='POLICY_FILE')
+    parser_data_sources.add_argument('--what-if', help='rank the data sources that are not yet available for a system '
+                                     'by the visibility they would add when enabled for that system',
+                                     action='store_true')
+    parser_data_sources.add_argument('--weight-groups', help='weight the techniques by their use by the provided ATT&CK '
+                                     'Groups (arguments --what-if and --plan). Group can be its ID, '
+                                     'name or alias. Multiple Groups can be provided with extra \'--weight-groups\' '
+                                     'arguments. Another option is to provide a YAML file with a custom group(s)',
+                                     default=None, action='append')
+    parser_data_sources.add_argument('--plan', help='plan which data sources to enable for which system to maximize the '
+                                     'visibility, within a budget of the provided number of data sources (or the total '
+                                     'cost when --plan-costs is provided). The sequence and the cumulative visibility '
+                                     'are written to a JSON file', type=float, metavar='BUDGET')
+    parser_data_sources.add_argument('--plan-costs', help='YAML file with per data source name its cost (default = 1), '
+                                     'used by the argument --plan', metavar='COSTS_FILE')
+    parser_data_sources.add_argument('--plan-objective', help='maximize the visibility score (as in the data source '
+                                     'layer), or the number of techniques with visibility (default = score)',
+                                     choices=['score', 'techniques'], default='score')
+    parser_data_sources.add_argument('--plan-optimal', help='plan using an integer linear program solver instead of '
+                                     'greedy selection (requires the Python package \'pulp\')', action='store_true')
+    parser_data_sources.add_argument('--top', help='the number of data sources to list (default = 25)', type=int,
+                                     default=25)
     parser_data_sources.add_argument('-of', '--output-filename', help='set the output filename')
     parser_data_sources.add_argument('-ln', '--layer-name', help='set the name of the Navigator layer')
     parser_data_sources.add_argument('--health', help='check the YAML file(s) for errors', action='store_true')
+    parser_data_sources.add_argument('--health-json', help='write the findings of the health check on the YAML file '
+                                                           'to a JSON file (rule ID, technique or data source, location '
+                                                           'and message)', action='store_true')
     parser_data_sources.add_argument('--local-stix-path', help='path to a local STIX repository to use DeTT&CT offline '
                                      'or to use a specific version of STIX objects')
+    parser_data_sources.add_argument('--content-addressed', help='write the output (JSON) files to a name derived from the hash of '
+                                     'their content instead of a name with a sequence number. Files with the same '
+                                     'content are not written again', action='store_true')
+    parser_data_sources.add_argument('--force', help='always generate the output, also when an output generated from the same '
+                                     'input files, ATT&CK data and arguments already exists', action='store_true')
+    parser_data_sources.add_argument('--watch', help='keep running and generate the output(s) again when one of the input '
+                                     'files changed', action='store_true')
     parser_data_sources.add_argument('--layer-settings', help='specific settings for the Navigator layer. Supported settings: '
                                      +', '.join(['%s=%s' % (k, '|'.join(v)) for k, v in LAYER_SETTINGS.items()]) +'. Multiple settings can be provided with extra --layer-settings'
                                      ' arguments. Example: --layer-settings showAggregateScores=False',
@@ -86,7 +147,12 @@ def _init_menu():
                                                           'visibility with detections, output to Excel or check the '
                                                           'health of the technique administration YAML file.')
     parser_visibility.add_argument('-ft', '--file-tech', help='path to the technique administration YAML file (used to '
-                                                              'score the level of visibility)', required=True)
+                                                              'score the level of visibility)',
+                                   required='--multi-domain' not in sys.argv)
+    parser_visibility.add_argument('--multi-domain', help='generate the visibility layers for administration YAML files '
+                                   'of multiple ATT&CK domains (Enterprise, ICS and Mobile) and a combined summary. '
+                                   'The domains are processed concurrently. Provide the files and/or directories '
+                                   'containing these files', nargs='+', metavar='PATH')
     parser_visibility.add_argument('-p', '--platform', action='append', help='specify the platform for the Navigator '
                                    'layer file (default = platform(s) specified in the YAML file). Multiple platforms'
                                    ' can be provided with extra \'-p/--platform\' arguments. The available platforms '
@@ -110,8 +176,18 @@ def _init_menu():
     parser_visibility.add_argument('-of', '--output-filename', help='set the output filename')
     parser_visibility.add_argument('-ln', '--layer-name', help='set the name of the Navigator layer')
     parser_visibility.add_argument('--health', help='check the YAML file for errors', action='store_true')
+    parser_visibility.add_argument('--health-json', help='write the findings of the health check on the YAML file '
+                                                         'to a JSON file (rule ID, technique or data source, location '
+                                                         'and message)', action='store_true')
     parser_visibility.add_argument('--local-stix-path', help='path to a local STIX repository to use DeTT&CT offline '
                                    'or to use a specific version of STIX objects')
+    parser_visibility.add_argument('--content-addressed', help='write the output (JSON) files to a name derived from the hash of '
+                                   'their content instead of a name with a sequence number. Files with the same '
+                                   'content are not written again', action='store_true')
+    parser_visibility.add_argument('--force', help='always generate the output, also when an output generated from the same '
+                                   'input files, ATT&CK data and arguments already exists', action='store_true')
+    parser_visibility.add_argument('--watch', help='keep running and generate the output(s) again when one of the input '
+                                   'files changed', action='store_true')
     parser_visibility.add_argument('--layer-settings', help='specific settings for the Navigator layer. Supported settings: '
                                      +', '.join(['%s=%s' % (k, '|'.join(v)) for k, v in LAYER_SETTINGS.items()]) +'. Multiple settings can be provided with extra --layer-settings'
                                      ' arguments. Example: --layer-settings showAggregateScores=False',
@@ -125,7 +201,12 @@ def _init_menu():
                                              'improvement graph, output to Excel or check the health of '
                                              'the technique administration YAML file.')
     parser_detection.add_argument('-ft', '--file-tech', help='path to the technique administration YAML file (used to '
-                                                             'score the level of detection)', required=True)
+                                                             'score the level of detection)',
+                                  required='--multi-domain' not in sys.argv)
+    parser_detection.add_argument('--multi-domain', help='generate the detection layers for administration YAML files '
+                                  'of multiple ATT&CK domains (Enterprise, ICS and Mobile) and a combined summary. '
+                                  'The domains are processed concurrently. Provide the files and/or directories '
+                                  'containing these files', nargs='+', metavar='PATH')
     parser_detection.add_argument('-p', '--platform', action='append', help='specify the platform for the Navigator '
                                   'layer file (default = platform(s) specified in the YAML file). Multiple platforms'
                                   ' can be provided with extra \'-p/--platform\' arguments. The available platforms '
@@ -149,8 +230,18 @@ def _init_menu():
     parser_detection.add_argument('-of', '--output-filename', help='set the output filename')
     parser_detection.add_argument('-ln', '--layer-name', help='set the name of the Navigator layer')
     parser_detection.add_argument('--health', help='check the YAML file(s) for errors', action='store_true')
+    parser_detection.add_argument('--health-json', help='write the findings of the health check on the YAML file '
+                                                        'to a JSON file (rule ID, technique or data source, location '
+                                                        'and message)', action='store_true')
     parser_detection.add_argument('--local-stix-path', help='path to a local STIX repository to use DeTT&CT offline '
                                   'or to use a specific version of STIX objects')
+    parser_detection.add_argument('--content-addressed', help='write the output (JSON) files to a name derived from the hash of '
+                                  'their content instead of a name with a sequence number. Files with the same '
+                                  'content are not written again', action='store_true')
+    parser_detection.add_argument('--force', help='always generate the output, also when an output generated from the same '
+                                  'input files, ATT&CK data and arguments already exists', action='store_true')
+    parser_detection.add_argument('--watch', help='keep running and generate the output(s) again when one of the input '
+                                  'files changed', action='store_true')
     parser_detection.add_argument('--layer-settings', help='specific settings for the Navigator layer. Supported settings: '
                                      +', '.join(['%s=%s' % (k, '|'.join(v)) for k, v in LAYER_SETTINGS.items()]) +'. Multiple settings can be provided with extra --layer-settings'
                                      ' arguments. Example: --layer-settings showAggregateScores=False',
@@ -166,6 +257,13 @@ def _init_menu():
                                                      'provided with extra \'-g/--group\' arguments. Another option is '
                                                      'to provide a YAML file with a custom group(s)',
                               default=None, action='append')
+    parser_group.add_argument('-b', '--bulk', help='create heat maps for all group administration YAML files within '
+                                                   'the provided directory (e.g. threat-actor-data) in one run: a heat '
+                                                   'map per file, an aggregate heat map of all files and, when a '
+                                                   'visibility or detection overlay is provided, an overlay heat map '
+                                                   'per file. Cannot be combined with -g/--groups and '
+                                                   '--software-group',
+                              metavar='DIRECTORY')
     parser_group.add_argument('-d', '--domain', help='specify the ATT&CK domain (default = enterprise). This argument '
                                                      'is ignored if a domain is specified in the Group YAML file.',
                               required=False, choices=['enterprise', 'ics', 'mobile'])
@@ -200,11 +298,33 @@ def _init_menu():
     parser_group.add_argument('--health', help='check the YAML file(s) for errors', action='store_true')
     parser_group.add_argument('--local-stix-path', help='path to a local STIX repository to use DeTT&CT offline '
                                                         'or to use a specific version of STIX objects')
+    parser_group.add_argument('--content-addressed', help='write the output (JSON) files to a name derived from the hash of '
+                              'their content instead of a name with a sequence number. Files with the same '
+                              'content are not written again', action='store_true')
+    parser_group.add_argument('--force', help='always generate the output, also when an output generated from the same '
+                              'input files, ATT&CK data and arguments already exists', action='store_true')
+    parser_group.add_argument('--watch', help='keep running and generate the output(s) again when one of the input '
+                              'files changed', action='store_true')
     parser_group.add_argument('--layer-settings', help='specific settings for the Navigator layer. Supported settings: '
                                      +', '.join(['%s=%s' % (k, '|'.join(v)) for k, v in LAYER_SETTINGS.items()]) +'. Multiple settings can be provided with extra --layer-settings'
                                      ' arguments. Example: --layer-settings showAggregateScores=False',
                                      action='append')
 
+    # create the health parser
+    parser_health = subparsers.add_parser('health', help='check administration files for errors',
+                                          description='Check the technique, data source and group administration YAML '
+                                                      'files within the provided files, directories and/or glob '
+                                                      'patterns for errors. The applicable_to values of technique '
+                                                      'administration files are also checked against the systems of '
+                                                      'the data source administration files within the same directory.')
+    parser_health.add_argument('paths', help='YAML file(s), directories (searched recursively) and/or glob patterns',
+                               nargs='+', metavar='PATH')
+    parser_health.add_argument('--processes', help='number of worker processes (default = number of CPU cores)',
+                               type=int)
+    parser_health.add_argument('--json', help='write the findings to a JSON report', action='store_true')
+    parser_health.add_argument('--junit', help='write the findings to a JUnit XML report', action='store_true')
+    parser_health.add_argument('-of', '--output-filename', help='set the output filename of the report(s)')
+
     # create the generic parser
     parser_generic = subparsers.add_parser('generic', description='Generic functions which will output to stdout.',
                                            help='includes: statistics on ATT&CK data source and updates on techniques'
@@ -230,12 +350,71 @@ def _init_menu():
     parser_generic.add_argument('--sort', help='sorting of the output from \'-u/--update\' on modified or creation '
                                                'date (default = modified)', choices=['modified', 'created'],
                                 default='modified')
+    parser_generic.add_argument('--diff', help='get the changes between two ATT&CK versions: the added, removed, '
+                                'revoked and modified techniques, groups, software, data components and relationships. '
+                                'A version is a cache directory of DeTT&CT or a local STIX repository',
+                                nargs=2, metavar=('OLD', 'NEW'))
+    parser_generic.add_argument('--diff-files', help='administration YAML files, layer files and/or directories '
+                                'containing these files, for which the \'--diff\' argument reports if they are '
+                                'affected by the changes', nargs='+', metavar='PATH')
+    parser_generic.add_argument('--json', help='print the output as JSON', action='store_true')
     parser_generic.add_argument('--local-stix-path', help='path to a local STIX repository to use DeTT&CT offline '
                                 'or to use a specific version of STIX objects')
 
     return menu_parser
 
 
+def _get_input_files(args):
+    """
+    Get the input files from the command line arguments: arguments referring to a file, and the YAML files within
+    arguments referring to a directory.
+    :param args: the parsed command line arguments
+    :return: list with the input files
+    """
+    input_files = []
+    for value in vars(args).values():
+        for path in (value if isinstance(value, list) else [value]):
+            if not isinstance(path, str):
+                continue
+            if os.path.isfile(path):
+                input_files.append(path)
+            elif os.path.isdir(path):
+                for root, _, files in os.walk(path):
+                    input_files.extend(os.path.join(root, f) for f in files if f.endswith(('.yaml', '.yml')))
+    return input_files
+
+
+def _generate(args, generator, *generator_args, **generator_kwargs):
+    """
+    Call the provided generator, unless its output already exists for the same inputs: the input files, the ATT&CK
+    data, the command line arguments and the DeTT&CT version. Use '--force' to always call the generator.
+    :param args: the parsed command line arguments
+    :param generator: the function generating the output
+    :param generator_args: positional arguments for the generator
+    :param generator_kwargs: keyword arguments for the generator
+    :return:
+    """
+    # the content of dictionary arguments (e.g. EQL search results) follows from the input files and arguments. The
+    # arguments controlling the run itself do not change the output.
+    options = (sorted((k, v) for k, v in vars(args).items() if k not in RUN_CONTROL_ARGUMENTS),
+               [a for a in generator_args if not isinstance(a, dict)],
+               sorted((k, v) for k, v in generator_kwargs.items() if not isinstance(v, dict)))
+    fingerprint = get_output_fingerprint(generator.__name__, _get_input_files(args), options)
+
+    if not args.force:
+        outputs = get_outputs(fingerprint, generic.local_stix_path)
+        if outputs:
+            for output_filename in outputs:
+                print('File up to date: ' + output_filename)
+            return
+
+    file_output.written_files = []
+    generator(*generator_args, **generator_kwargs)
+    if file_output.written_files:
+        update_outputs(fingerprint, file_output.written_files, generic.loaded_attack_data_types,
+                       generic.local_stix_path)
+
+
 def _menu(menu_parser):
     """
     Parser for the command line parameter menu and calls the appropriate functions.
@@ -243,15 +422,93 @@ def _menu(menu_parser):
     :return:
     """
     args = menu_parser.parse_args()
+    if args.subparser is None:
+        menu_parser.print_help()
+        return
 
     if 'local_stix_path' in args and args.local_stix_path:
         generic.local_stix_path = args.local_stix_path
+    if 'content_addressed' in args and args.content_addressed:
+        file_output.content_addressed = True
+
+    if 'watch' in args and args.watch:
+        if 'update' in args and args.update:
+            print('[!] The argument \'--watch\' cannot be combined with \'-u/--update\'')
+            quit()
+        generic.keep_attack_data_in_memory = True
+
+    if args.timings:
+        instrumentation.enable_timings()
+    start = time.perf_counter()
+    profiler = None
+    if args.profile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    try:
+        _run_mode(args)
+    finally:
+        if profiler:
+            import pstats
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+            pstats.Stats(profiler).sort_stats('cumulative').print_stats(PROFILE_PRINT_LIMIT)
+            print('File written:   ' + args.profile)
+        if args.timings:
+            instrumentation.print_timings(time.perf_counter() - start)
+
+    if 'watch' in args and args.watch:
+        _watch(args)
+
+
+def _watch(args):
+    """
+    Watch the input files of the mode and run the mode again when one of them changed. The ATT&CK data and the parsed
+    YAML files are kept in memory between the runs, and outputs of which the inputs did not change are not generated
+    again.
+    :param args: the parsed command line arguments
+    :return:
+    """
+    def _on_change(changed_files):
+        print('\nChanged: ' + ', '.join(changed_files))
+        start = time.time()
+        try:
+            _run_mode(args)
+        except SystemExit:
+            pass  # the mode quits on errors within the YAML file(s), which can be fixed while watching
+        print('Done in %d ms' % ((time.time() - start) * 1000))
+
+    # Ctrl+C should stop watching, also while the mode is running
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    try:
+        watch_files(lambda: _get_input_files(args), _on_change)
+    except KeyboardInterrupt:
+        pass
+
+
+def _run_mode(args):
+    """
+    Calls the appropriate functions for the mode within the parsed command line arguments.
+    :param args: the parsed command line arguments
+    :return:
+    """
+    # the ATT&CK data loaded before calling a generator (e.g. for an EQL search) also determines its output
+    generic.loaded_attack_data_types.clear()
 
     if args.subparser in ['editor', 'e']:
         DeTTECTEditor(int(args.port)).start()
 
     elif args.subparser in ['datasource', 'ds']:
-        if check_file(args.file_ds, FILE_TYPE_DATA_SOURCE_ADMINISTRATION, args.health):
+        if args.matrix:
+            _generate(args, generate_data_source_coverage_matrix, args.matrix, args.matrix_aggregate, args.health,
+                      args.output_filename, args.layer_name, _parse_layer_settings(args.layer_settings))
+        elif args.multi_domain:
+            _generate(args, generate_multi_domain_layers, args.multi_domain, 'datasource', args.health,
+                      args.output_filename, _parse_layer_settings(args.layer_settings))
+        elif check_file(args.file_ds, FILE_TYPE_DATA_SOURCE_ADMINISTRATION, args.health):
+            if args.health_json:
+                export_health_findings(args.file_ds, FILE_TYPE_DATA_SOURCE_ADMINISTRATION)
             layer_settings = _parse_layer_settings(args.layer_settings)
             file_ds = args.file_ds
 
@@ -265,18 +522,31 @@ def _menu(menu_parser):
                 if not file_ds:
                     quit()  # something went wrong in executing the search or 0 results where returned
             if args.update and check_file(args.file_tech, FILE_TYPE_TECHNIQUE_ADMINISTRATION, args.health):
-                update_technique_administration_file(file_ds, args.file_tech)
+                if args.update_policy:
+                    update_technique_administration_file_with_policy(file_ds, args.file_tech, args.update_policy)
+                else:
+                    update_technique_administration_file(file_ds, args.file_tech)
             if args.layer:
-                generate_data_sources_layer(file_ds, args.output_filename, args.layer_name, layer_settings)
+                _generate(args, generate_data_sources_layer, file_ds, args.output_filename, args.layer_name, layer_settings)
             if args.excel:
-                export_data_source_list_to_excel(file_ds, args.output_filename, eql_search=args.search)
+                _generate(args, export_data_source_list_to_excel, file_ds, args.output_filename, eql_search=args.search)
             if args.graph:
-                plot_data_sources_graph(file_ds, args.output_filename)
+                _generate(args, plot_data_sources_graph, file_ds, args.output_filename)
             if args.yaml:
-                generate_technique_administration_file(file_ds, args.output_filename, all_techniques=args.yaml_all_techniques)
+                _generate(args, generate_technique_administration_file, file_ds, args.output_filename, all_techniques=args.yaml_all_techniques)
+            if args.what_if:
+                rank_data_sources(file_ds, args.weight_groups, args.top)
+            if args.plan:
+                plan_data_sources(file_ds, args.plan, args.weight_groups, args.plan_costs, args.plan_objective,
+                                  args.plan_optimal, args.output_filename)
 
     elif args.subparser in ['visibility', 'v']:
-        if check_file(args.file_tech, FILE_TYPE_TECHNIQUE_ADMINISTRATION, args.health):
+        if args.multi_domain:
+            _generate(args, generate_multi_domain_layers, args.multi_domain, 'visibility', args.health,
+                      args.output_filename, _parse_layer_settings(args.layer_settings))
+        elif check_file(args.file_tech, FILE_TYPE_TECHNIQUE_ADMINISTRATION, args.health):
+            if args.health_json:
+                export_health_findings(args.file_tech, FILE_TYPE_TECHNIQUE_ADMINISTRATION)
             layer_settings = _parse_layer_settings(args.layer_settings)
             file_tech = args.file_tech
 
@@ -289,24 +559,37 @@ def _menu(menu_parser):
                 if not file_tech:
                     quit()  # something went wrong in executing the search or 0 results where returned
             if args.layer:
-                generate_visibility_layer(file_tech, False, args.output_filename, args.layer_name, layer_settings, args.platform)
+                _generate(args, generate_visibility_layer, file_tech, False, args.output_filename, args.layer_name, layer_settings, args.platform)
             if args.overlay:
-                generate_visibility_layer(file_tech, True, args.output_filename, args.layer_name, layer_settings, args.platform)
+                _generate(args, generate_visibility_layer, file_tech, True, args.output_filename, args.layer_name, layer_settings, args.platform)
             if args.graph:
-                plot_graph(file_tech, 'visibility', args.output_filename)
+                _generate(args, plot_graph, file_tech, 'visibility', args.output_filename)
             if args.excel:
-                export_techniques_list_to_excel(file_tech, args.output_filename)
+                _generate(args, export_techniques_list_to_excel, file_tech, args.output_filename)
 
     # TODO add Group EQL search capabilities
     elif args.subparser in ['group', 'g']:
         layer_settings = _parse_layer_settings(args.layer_settings)
-        generate_group_heat_map(args.groups, args.overlay, args.overlay_type, args.platform,
-                                args.software_group, args.search_visibility, args.search_detection, args.health,
-                                args.output_filename, args.layer_name, args.domain, layer_settings,
-                                include_all_score_objs=args.all_scores)
+        if args.bulk:
+            if args.groups or args.software_group:
+                print('[!] The argument \'-b/--bulk\' cannot be combined with \'-g/--groups\' or \'--software-group\'')
+                quit()
+            _generate(args, generate_group_heat_maps_bulk, args.bulk, args.overlay, args.overlay_type, args.platform,
+                      args.search_visibility, args.search_detection, args.health, args.output_filename,
+                      args.layer_name, args.domain, layer_settings, include_all_score_objs=args.all_scores)
+        else:
+            _generate(args, generate_group_heat_map, args.groups, args.overlay, args.overlay_type, args.platform,
+                      args.software_group, args.search_visibility, args.search_detection, args.health,
+                      args.output_filename, args.layer_name, args.domain, layer_settings,
+                      include_all_score_objs=args.all_scores)
 
     elif args.subparser in ['detection', 'd']:
-        if check_file(args.file_tech, FILE_TYPE_TECHNIQUE_ADMINISTRATION, args.health):
+        if args.multi_domain:
+            _generate(args, generate_multi_domain_layers, args.multi_domain, 'detection', args.health,
+                      args.output_filename, _parse_layer_settings(args.layer_settings))
+        elif check_file(args.file_tech, FILE_TYPE_TECHNIQUE_ADMINISTRATION, args.health):
+            if args.health_json:
+                export_health_findings(args.file_tech, FILE_TYPE_TECHNIQUE_ADMINISTRATION)
             layer_settings = _parse_layer_settings(args.layer_settings)
             file_tech = args.file_tech
 
@@ -319,13 +602,17 @@ def _menu(menu_parser):
                 if not file_tech:
                     quit()  # something went wrong in executing the search or 0 results where returned
             if args.layer:
-                generate_detection_layer(file_tech, False, args.output_filename, args.layer_name, layer_settings, args.platform)
+                _generate(args, generate_detection_layer, file_tech, False, args.output_filename, args.layer_name, layer_settings, args.platform)
             if args.overlay:
-                generate_detection_layer(file_tech, True, args.output_filename, args.layer_name, layer_settings, args.platform)
+                _generate(args, generate_detection_layer, file_tech, True, args.output_filename, args.layer_name, layer_settings, args.platform)
             if args.graph:
-                plot_graph(file_tech, 'detection', args.output_filename)
+                _generate(args, plot_graph, file_tech, 'detection', args.output_filename)
             if args.excel:
-                export_techniques_list_to_excel(file_tech, args.output_filename)
+                _generate(args, export_techniques_list_to_excel, file_tech, args.output_filename)
+
+    elif args.subparser in ['health']:
+        if not check_health_files(args.paths, args.processes, args.output_filename, args.json, args.junit):
+            sys.exit(1)
 
     elif args.subparser in ['generic', 'ge']:
         if args.datasources:
@@ -333,16 +620,15 @@ def _menu(menu_parser):
             if platform:
                 if not check_platform(platform, domain=args.datasources):
                     quit()
-            get_statistics_data_sources(args.datasources, platform)
+            get_statistics_data_sources(args.datasources, platform, args.json)
         elif args.mitigations:
-            get_statistics_mitigations(args.mitigations)
+            get_statistics_mitigations(args.mitigations, args.json)
         elif args.updates:
-            get_updates(args.updates, args.sort)
+            get_updates(args.updates, args.sort, args.json)
         elif args.list_platforms:
-            get_platforms(args.list_platforms)
-
-    else:
-        menu_parser.print_help()
+            get_platforms(args.list_platforms, args.json)
+        elif args.diff:
+            get_diff(args.diff[0], args.diff[1], args.diff_files, args.json)
 
 def _parse_layer_settings(args_layer_settings):
     layer_settings = {}
@@ -321,9 +321,7 @@ def _prepare_yaml_file(filename, obj_type, include_all_score_objs):
         yaml_content = filename
     else:
         # file is a file location on disk
-        _yaml = init_yaml()
-        with open(filename, 'r') as yaml_file:
-            yaml_content = _yaml.load(yaml_file)
+        yaml_content = load_yaml_file(filename)
 
     yaml_content_eql = _traverse_modify_date(yaml_content)
     yaml_eql_events = []
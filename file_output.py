@@ -1,5 +1,21 @@
+import hashlib
 import os
+import re
 import shutil
+import tempfile
+from contextlib import contextmanager
+from constants import PHASE_FILE_WRITE
+from instrumentation import phase
+
+# write output files to a name derived from the hash of their content, instead of a name with a sequence number
+content_addressed = False
+
+# the output files written since the last reset, which are recorded as the outputs of a generator run (see file_state)
+written_files = []
+
+# the umask of the process, which is applied to the temporary files that replace the output files
+_UMASK = os.umask(0)
+os.umask(_UMASK)
 
 
 def _clean_filename(filename):
@@ -11,18 +27,58 @@ def _clean_filename(filename):
     return filename.replace('/', '').replace('\\', '').replace(':', '')[:200]
 
 
-def write_file(filename, content):
+@contextmanager
+def atomic_open(filename, mode='w'):
+    """
+    Open a temporary file in the directory of the provided file, which replaces the provided file when writing
+    succeeded. The file is therefore never left partially written (e.g. on a crash or Ctrl+C), and readers see either
+    the old or the new content.
+    :param filename: the file to write
+    :param mode: the mode to open the temporary file with
+    :return: file object of the temporary file
+    """
+    fd, tmp_filename = tempfile.mkstemp(dir=os.path.dirname(filename) or '.', prefix='.' + os.path.basename(filename) + '.',
+                                        suffix='.tmp')
+    try:
+        with os.fdopen(fd, mode) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+
+        # keep the permissions of an existing file, otherwise use the default permissions instead of those of mkstemp
+        if os.path.exists(filename):
+            shutil.copymode(filename, tmp_filename)
+        else:
+            os.chmod(tmp_filename, 0o666 & ~_UMASK)
+        os.replace(tmp_filename, filename)
+    except BaseException:
+        os.unlink(tmp_filename)
+        raise
+
+
+@phase(PHASE_FILE_WRITE)
+def write_file(filename, content, extension='json'):
     """
     Writes content to a file and ensures if the file already exists it won't be overwritten by appending a number
-    as suffix.
+    as suffix. When content addressed output is enabled, the suffix is derived from the hash of the content, and a
+    file with the same content is not written again.
     :param filename: filename
     :param content: the content of the file that needs to be written to the file
+    :param extension: the file extension
     :return:
     """
-    output_filename = 'output/%s' % _clean_filename(filename)
-    output_filename = get_non_existing_filename(output_filename, 'json')
+    if content_addressed:
+        output_filename = 'output/%s_%s.%s' % (_clean_filename(filename), hashlib.sha1(content.encode()).hexdigest()[:12],
+                                               extension)
+        written_files.append(output_filename)
+        if os.path.exists(output_filename):
+            print('File unchanged: ' + output_filename)
+            return
+    else:
+        output_filename = 'output/%s' % _clean_filename(filename)
+        output_filename = get_non_existing_filename(output_filename, extension)
 
-    with open(output_filename, 'w') as f:
+    with atomic_open(output_filename) as f:
         f.write(content)
 
     print('File written:   ' + output_filename)
@@ -34,13 +90,11 @@ def backup_file(filename):
     :param filename: existing YAML filename
     :return:
     """
-    suffix = 1
-    backup_filename = filename.replace('.yaml', '_backup_' + str(suffix) + '.yaml')
-    while os.path.exists(backup_filename):
-        backup_filename = backup_filename.replace('_backup_' + str(suffix) + '.yaml', '_backup_' + str(suffix + 1) + '.yaml')
-        suffix += 1
-
-    shutil.copy2(filename, backup_filename)
+    name, extension = os.path.splitext(filename)
+    backup_filename = _create_new_file(name + '_backup', extension[1:], always_suffix=True)
+    with atomic_open(backup_filename, 'wb') as f, open(filename, 'rb') as f_src:
+        shutil.copyfileobj(f_src, f)
+    shutil.copystat(filename, backup_filename)
     print('Written backup file:   ' + backup_filename + '\n')
 
 
@@ -54,22 +108,57 @@ def create_output_filename(filename_prefix, filename):
     return '%s_%s' % (filename_prefix, normalize_name_to_filename(filename))
 
 
+def _create_new_file(filename, extension, always_suffix=False):
+    """
+    Create a new, empty file with a number as suffix that is higher than the suffix of the existing files with the
+    same name. The directory is listed once, instead of checking the existence of every possible suffix. The file is
+    created exclusively (O_EXCL), so parallel DeTT&CT processes never get the same file.
+    :param filename: filename without extension
+    :param extension: the file extension
+    :param always_suffix: also add a suffix to the first file (starting with 1)
+    :return: the name of the created file
+    """
+    directory, name = os.path.split(filename)
+    regex_suffix = re.compile(r'^%s_(\d+)\.%s$' % (re.escape(name), re.escape(extension)))
+
+    suffix = 0
+    exists = False
+    for entry in os.scandir(directory or '.'):
+        if entry.name == '%s.%s' % (name, extension):
+            exists = True
+        else:
+            match = regex_suffix.match(entry.name)
+            if match:
+                suffix = max(suffix, int(match.group(1)))
+
+    if suffix == 0 and not exists and not always_suffix:
+        output_filename = '%s.%s' % (filename, extension)
+    else:
+        suffix += 1
+        output_filename = '%s_%s.%s' % (filename, suffix, extension)
+
+    while True:
+        try:
+            os.close(os.open(output_filename, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o666))
+            return output_filename
+        except FileExistsError:
+            # another process created this file after we listed the directory
+            suffix += 1
+            output_filename = '%s_%s.%s' % (filename, suffix, extension)
+
+
 def get_non_existing_filename(filename, extension):
     """
-    Generates a filename that doesn't exist based on the given filename by appending a number as suffix.
+    Generates a filename that doesn't exist based on the given filename by appending a number as suffix. The file
+    is created (empty) to reserve the filename.
     :param filename:
     :param extension:
     :return:
     """
     if filename.endswith('.' + extension):
         filename = filename.replace('.' + extension, '')
-    if os.path.exists('%s.%s' % (filename, extension)):
-        suffix = 1
-        while os.path.exists('%s_%s.%s' % (filename, suffix, extension)):
-            suffix += 1
-        output_filename = '%s_%s.%s' % (filename, suffix, extension)
-    else:
-        output_filename = '%s.%s' % (filename, extension)
+    output_filename = _create_new_file(filename, extension)
+    written_files.append(output_filename)
     return output_filename
 
 
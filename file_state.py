@@ -0,0 +1,276 @@
+import hashlib
+import os
+import pickle
+import sqlite3
+import time
+from constants import *
+
+
+def _connect():
+    """
+    Open the state store (a SQLite database within the cache directory) and create the table when it does not exist.
+    The state of a YAML file is stored in one row, keyed by the absolute path of the file:
+    - state: values that are only valid for the content of the file with the hash 'content_hash'
+    - cache: values that remain valid when the content of the file changes (e.g. cached health check results per block)
+    The output files of a generator are stored in a second table, keyed by the fingerprint of the generator's inputs.
+    :return: database connection or None when the cache directory does not exist
+    """
+    if not os.path.isdir(os.path.dirname(FILE_STATE_DB)):
+        return None
+
+    # isolation_level=None: transactions are explicitly started with 'BEGIN IMMEDIATE' when updating the state,
+    # which makes read-modify-write of a row safe for concurrent DeTT&CT processes
+    conn = sqlite3.connect(FILE_STATE_DB, timeout=FILE_STATE_DB_TIMEOUT, isolation_level=None)
+    conn.execute('CREATE TABLE IF NOT EXISTS file_state (path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER, '
+                 'content_hash TEXT, state BLOB, cache BLOB)')
+    conn.execute('CREATE TABLE IF NOT EXISTS output_state (fingerprint TEXT PRIMARY KEY, outputs BLOB)')
+    return conn
+
+
+def get_content_hash(filename):
+    """
+    Get the hash of the content of the provided file.
+    :param filename: file location
+    :return: hex digest
+    """
+    with open(filename, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def _get_row(conn, filename):
+    """
+    Get the row of the provided file from the state store.
+    :param conn: database connection
+    :param filename: file location
+    :return: tuple (mtime_ns, size, content_hash, state, cache) or None
+    """
+    return conn.execute('SELECT mtime_ns, size, content_hash, state, cache FROM file_state WHERE path = ?',
+                        (os.path.abspath(filename), )).fetchone()
+
+
+def _is_content_unchanged(filename, row, stat):
+    """
+    Check if the content of the file is still the same as stored in the state store. The content is only hashed when
+    the modification time or size of the file changed.
+    :param filename: file location
+    :param row: row of the file within the state store
+    :param stat: os.stat result of the file
+    :return: tuple (True if the content is unchanged else False, hash of the content or None if not calculated)
+    """
+    if row is None:
+        return False, None
+    if row[0] == stat.st_mtime_ns and row[1] == stat.st_size:
+        return True, row[2]
+
+    content_hash = get_content_hash(filename)
+    return content_hash == row[2], content_hash
+
+
+def get_file_state(filename):
+    """
+    Get the state of the provided file (e.g. file type, version and health state). A single lookup is enough to decide
+    if work on the file can be skipped: the state is only returned when the content of the file did not change since
+    the state was stored.
+    :param filename: file location
+    :return: dictionary with the state or an empty dictionary when the file is modified or unknown
+    """
+    conn = _connect()
+    if conn is None or not filename or not os.path.isfile(filename):
+        return {}
+
+    with conn:
+        row = _get_row(conn, filename)
+        stat = os.stat(filename)
+        unchanged, content_hash = _is_content_unchanged(filename, row, stat)
+        if not unchanged:
+            return {}
+
+        if row[0] != stat.st_mtime_ns or row[1] != stat.st_size:
+            # only the modification time changed (e.g. the file was touched or saved without changes)
+            conn.execute('UPDATE file_state SET mtime_ns = ?, size = ? WHERE path = ?',
+                         (stat.st_mtime_ns, stat.st_size, os.path.abspath(filename)))
+
+    return pickle.loads(row[3]) if row[3] else {}
+
+
+def _update_row(filename, state=None, cache=None):
+    """
+    Update the state and/or cache of the provided file within one transaction. The state is merged with the current
+    state when the content of the file did not change, otherwise it replaces the current state.
+    :param filename: file location
+    :param state: dictionary with state values to store
+    :param cache: dictionary with cache values to store
+    :return:
+    """
+    conn = _connect()
+    if conn is None or not filename or not os.path.isfile(filename):
+        return
+
+    with conn:
+        conn.execute('BEGIN IMMEDIATE')
+        row = _get_row(conn, filename)
+        stat = os.stat(filename)
+        unchanged, content_hash = _is_content_unchanged(filename, row, stat)
+        if content_hash is None:
+            content_hash = get_content_hash(filename)
+
+        current_state = pickle.loads(row[3]) if unchanged and row[3] else {}
+        current_cache = pickle.loads(row[4]) if row is not None and row[4] else {}
+        current_state.update(state or {})
+        current_cache.update(cache or {})
+
+        conn.execute('INSERT OR REPLACE INTO file_state (path, mtime_ns, size, content_hash, state, cache) '
+                     'VALUES (?, ?, ?, ?, ?, ?)',
+                     (os.path.abspath(filename), stat.st_mtime_ns, stat.st_size, content_hash,
+                      pickle.dumps(current_state), pickle.dumps(current_cache)))
+
+
+def update_file_state(filename, **values):
+    """
+    Store state values for the current content of the provided file.
+    :param filename: file location
+    :param values: the state values (e.g. file_type, version, has_error)
+    :return:
+    """
+    _update_row(filename, state=values)
+
+
+def get_file_cache(filename, name):
+    """
+    Get a cached value of the provided file. Cached values remain available when the content of the file changes.
+    :param filename: file location
+    :param name: name of the cached value
+    :return: the cached value or None
+    """
+    conn = _connect()
+    if conn is None or not filename:
+        return None
+
+    with conn:
+        row = _get_row(conn, filename)
+
+    if row is not None and row[4]:
+        return pickle.loads(row[4]).get(name, None)
+    return None
+
+
+def update_file_cache(filename, name, value):
+    """
+    Store a cached value for the provided file.
+    :param filename: file location
+    :param name: name of the cached value
+    :param value: the value to cache
+    :return:
+    """
+    _update_row(filename, cache={name: value})
+
+
+def _get_attack_data_version(data_types, local_stix_path=None):
+    """
+    Get the version of the ATT&CK data used by a generator: the modification time and size of the files of the
+    provided data types within the cache directory, or of the domain directories within the local STIX repository.
+    :param data_types: the data types loaded by the generator, see DATATYPE_XX constants
+    :param local_stix_path: path of a local STIX repository or None
+    :return: list with the version information or None when the cached ATT&CK data is missing or expired
+    """
+    version = []
+    if local_stix_path:
+        for domain_dir in ['enterprise-attack', 'ics-attack', 'mobile-attack']:
+            path = os.path.join(local_stix_path, domain_dir)
+            stat = os.stat(path) if os.path.isdir(path) else None
+            version.append((os.path.abspath(path), stat.st_mtime_ns if stat else None))
+        return version
+
+    cache_dir = os.path.dirname(FILE_STATE_DB)
+    for data_type in sorted(data_types):
+        path = os.path.join(cache_dir, data_type)
+        if not os.path.isfile(path):
+            return None
+        stat = os.stat(path)
+        # expired ATT&CK data will be refreshed by 'load_attack_data', which may result in a different output
+        if time.time() - stat.st_mtime >= EXPIRE_TIME:
+            return None
+        version.append((data_type, stat.st_mtime_ns, stat.st_size))
+    return version
+
+
+def get_output_fingerprint(name, input_files, options):
+    """
+    Get the fingerprint of the inputs of a generator: the content of the input files, the options of the generator and
+    the DeTT&CT version. The version of the ATT&CK data is stored with the outputs (see 'update_outputs'), as only
+    after running the generator it is known which ATT&CK data it used.
+    :param name: name of the generator
+    :param input_files: list with the input files
+    :param options: the options of the generator, which must have a stable repr()
+    :return: hex digest
+    """
+    fingerprint = hashlib.sha1(repr((VERSION, name, options)).encode())
+    for filename in sorted(set(input_files)):
+        fingerprint.update((os.path.abspath(filename) + get_content_hash(filename)).encode())
+    return fingerprint.hexdigest()
+
+
+def get_outputs(fingerprint, local_stix_path=None):
+    """
+    Get the output files of the generator run with the provided fingerprint. The outputs are only returned when all
+    files still exist and are unmodified, and the ATT&CK data used by the generator has not changed.
+    :param fingerprint: the fingerprint of the generator's inputs
+    :param local_stix_path: path of a local STIX repository or None
+    :return: list with the output files or None
+    """
+    conn = _connect()
+    if conn is None or not fingerprint:
+        return None
+
+    with conn:
+        row = conn.execute('SELECT outputs FROM output_state WHERE fingerprint = ?', (fingerprint, )).fetchone()
+    if row is None:
+        return None
+
+    output_state = pickle.loads(row[0])
+    # rows stored by a previous version of DeTT&CT only hold the list of outputs
+    if not isinstance(output_state, dict):
+        return None
+    attack_data_version = _get_attack_data_version(output_state['attack_data_types'], local_stix_path)
+    if attack_data_version is None or attack_data_version != output_state['attack_data_version']:
+        return None
+
+    for filename, mtime_ns, size in output_state['outputs']:
+        if not os.path.isfile(filename):
+            return None
+        stat = os.stat(filename)
+        if stat.st_mtime_ns != mtime_ns or stat.st_size != size:
+            return None
+    return [o[0] for o in output_state['outputs']]
+
+
+def update_outputs(fingerprint, filenames, attack_data_types, local_stix_path=None):
+    """
+    Store the output files of the generator run with the provided fingerprint, together with the version of the ATT&CK
+    data used by the generator.
+    :param fingerprint: the fingerprint of the generator's inputs
+    :param filenames: list with the output files
+    :param attack_data_types: the data types loaded by the generator, see DATATYPE_XX constants
+    :param local_stix_path: path of a local STIX repository or None
+    :return:
+    """
+    conn = _connect()
+    if conn is None or not fingerprint:
+        return
+
+    attack_data_version = _get_attack_data_version(attack_data_types, local_stix_path)
+    if attack_data_version is None:
+        return
+
+    outputs = []
+    for filename in filenames:
+        if not os.path.isfile(filename):
+            return
+        stat = os.stat(filename)
+        outputs.append((filename, stat.st_mtime_ns, stat.st_size))
+    output_state = {'outputs': outputs, 'attack_data_types': sorted(attack_data_types),
+                    'attack_data_version': attack_data_version}
+
+    with conn:
+        conn.execute('INSERT OR REPLACE INTO output_state (fingerprint, outputs) VALUES (?, ?)',
+                     (fingerprint, pickle.dumps(output_state)))
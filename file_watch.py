@@ -0,0 +1,128 @@
+import os
+import select
+import sys
+import time
+from constants import *
+
+# inotify events on a directory that indicate a (possibly) changed file. Directories are watched instead of the files
+# themselves, as many editors save a file by replacing it.
+_IN_MODIFY = 0x00000002
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+
+
+def _init_inotify(directories):
+    """
+    Initialise an inotify instance watching the provided directories. inotify is only available on Linux, and is
+    accessed via ctypes as the Python standard library does not provide an interface to it.
+    :param directories: list of directories to watch
+    :return: the inotify file descriptor or None when inotify is not available
+    """
+    if not sys.platform.startswith('linux'):
+        return None
+
+    try:
+        import ctypes
+        import ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+    except (OSError, AttributeError):
+        return None
+    if fd < 0:
+        return None
+
+    mask = _IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+    for directory in directories:
+        if libc.inotify_add_watch(fd, os.fsencode(directory), mask) < 0:
+            os.close(fd)
+            return None
+    return fd
+
+
+def _discard_inotify_events(fd):
+    """
+    Discard all pending inotify events. The events are only used to wake up, the changed files are determined by
+    comparing their modification time and size.
+    :param fd: the inotify file descriptor
+    :return:
+    """
+    try:
+        while os.read(fd, 64 * 1024):
+            pass
+    except BlockingIOError:
+        pass
+
+
+def _get_file_stats(filenames):
+    """
+    Get the modification time and size of the provided files.
+    :param filenames: list of file locations
+    :return: dictionary with per file a tuple (mtime_ns, size), or None when the file does not exist
+    """
+    stats = {}
+    for filename in filenames:
+        try:
+            stat = os.stat(filename)
+            stats[filename] = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            stats[filename] = None
+    return stats
+
+
+def _get_directories(filenames):
+    """
+    Get the directories containing the provided files.
+    :param filenames: list of file locations
+    :return: sorted list of directories
+    """
+    return sorted(set(os.path.dirname(os.path.abspath(f)) for f in filenames))
+
+
+def watch_files(get_filenames, callback, poll_interval=WATCH_POLL_INTERVAL):
+    """
+    Call the callback each time one or more of the provided files changed, until interrupted with Ctrl+C. Changes are
+    detected with inotify when available, and otherwise by polling the modification time and size of the files.
+    :param get_filenames: function returning the list of files to watch, which is called again after every check for
+    changes (e.g. to include new files within a directory)
+    :param callback: function that is called with the list of changed files
+    :param poll_interval: seconds between two checks for changes when inotify is not available
+    :return:
+    """
+    filenames = get_filenames()
+    stats = _get_file_stats(filenames)
+    directories = _get_directories(filenames)
+    inotify = _init_inotify(directories)
+    print('Watching %d file(s) for changes%s. Press Ctrl+C to stop.' %
+          (len(filenames), ' (polling)' if inotify is None else ''))
+
+    try:
+        while True:
+            if inotify is None:
+                time.sleep(poll_interval)
+            # the timeout also catches changes that are not reported by inotify (e.g. on network file systems)
+            elif select.select([inotify], [], [], WATCH_INOTIFY_TIMEOUT)[0]:
+                # let the editor finish saving the file before it is read
+                time.sleep(WATCH_DEBOUNCE_TIME)
+                _discard_inotify_events(inotify)
+
+            filenames = get_filenames()
+            new_stats = _get_file_stats(filenames)
+            changed = [f for f in filenames if new_stats[f] is not None and new_stats[f] != stats.get(f, None)]
+            stats = new_stats
+
+            new_directories = _get_directories(filenames)
+            if new_directories != directories:
+                directories = new_directories
+                if inotify is not None:
+                    os.close(inotify)
+                    inotify = _init_inotify(directories)
+
+            if changed:
+                callback(changed)
+    finally:
+        if inotify is not None:
+            os.close(inotify)
@@ -1,6 +1,7 @@
 import os
 import pickle
 from datetime import datetime as dt
+from copy import deepcopy
 from io import StringIO
 from ruamel.yaml import YAML
 from ruamel.yaml.timestamp import TimeStamp as ruamelTimeStamp
@@ -9,6 +10,11 @@ from stix2 import datastore, Filter
 from constants import *
 from upgrade import upgrade_yaml_file
 from health import check_yaml_file_health
+from file_state import get_file_state, update_file_state
+from file_output import atomic_open
+from instrumentation import phase
+from attack_records import TechniqueRecord, get_technique_records
+from attack_index import get_data_source_index, get_mitigation_index, get_updates_index
 from stix2 import CompositeDataSource
 import dateutil.parser
 
@@ -16,6 +22,21 @@ import dateutil.parser
 
 local_stix_path = None
 
+# keep the loaded ATT&CK data in memory, so it is not loaded again by subsequent runs within the same process (watch mode)
+keep_attack_data_in_memory = False
+_attack_data_in_memory = {}
+
+# the data types requested via 'load_attack_data', so the output of a generator is only invalidated by a refresh of
+# the ATT&CK data it actually used (see '_generate' in dettect.py)
+loaded_attack_data_types = set()
+
+# per technique data type the full technique dictionaries keyed on their STIX ID, loaded on demand (see
+# 'get_technique_payload')
+_technique_payloads = {}
+
+# the parsed YAML files, keyed on the absolute path of the file (see 'load_yaml_file')
+_yaml_files_in_memory = {}
+
 
 def _save_attack_data(data, path):
     """
@@ -105,16 +126,118 @@ def _convert_stix_groups_to_dict(stix_attack_data):
     return attack_data
 
 
+@phase(PHASE_CACHE_LOAD)
 def load_attack_data(data_type):
     """
     By default the ATT&CK data is loaded from the online TAXII server or from the local cache directory. The
     local cache directory will be used if the file is not expired (data file on disk is older then EXPIRE_TIME
     seconds). When the local_stix_path option is given, the ATT&CK data will be loaded from the given path of
-    a local STIX repository.
+    a local STIX repository. When keep_attack_data_in_memory is set, the loaded data is kept in memory until it
+    expires. Techniques are returned as compact technique records (see attack_records.py).
+    :param data_type: the desired data type, see DATATYPE_XX constants.
+    :return: MITRE ATT&CK data object (STIX or custom schema)
+    """
+    loaded_attack_data_types.add(data_type)
+    if not keep_attack_data_in_memory:
+        return _load_compact_attack_data(data_type)
+
+    if data_type not in _attack_data_in_memory or \
+            (dt.now() - _attack_data_in_memory[data_type][1]).total_seconds() >= EXPIRE_TIME:
+        _attack_data_in_memory[data_type] = (_load_compact_attack_data(data_type), dt.now())
+    return _attack_data_in_memory[data_type][0]
+
+
+def _load_compact_attack_data(data_type):
+    """
+    Load the ATT&CK data and convert techniques into compact technique records. The full technique dictionaries are
+    released, and only loaded again when a record's STIX payload is requested.
+    :param data_type: the desired data type, see DATATYPE_XX constants.
+    :return: MITRE ATT&CK data object (STIX or custom schema)
+    """
+    attack_data = _load_attack_data(data_type)
+    if data_type in DATA_TYPES_STIX_TECHNIQUES:
+        _technique_payloads.pop(data_type, None)
+        attack_data = get_technique_records(attack_data, data_type)
+    return attack_data
+
+
+def get_technique_payload(data_type, stix_id):
+    """
+    Get the full technique dictionary of a technique record. The first request loads all techniques of the data type.
+    :param data_type: the data type of the technique record, see DATATYPE_XX constants.
+    :param stix_id: the STIX ID of the technique
+    :return: technique dictionary (see '_convert_stix_techniques_to_dict')
+    """
+    if data_type not in _technique_payloads:
+        with phase(PHASE_CACHE_LOAD):
+            _technique_payloads[data_type] = {t['id']: t for t in _load_attack_data(data_type)}
+    return _technique_payloads[data_type][stix_id]
+
+
+def _load_cached_attack_data(data_type):
+    """
+    Load the ATT&CK data from the local cache directory.
+    :param data_type: the desired data type, see DATATYPE_XX constants.
+    :return: MITRE ATT&CK data object (STIX or custom schema), or None when not cached or expired
+    """
+    if os.path.exists("cache/" + data_type):
+        with open("cache/" + data_type, 'rb') as f:
+            cached = pickle.load(f)
+            write_time = cached[1]
+            if not (dt.now() - write_time).total_seconds() >= EXPIRE_TIME:
+                # the first item in the list contains the ATT&CK data
+                return cached[0]
+    return None
+
+
+def _load_attack_index(data_type):
+    """
+    Load an index derived from the ATT&CK data from the local cache directory, or create it from the ATT&CK data.
+    :param data_type: the desired index, see DATA_TYPE_INDEX_XX constants.
+    :return: the index (see attack_index.py)
+    """
+    if local_stix_path is None:
+        # the index is outdated when the ATT&CK data in the cache has been refreshed after creating the index
+        cache_files = [os.path.join('cache', f) for f in os.listdir('cache')] if os.path.exists('cache') else []
+        if os.path.exists('cache/' + data_type) and \
+                all(os.path.getmtime(f) <= os.path.getmtime('cache/' + data_type) for f in cache_files
+                    if os.path.basename(f).startswith('mitre_')):
+            attack_data = _load_cached_attack_data(data_type)
+            if attack_data is not None:
+                return attack_data
+
+    if data_type == DATA_TYPE_INDEX_TECH_BY_DATA_SOURCE:
+        attack_data = get_data_source_index({'enterprise-attack': load_attack_data(DATA_TYPE_STIX_ALL_TECH_ENTERPRISE),
+                                             'ics-attack': load_attack_data(DATA_TYPE_STIX_ALL_TECH_ICS),
+                                             'mobile-attack': load_attack_data(DATA_TYPE_STIX_ALL_TECH_MOBILE)})
+    elif data_type == DATA_TYPE_INDEX_TECH_BY_MITIGATION:
+        attack_data = get_mitigation_index({'enterprise-attack': load_attack_data(DATA_TYPE_STIX_ALL_ENTERPRISE_MITIGATIONS),
+                                            'ics-attack': load_attack_data(DATA_TYPE_STIX_ALL_ICS_MITIGATIONS),
+                                            'mobile-attack': load_attack_data(DATA_TYPE_STIX_ALL_MOBILE_MITIGATIONS)},
+                                           load_attack_data(DATA_TYPE_STIX_ALL_RELATIONSHIPS),
+                                           load_attack_data(DATA_TYPE_STIX_ALL_TECH))
+    else:
+        attack_data = get_updates_index(load_attack_data(DATA_TYPE_STIX_ALL_TECH),
+                                        load_attack_data(DATA_TYPE_STIX_ALL_GROUPS),
+                                        load_attack_data(DATA_TYPE_STIX_ALL_SOFTWARE))
+
+    # Only use cache when using online TAXII server:
+    if local_stix_path is None:
+        _save_attack_data(attack_data, "cache/" + data_type)
+
+    return attack_data
+
+
+def _load_attack_data(data_type):
+    """
+    Load the ATT&CK data from the online TAXII server, the local cache directory or a local STIX repository.
     :param data_type: the desired data type, see DATATYPE_XX constants.
     :return: MITRE ATT&CK data object (STIX or custom schema)
     """
     from attackcti import attack_client
+    if data_type in DATA_TYPES_INDEXES:
+        return _load_attack_index(data_type)
+
     if local_stix_path is not None:
         if local_stix_path is not None and os.path.isdir(os.path.join(local_stix_path, 'enterprise-attack')) \
                 and os.path.isdir(os.path.join(local_stix_path, 'ics-attack')) \
@@ -124,13 +247,9 @@ def load_attack_data(data_type):
             print('[!] Not a valid local STIX path: ' + local_stix_path)
             quit()
     else:
-        if os.path.exists("cache/" + data_type):
-            with open("cache/" + data_type, 'rb') as f:
-                cached = pickle.load(f)
-                write_time = cached[1]
-                if not (dt.now() - write_time).total_seconds() >= EXPIRE_TIME:
-                    # the first item in the list contains the ATT&CK data
-                    return cached[0]
+        attack_data = _load_cached_attack_data(data_type)
+        if attack_data is not None:
+            return attack_data
         try:
             mitre = attack_client()
         except (exceptions.ConnectionError, datastore.DataSourceError) as e:
@@ -187,7 +306,7 @@ def load_attack_data(data_type):
                             'technique_id': get_attack_id(t),
                             'x_mitre_platforms': t.get('x_mitre_platforms', None),
                             'x_mitre_domains': gr['x_mitre_domains'],
-                            'matrix': t['external_references'][0]['source_name']
+                            'matrix': t.matrix
                         })
 
         attack_data = all_group_use
@@ -302,6 +421,17 @@ def load_attack_data(data_type):
     return attack_data
 
 
+def _represent_none(representer, data):
+    """
+    Represent a None value as an empty value instead of 'null' (ruamel only does this for the non-first objects when
+    aliases are enabled).
+    :param representer: ruamel.yaml representer
+    :param data: None
+    :return: ruamel.yaml scalar node
+    """
+    return representer.represent_scalar('tag:yaml.org,2002:null', '')
+
+
 def init_yaml():
     """
     Initialize ruamel.yaml with the correct settings
@@ -309,15 +439,65 @@ def init_yaml():
     """
     _yaml = YAML()
     _yaml.Representer.ignore_aliases = lambda *args: True  # disable anchors/aliases
+    _yaml.Representer.add_representer(type(None), _represent_none)
     return _yaml
 
 
+@phase(PHASE_FILE_WRITE)
+def write_yaml_file(yaml_object, filename):
+    """
+    Write the provided YAML object directly to a file. Dates (date and datetime objects) are written unquoted and
+    None values are written as empty values. The file is replaced atomically.
+    :param yaml_object: ruamel.yaml instance or dict
+    :param filename: file location
+    :return:
+    """
+    _yaml = init_yaml()
+    with atomic_open(filename) as f:
+        _yaml.dump(yaml_object, f)
+
+
+def load_yaml_file(filename):
+    """
+    Load the content of a YAML file. The parsed content is kept in memory, and the file is only parsed again when its
+    modification time or size changed. A copy of the content is returned, as callers may modify the content.
+    :param filename: the YAML file location
+    :return: the content of the YAML file as ruamel.yaml object
+    """
+    stat = os.stat(filename)
+    key = os.path.abspath(filename)
+    if key not in _yaml_files_in_memory or _yaml_files_in_memory[key][:2] != (stat.st_mtime_ns, stat.st_size):
+        with phase(PHASE_YAML_PARSE):
+            _yaml = init_yaml()
+            with open(filename, 'r') as yaml_file:
+                yaml_content = _yaml.load(yaml_file)
+        _yaml_files_in_memory[key] = (stat.st_mtime_ns, stat.st_size, yaml_content)
+
+    # a deep copy keeps the ruamel.yaml formatting attributes (e.g. of timestamps), which are lost when pickled
+    return deepcopy(_yaml_files_in_memory[key][2])
+
+
+def get_yaml_lines(yaml_object):
+    """
+    Get the lines of the provided YAML object, in the same way as they are written by 'write_yaml_file'.
+    :param yaml_object: ruamel.yaml instance or dict
+    :return: YAML file lines in a list
+    """
+    _yaml = init_yaml()
+    # ruamel does not support output to a variable. Therefore we make use of StringIO.
+    file = StringIO()
+    _yaml.dump(yaml_object, file)
+    return file.getvalue().splitlines(keepends=True)
+
+
 def get_attack_id(stix_obj):
     """
     Get the Technique, Group or Software ID from the STIX object
     :param stix_obj: STIX object (Technique, Software or Group)
     :return: ATT&CK ID
     """
+    if isinstance(stix_obj, TechniqueRecord):
+        return stix_obj.technique_id
     for ext_ref in stix_obj['external_references']:
         if ext_ref['source_name'] in ['mitre-attack', 'mitre-mobile-attack', 'mitre-ics-attack']:
             return ext_ref['external_id']
@@ -329,10 +509,12 @@ def get_tactics(technique):
     :param technique: technique STIX object
     :return: list with tactics
     """
+    if isinstance(technique, TechniqueRecord):
+        return list(technique.tactics)
     tactics = []
     if 'kill_chain_phases' in technique:
-        for phase in technique['kill_chain_phases']:
-            tactics.append(phase['phase_name'])
+        for kill_chain_phase in technique['kill_chain_phases']:
+            tactics.append(kill_chain_phase['phase_name'])
 
     return tactics
 
@@ -392,33 +574,6 @@ def ask_multiple_choice(question, list_answers):
     return int(answer)
 
 
-def fix_date_and_remove_null(yaml_file, date, input_type='ruamel'):
-    """
-    Remove the single quotes around the date key-value pair in the provided yaml_file and remove any 'null' values
-    :param yaml_file: ruamel.yaml instance or location of YAML file
-    :param date: string date value (e.g. 2019-01-01)
-    :param input_type: input type can be a ruamel.yaml instance or list
-    :return: YAML file lines in a list
-    """
-    _yaml = init_yaml()
-    if input_type == 'ruamel':
-        # ruamel does not support output to a variable. Therefore we make use of StringIO.
-        file = StringIO()
-        _yaml.dump(yaml_file, file)
-        file.seek(0)
-        new_lines = file.readlines()
-    elif input_type == 'list':
-        new_lines = yaml_file
-    elif input_type == 'file':
-        new_lines = yaml_file.readlines()
-
-    fixed_lines = [l.replace('\'' + str(date) + '\'', str(date)).replace('null', '')
-                   if REGEX_YAML_DATE.match(l) else
-                   l.replace('null', '') for l in new_lines]
-
-    return fixed_lines
-
-
 def get_latest_score_obj(yaml_object):
     """
     Get the the score object in the score_logbook by date
@@ -433,7 +588,10 @@ def get_latest_score_obj(yaml_object):
         newest_score_obj = None
         newest_date = None
         for score_obj in yaml_object['score_logbook']:
+            # compare on date: a raw YAML document can contain both dates and timestamps (ruamel.yaml TimeStamp)
             score_obj_date = score_obj['date']
+            if isinstance(score_obj_date, dt):
+                score_obj_date = score_obj_date.date()
 
             if not newest_score_obj or (score_obj_date and score_obj_date > newest_date):
                 newest_date = score_obj_date
@@ -613,9 +771,7 @@ def load_data_sources(file, filter_empty_scores=True):
         yaml_content = file
     else:
         # file is a file location on disk
-        _yaml = init_yaml()
-        with open(file, 'r') as yaml_file:
-            yaml_content = _yaml.load(yaml_file)
+        yaml_content = load_yaml_file(file)
 
     # we have todo this in two phases to bring the 'systems' kv-pair applicable_to values in sync with the data sources details object's applicable_to values
     # phase 1:
@@ -682,9 +838,7 @@ def load_techniques(file):
         yaml_content = file
     else:
         # file is a file location on disk
-        _yaml = init_yaml()
-        with open(file, 'r') as yaml_file:
-            yaml_content = _yaml.load(yaml_file)
+        yaml_content = load_yaml_file(file)
 
     yaml_content = _traverse_modify_date(yaml_content)
 
@@ -821,38 +975,36 @@ def _check_file_type(filename, file_type=None):
         print('[!] File: \'' + filename + '\' does not exist')
         return None
 
-    _yaml = init_yaml()
-    with open(filename, 'r') as yaml_file:
-        try:
-            yaml_content = _yaml.load(yaml_file)
-        except Exception as e:
-            print('[!] File: \'' + filename + '\' is not a valid YAML file.')
-            print('  ' + str(e))  # print more detailed error information to help the user in fixing the error.
-            return None
+    try:
+        yaml_content = load_yaml_file(filename)
+    except Exception as e:
+        print('[!] File: \'' + filename + '\' is not a valid YAML file.')
+        print('  ' + str(e))  # print more detailed error information to help the user in fixing the error.
+        return None
 
-        # This check is performed because a text file will also be considered to be valid YAML. But, we are using
-        # key-value pairs within the YAML files.
-        if not hasattr(yaml_content, 'keys'):
-            print('[!] File: \'' + filename + '\' is not a valid YAML file.')
-            return None
+    # This check is performed because a text file will also be considered to be valid YAML. But, we are using
+    # key-value pairs within the YAML files.
+    if not hasattr(yaml_content, 'keys'):
+        print('[!] File: \'' + filename + '\' is not a valid YAML file.')
+        return None
 
-        # ATT&CK Mobile doesn't support data sources yet, so don't accept data sources files for Mobile yet.
-        domain = 'enterprise-attack' if 'domain' not in yaml_content.keys() else yaml_content['domain']
-        if yaml_content['file_type'] == 'data-source-administration' and domain == 'mobile-attack':
-            print('[!] File: \'' + filename + '\' has domain \'mobile-attack\' but data sources are not yet supported by ATT&CK itself.')
-            return None
+    # ATT&CK Mobile doesn't support data sources yet, so don't accept data sources files for Mobile yet.
+    domain = 'enterprise-attack' if 'domain' not in yaml_content.keys() else yaml_content['domain']
+    if yaml_content['file_type'] == 'data-source-administration' and domain == 'mobile-attack':
+        print('[!] File: \'' + filename + '\' has domain \'mobile-attack\' but data sources are not yet supported by ATT&CK itself.')
+        return None
 
-        if 'file_type' not in yaml_content.keys():
-            print('[!] File: \'' + filename + '\' does not contain a file_type key.')
+    if 'file_type' not in yaml_content.keys():
+        print('[!] File: \'' + filename + '\' does not contain a file_type key.')
+        return None
+    elif file_type:
+        if file_type != yaml_content['file_type']:
+            print('[!] File: \'' + filename + '\' is not a file type of: \'' + file_type + '\'')
             return None
-        elif file_type:
-            if file_type != yaml_content['file_type']:
-                print('[!] File: \'' + filename + '\' is not a file type of: \'' + file_type + '\'')
-                return None
-            else:
-                return yaml_content
         else:
             return yaml_content
+    else:
+        return yaml_content
 
 
 def _check_for_old_data_sources(filename):
@@ -861,9 +1013,7 @@ def _check_for_old_data_sources(filename):
     :param filename: path to data source YAML file
     :return: True if no ATT&CK v8 data sources are found, else False is returned
     """
-    _yaml = init_yaml()
-    with open(filename, 'r') as yaml_file:
-        yaml_content = _yaml.load(yaml_file)
+    yaml_content = load_yaml_file(filename)
 
     data_sources = set([ds['data_source_name'] for ds in yaml_content['data_sources']])
 
@@ -876,25 +1026,62 @@ def _check_for_old_data_sources(filename):
         return True
 
 
+def _check_file_type_from_state(filename, file_type, file_state):
+    """
+    Perform the same checks as '_check_file_type' using the file type, version and domain as stored in the state of
+    the file, which avoids loading the YAML file.
+    :param filename: path to a YAML file
+    :param file_type: value to check against the 'file_type' key in the YAML file
+    :param file_state: the state of the file as retrieved from the state store
+    :return: dict with the file_type and version, else None is returned
+    """
+    if file_state['file_type'] == 'data-source-administration' and file_state['domain'] == 'mobile-attack':
+        print('[!] File: \'' + filename + '\' has domain \'mobile-attack\' but data sources are not yet supported by ATT&CK itself.')
+        return None
+
+    if file_type and file_type != file_state['file_type']:
+        print('[!] File: \'' + filename + '\' is not a file type of: \'' + file_type + '\'')
+        return None
+
+    return {'file_type': file_state['file_type'], 'version': file_state['version']}
+
+
 def check_file(filename, file_type=None, health_is_called=False):
     """
     Calls four functions to perform the following checks: is the file a valid YAML file, needs the file to be upgraded,
-    or does the file contain errors.
+    or does the file contain errors. The outcome of these checks is stored in the state store, so that these checks
+    (and loading the YAML file) are skipped when the file did not change.
     :param filename: path to a YAML file
     :param file_type: value to check against the 'file_type' key in the YAML file
     :param health_is_called: boolean that specifies if detailed errors in the file will be printed by the function 'check_yaml_file_health'
     :return: the file_type if present, else None is returned
     """
-
-    yaml_content = _check_file_type(filename, file_type)
+    file_state = get_file_state(filename)
+    if 'file_type' in file_state:
+        yaml_content = _check_file_type_from_state(filename, file_type, file_state)
+    else:
+        yaml_content = _check_file_type(filename, file_type)
+        if yaml_content and 'version' in yaml_content:
+            domain = 'enterprise-attack' if 'domain' not in yaml_content.keys() else yaml_content['domain']
+            update_file_state(filename, file_type=yaml_content['file_type'], version=yaml_content['version'], domain=domain)
+            file_state = None
 
     # if the file is a valid YAML, continue. Else, return None
     if yaml_content:
         upgrade_yaml_file(filename, file_type, yaml_content['version'])
-        check_yaml_file_health(filename, file_type, health_is_called)
+        if file_state and file_type == FILE_TYPE_DATA_SOURCE_ADMINISTRATION and \
+                yaml_content['version'] < FILE_TYPE_DATA_SOURCE_ADMINISTRATION_VERSION:
+            file_state = None  # the file may have been upgraded
+        check_yaml_file_health(filename, file_type, health_is_called, file_state=file_state)
 
         if file_type == FILE_TYPE_DATA_SOURCE_ADMINISTRATION:
-            if not _check_for_old_data_sources(filename):
+            file_state = get_file_state(filename) if file_state is None else file_state
+            if 'old_data_sources' not in file_state:
+                file_state['old_data_sources'] = not _check_for_old_data_sources(filename)
+                update_file_state(filename, old_data_sources=file_state['old_data_sources'])
+            elif file_state['old_data_sources']:
+                _check_for_old_data_sources(filename)  # prints the message on the ATT&CK v8 data sources
+            if file_state['old_data_sources']:
                 return None
 
         return yaml_content['file_type']
@@ -957,9 +1144,7 @@ def check_platform(arg_platforms, filename=None, domain=None):
     :return: true if the platform(s) are valid, otherwise false
     """
     if filename:
-        _yaml = init_yaml()
-        with open(filename, 'r') as yaml_file:
-            yaml_content = _yaml.load(yaml_file)
+        yaml_content = load_yaml_file(filename)
 
         domain = 'enterprise-attack' if 'domain' not in yaml_content.keys() else yaml_content['domain'].lower()
     elif domain and not domain.endswith('-attack'):
@@ -1,49 +1,39 @@
-from generic import load_attack_data, get_attack_id, get_tactics, get_applicable_data_sources_platform, get_applicable_dettect_data_sources_platform
+from generic import load_attack_data, get_applicable_data_sources_platform, get_applicable_dettect_data_sources_platform
 from constants import *
 from textwrap import wrap
+from datetime import date
+import simplejson
 
 
-def _get_platforms_for_data_source(data_source, domain):
+def _print_json(data):
     """
-    Get the ATT&CK platforms that apply to the provided data source
-    :param data_source: ATT&CK data component or DeTT&CT data source
-    :param domain: the specified domain (enterprise, ics or mobile)
-    :return: list of ATT&CK platforms
+    Print the provided data as JSON. Dates are printed in ISO 8601 format.
+    :param data: the data to print
+    :return:
     """
-    attack_data_sources = DATA_SOURCES_ENTERPRISE if domain == 'enterprise' else DATA_SOURCES_ICS if domain == 'ics' else DATA_SOURCES_MOBILE
-    dettect_data_sources = DETTECT_DATA_SOURCES_PLATFORMS_ENTERPRISE if domain == 'enterprise' else DETTECT_DATA_SOURCES_PLATFORMS_ICS if domain == 'ics' else DETTECT_DATA_SOURCES_PLATFORMS_MOBILE
-
-    platforms = []
-    for platform, data_sources in attack_data_sources.items():
-        if data_source in data_sources:
-            platforms.append(platform)
-    for platform, data_sources in dettect_data_sources.items():
-        if data_source in data_sources:
-            platforms.append(platform)
-
-    return platforms
+    print(simplejson.dumps(data, indent=2, default=lambda d: d.strftime('%Y-%m-%d') if isinstance(d, date) else str(d)))
 
 
-def get_statistics_data_sources(domain, arg_platforms):
+def get_statistics_data_sources(domain, arg_platforms, json_output=False):
     """
     Print out statistics related to data sources and how many techniques they cover.
     :param domain: the specified domain
     :param arg_platforms: ATT&CK platforms
+    :param json_output: print the statistics as JSON
     :return:
     """
     if domain == 'enterprise':
-        stix_type = DATA_TYPE_STIX_ALL_TECH_ENTERPRISE
         attack_platforms = PLATFORMS_ENTERPRISE
     elif domain == 'ics':
-        stix_type = DATA_TYPE_STIX_ALL_TECH_ICS
         attack_platforms = PLATFORMS_ICS
     else:
-        stix_type = DATA_TYPE_STIX_ALL_TECH_MOBILE
         attack_platforms = PLATFORMS_MOBILE
 
-        print('[!] ATT&CK has not yet implemented data sources for Mobile. This will come in a future release of ATT&CK. DeTT&CT is ready for it ;-)')
+        if not json_output:
+            print('[!] ATT&CK has not yet implemented data sources for Mobile. This will come in a future release of ATT&CK. DeTT&CT is ready for it ;-)')
 
-    techniques = load_attack_data(stix_type)
+    index = load_attack_data(DATA_TYPE_INDEX_TECH_BY_DATA_SOURCE)[domain + '-attack']
+    techniques = index['techniques']
 
     # user want to only include data source for specific platforms
     if arg_platforms != None:
@@ -52,38 +42,38 @@ def get_statistics_data_sources(domain, arg_platforms):
         applicable_data_sources = set(get_applicable_data_sources_platform(arg_platforms, domain + '-attack'))
         applicable_data_sources.update(get_applicable_dettect_data_sources_platform(arg_platforms, domain + '-attack'))
 
-    # {data_source: {techniques: [T0001, ...], count: ..., platforms: []}
-    data_sources_dict = {}
-    for tech in techniques:
-        # only continue if one of the below statements is valid:
-        #  - arg_platforms == None (no platform filtering has been provide via cli arguments by the user)
-        #  - there are platforms in the technique, which are also in arg_platforms
-        tech_platforms = set(tech.get('x_mitre_platforms', []))
-        if arg_platforms == None or arg_platforms.intersection(tech_platforms):
-            tech_id = tech['technique_id']
-            # Not every technique has a data source listed
-            data_sources = tech.get('x_mitre_data_sources', [])
-            dettect_data_sources = tech.get('dettect_data_sources', [])
-            for ds in data_sources + dettect_data_sources:
-                ds_component = ds
-                if ':' in ds:
-                    ds_component = ds.split(':')[1][1:].lstrip().rstrip()
-
-                if arg_platforms != None:
-                    if ds_component not in applicable_data_sources:
-                        continue
-
-                if ds not in data_sources_dict:
-                    platforms = _get_platforms_for_data_source(ds_component, domain)
-                    if arg_platforms != None:
-                        platforms = list(set(platforms).intersection(arg_platforms))
-                    data_sources_dict[ds] = {'techniques': [tech_id], 'count': 1, 'platforms': platforms}
-                else:
-                    data_sources_dict[ds]['techniques'].append(tech_id)
-                    data_sources_dict[ds]['count'] += 1
-
-    # sort the dict on the value of 'count'
-    data_sources_dict_sorted = dict(sorted(data_sources_dict.items(), key=lambda kv: kv[1]['count'], reverse=True))
+        # the positions of the techniques having one of the platforms in arg_platforms
+        applicable_techniques = set(i for i, (_, tech_platforms) in enumerate(techniques)
+                                    if arg_platforms.intersection(tech_platforms))
+
+    # [(first use, data source, {techniques: [T0001, ...], count: ..., platforms: []}), ...]
+    data_sources_list = []
+    for ds, uses in index['data_sources'].items():
+        ds_component = ds
+        if ':' in ds:
+            ds_component = ds.split(':')[1][1:].lstrip().rstrip()
+
+        platforms = index['platforms'].get(ds_component, [])
+        if arg_platforms != None:
+            if ds_component not in applicable_data_sources:
+                continue
+            uses = [u for u in uses if u[0] in applicable_techniques]
+            if not uses:
+                continue
+            platforms = list(set(platforms).intersection(arg_platforms))
+
+        data_sources_list.append((tuple(uses[0]), ds, {'techniques': [techniques[u[0]][0] for u in uses],
+                                                       'count': len(uses), 'platforms': platforms}))
+
+    # sort on the value of 'count', and on the first use of the data source within the techniques
+    data_sources_list.sort(key=lambda kv: kv[0])
+    data_sources_dict_sorted = dict((ds, v) for _, ds, v in sorted(data_sources_list, key=lambda kv: kv[2]['count'], reverse=True))
+
+    if json_output:
+        _print_json([{'data_source': k, 'count': v['count'], 'platforms': v['platforms'], 'techniques': v['techniques']}
+                     for k, v in data_sources_dict_sorted.items()])
+        return
+
     str_format = '{:<6s} {:<40s} {:s}'
     print(str_format.format('Count', 'Data Source', 'Platform(s)'))
     print('-' * 120)
@@ -100,118 +90,155 @@ def get_statistics_data_sources(domain, arg_platforms):
             print(' ' * 48 + p)
 
 
-def get_statistics_mitigations(domain):
+def get_statistics_mitigations(domain, json_output=False):
     """
     Print out statistics related to mitigations and how many techniques they cover
     :param domain: the specified domain
+    :param json_output: print the statistics as JSON
     :return:
     """
+    mitigations = load_attack_data(DATA_TYPE_INDEX_TECH_BY_MITIGATION)[domain + '-attack']
+    count_dict_sorted = dict(sorted(mitigations.items(), key=lambda kv: len(kv[1]['techniques']), reverse=True))
 
-    if domain == 'enterprise':
-        mitigations = load_attack_data(DATA_TYPE_STIX_ALL_ENTERPRISE_MITIGATIONS)
-    elif domain == 'mobile':
-        mitigations = load_attack_data(DATA_TYPE_STIX_ALL_MOBILE_MITIGATIONS)
-    elif domain == 'ics':
-        mitigations = load_attack_data(DATA_TYPE_STIX_ALL_ICS_MITIGATIONS)
-
-    mitigations_dict = dict()
-    for m in mitigations:
-        if m['external_references'][0]['external_id'].startswith('M'):
-            mitigations_dict[m['id']] = {'mID': m['external_references'][0]['external_id'], 'name': m['name']}
-
-    relationships = load_attack_data(DATA_TYPE_STIX_ALL_RELATIONSHIPS)
-    relationships_mitigates = [r for r in relationships
-                               if r['relationship_type'] == 'mitigates'
-                               if r['source_ref'].startswith('course-of-action')
-                               if r['target_ref'].startswith('attack-pattern')
-                               if r['source_ref'] in mitigations_dict]
-
-    # {id: {name: ..., count: ..., name: ...} }
-    count_dict = dict()
-    for r in relationships_mitigates:
-        src_ref = r['source_ref']
-
-        m = mitigations_dict[src_ref]
-        if m['mID'] not in count_dict:
-            count_dict[m['mID']] = dict()
-            count_dict[m['mID']]['count'] = 1
-            count_dict[m['mID']]['name'] = m['name']
-        else:
-            count_dict[m['mID']]['count'] += 1
-
-    count_dict_sorted = dict(sorted(count_dict.items(), key=lambda kv: kv[1]['count'], reverse=True))
+    if json_output:
+        _print_json([{'mitigation_id': k, 'name': v['name'], 'count': len(v['techniques']), 'techniques': v['techniques']}
+                     for k, v in count_dict_sorted.items()])
+        return
 
     str_format = '{:<6s} {:<14s} {:s}'
     print(str_format.format('Count', 'Mitigation ID', 'Name'))
     print('-' * 60)
     for k, v in count_dict_sorted.items():
-        print(str_format.format(str(v['count']), k, v['name']))
+        print(str_format.format(str(len(v['techniques'])), k, v['name']))
 
 
-def get_platforms(domain):
+def get_platforms(domain, json_output=False):
     """
     Print a list of ATT&CK platforms for the specified domain.
     :param domain: the specified domain
+    :param json_output: print the platforms as JSON
     :return:
     """
     platforms = PLATFORMS_ENTERPRISE if domain == 'enterprise' else PLATFORMS_ICS if domain == 'ics' else PLATFORMS_MOBILE
+    if json_output:
+        _print_json(list(platforms.values()))
+        return
+
     platform_str = [' - ' + p for p in platforms.values()]
     domain_prt = 'Enterprise' if domain == 'enterprise' else 'ICS' if domain == 'ics' else 'Mobile'
     print('ATT&CK platforms for the domain ' + domain_prt + ':')
     print('\n'.join(platform_str))
 
 
-def get_updates(update_type, sort='modified'):
+def get_updates(update_type, sort='modified', json_output=False):
     """
     Print a list of updates for a techniques, groups or software. Sort by modified or creation date.
     :param update_type: the type of update: techniques, groups or software
     :param sort: sort the list by modified or creation date
+    :param json_output: print the updates as JSON
     :return:
     """
     from pprint import pprint
-    if update_type[: -1] == 'technique':
-        techniques = load_attack_data(DATA_TYPE_STIX_ALL_TECH)
-        sorted_techniques = sorted(techniques, key=lambda k: k[sort])
+    index = load_attack_data(DATA_TYPE_INDEX_UPDATES)[update_type]
+    sorted_objects = [index['objects'][i] for i in index[sort]]
 
-        for t in sorted_techniques:
+    if json_output:
+        _print_json(sorted_objects)
+        return
 
-            if t['technique_id'] == None:
+    if update_type[: -1] == 'technique':
+        for t in sorted_objects:
+
+            if t['id'] == None:
                 pprint(t)
                 quit()
 
-            print(t['technique_id'] + ' ' + t['name'])
+            print(t['id'] + ' ' + t['name'])
             print(' ' * 6 + 'created:  ' + t['created'].strftime('%Y-%m-%d'))
             print(' ' * 6 + 'modified: ' + t['modified'].strftime('%Y-%m-%d'))
-            print(' ' * 6 + 'domain:   ' + t['external_references'][0]['source_name'][6:])
-            tactics = get_tactics(t)
-            if tactics:
-                print(' ' * 6 + 'tactic:   ' + ', '.join(tactics))
+            print(' ' * 6 + 'domain:   ' + t['domain'])
+            if t['tactics']:
+                print(' ' * 6 + 'tactic:   ' + ', '.join(t['tactics']))
             else:
                 print(' ' * 6 + 'tactic:   None')
             print('')
 
     elif update_type[: -1] == 'group':
-        groups = load_attack_data(DATA_TYPE_STIX_ALL_GROUPS)
-        sorted_groups = sorted(groups, key=lambda k: k[sort])
-
-        for g in sorted_groups:
-            print(get_attack_id(g) + ' ' + g['name'])
+        for g in sorted_objects:
+            print(g['id'] + ' ' + g['name'])
             print(' ' * 6 + 'created:  ' + g['created'].strftime('%Y-%m-%d'))
             print(' ' * 6 + 'modified: ' + g['modified'].strftime('%Y-%m-%d'))
             print('')
 
     elif update_type == 'software':
-        software = load_attack_data(DATA_TYPE_STIX_ALL_SOFTWARE)
-        sorted_software = sorted(software, key=lambda k: k[sort])
-
-        for s in sorted_software:
-            print(get_attack_id(s) + ' ' + s['name'])
+        for s in sorted_objects:
+            print(s['id'] + ' ' + s['name'])
             print(' ' * 6 + 'created:  ' + s['created'].strftime('%Y-%m-%d'))
             print(' ' * 6 + 'modified: ' + s['modified'].strftime('%Y-%m-%d'))
-            print(' ' * 6 + 'domain:   ' + s['external_references'][0]['source_name'][6:])
+            print(' ' * 6 + 'domain:   ' + s['domain'])
             print(' ' * 6 + 'type:     ' + s['type'])
-            if 'x_mitre_platforms' in s:
-                print(' ' * 6 + 'platform: ' + ', '.join(s['x_mitre_platforms']))
+            if s['platforms'] is not None:
+                print(' ' * 6 + 'platform: ' + ', '.join(s['platforms']))
             else:
                 print(' ' * 6 + 'platform: None')
             print('')
+
+
+def get_diff(old_path, new_path, paths, json_output=False):
+    """
+    Print the changes between two ATT&CK snapshots (cache directories or local STIX repositories), and the
+    administration files and layers affected by these changes.
+    :param old_path: path to the cache directory or local STIX repository of the old snapshot
+    :param new_path: path to the cache directory or local STIX repository of the new snapshot
+    :param paths: list of administration YAML files, layer files and/or directories containing these files
+    :param json_output: print the changes as JSON
+    :return:
+    """
+    from attack_diff import get_attack_diff, get_affected_files
+    diff = get_attack_diff(old_path, new_path)
+    affected = get_affected_files(diff, paths) if paths else {}
+
+    if json_output:
+        diff['affected_files'] = affected
+        _print_json(diff)
+        return
+
+    for object_type, title in [('techniques', 'Techniques'), ('groups', 'Groups'), ('software', 'Software')]:
+        changes = diff[object_type]
+        print(title + ': ' + ', '.join(str(len(changes[c])) + ' ' + c for c in ['added', 'removed', 'revoked', 'modified']))
+        for o in changes['added']:
+            print('  [+] ' + o['id'] + ' ' + o['name'])
+        for o in changes['removed']:
+            print('  [-] ' + o['id'] + ' ' + o['name'])
+        for o in changes['revoked']:
+            print('  [r] ' + o['id'] + ' ' + o['name'] + ' (revoked by ' + o['revoked_by'] + ')')
+        for o in changes['modified']:
+            print('  [~] ' + o['id'] + ' ' + o['name'] + ': ' + ', '.join(o['fields']))
+        print('')
+
+    changes = diff['data_components']
+    print('Data components: ' + ', '.join(str(len(changes[c])) + ' ' + c for c in ['added', 'removed', 'modified']))
+    for ds in changes['added']:
+        print('  [+] ' + ds['name'] + ' (' + str(len(ds['techniques'])) + ' techniques)')
+    for ds in changes['removed']:
+        print('  [-] ' + ds['name'] + ' (' + str(len(ds['techniques'])) + ' techniques)')
+    for ds in changes['modified']:
+        print('  [~] ' + ds['name'] + ': ' + str(len(ds['added_techniques'])) + ' techniques added, ' +
+              str(len(ds['removed_techniques'])) + ' techniques removed')
+    print('')
+
+    for key, title in [('group_techniques', 'Group-to-technique'), ('software_techniques', 'Software-to-technique')]:
+        changes = diff[key]
+        print(title + ' relationships: ' + str(len(changes['added'])) + ' added, ' + str(len(changes['removed'])) + ' removed')
+        for attack_id, tech_id in changes['added']:
+            print('  [+] ' + attack_id + ' -> ' + tech_id)
+        for attack_id, tech_id in changes['removed']:
+            print('  [-] ' + attack_id + ' -> ' + tech_id)
+        print('')
+
+    if paths:
+        print('Affected files: ' + str(len(affected)))
+        for filename, file_changes in affected.items():
+            print('  ' + filename)
+            for c in file_changes:
+                print(' ' * 6 + c)
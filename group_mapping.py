@@ -1,26 +1,75 @@
+import hashlib
 import simplejson
+import file_output
 from eql_yaml import techniques_search
 from generic import *
 from navigator_layer import *
 from file_output import *
+from instrumentation import phase
 
-CG_GROUPS = {}
+# { lowercase group ID/name/alias: set(group_id, ...) }
+GROUP_RESOLVER = {}
+# { (domain, frozenset(platform)): { group_id: {group_name: NAME, techniques: [id, ...]} } }
+GROUP_TECHNIQUES_INDEX = {}
 
 
-def _is_in_group(json_groups, argument_groups):
+def _get_group_resolver():
     """
-    Check if the two dicts (json_groups and argument_groups) have any groups in common based on their names/aliases.
-    :param json_groups: group aliases from ATT&CK
+    Get the case-folded lookup from an ATT&CK group ID, name or alias to the group ID(s) it refers to. The lookup is
+    built once from the ATT&CK data and reused for every group provided via '-g/--groups' or '-o/--overlay'.
+    :return: dictionary {lowercase ID/name/alias: set(group_id, ...)}
+    """
+    if not GROUP_RESOLVER:
+        for group in load_attack_data(DATA_TYPE_STIX_ALL_GROUPS):
+            group_id = get_attack_id(group)
+            for key in [group_id, group['name']] + (group.get('aliases', None) or []):
+                if key:
+                    GROUP_RESOLVER.setdefault(key.lower(), set()).add(group_id)
+
+    return GROUP_RESOLVER
+
+
+def _resolve_group_ids(argument_groups):
+    """
+    Resolve the groups provided via the command line (ID, name or alias in lower case) to ATT&CK group IDs.
     :param argument_groups: group names provided via the command line by the user
-    :return: true or false
+    :return: set with ATT&CK group IDs
     """
-    json_groups = list(map(lambda x: x.lower(), json_groups))
+    resolver = _get_group_resolver()
+    group_ids = set()
+    for group_arg in argument_groups:
+        group_ids.update(resolver.get(group_arg, set()))
 
-    for group in argument_groups:
-        if group in json_groups:
-            return True
+    return group_ids
 
-    return False
+
+def _get_group_techniques_index(domain, platform):
+    """
+    Get per group the set of techniques for the provided domain and platform(s). The result is computed once for
+    every domain/platform combination and reused afterwards.
+    :param domain: the specified domain
+    :param platform: one or multiple values from PLATFORMS constant
+    :return: dictionary {group_id: {group_name: NAME, techniques: [technique_id, ...]}}
+    """
+    key = (domain, frozenset(platform))
+    if key not in GROUP_TECHNIQUES_INDEX:
+        platform = set(platform)
+        index = {}
+        for gr in load_attack_data(DATA_TYPE_CUSTOM_TECH_BY_GROUP):
+            platforms = gr['x_mitre_platforms']
+            if not platforms:
+                # we just set this to an random legit value, because for pre-attack 'platform' is not used
+                platforms = ['Windows']
+
+            # group matches the: matrix/stage and platform
+            if domain in gr['x_mitre_domains'] and not platform.isdisjoint(platforms):
+                if gr['group_id'] not in index:
+                    index[gr['group_id']] = {'group_name': gr['name'], 'techniques': []}
+                index[gr['group_id']]['techniques'].append(gr['technique_id'])
+
+        GROUP_TECHNIQUES_INDEX[key] = index
+
+    return GROUP_TECHNIQUES_INDEX[key]
 
 
 def _are_groups_found(groups_found, argument_groups):
@@ -30,30 +79,25 @@ def _are_groups_found(groups_found, argument_groups):
     :param argument_groups: groups provided via the command line by the user
     :return: returns boolean that indicates if all of the groups are found
     """
-    group_attack_data = load_attack_data(DATA_TYPE_STIX_ALL_GROUPS)
+    resolver = _get_group_resolver()
     group_found = True
 
     for group_arg in argument_groups:
         if group_arg == 'all':  # this one will be ignored as it does not make any sense for this function
             return True
 
-        group_id = None
-        for group in group_attack_data:  # is the group provided via the command line known in ATT&CK?
-            group_aliases_lower = []
-            if 'aliases' in group:
-                group_aliases_lower = list(map(lambda x: x.lower(), group['aliases']))
-            if group_arg in group_aliases_lower or group_arg == get_attack_id(group).lower() or group_arg == group['name'].lower():
-                group_id = get_attack_id(group)
-        if not group_id:  # the group that has been provided through the command line cannot be found in ATT&CK
+        group_ids = resolver.get(group_arg, None)  # is the group provided via the command line known in ATT&CK?
+        if not group_ids:  # the group that has been provided through the command line cannot be found in ATT&CK
             print('[!] Unknown ATT&CK group: ' + group_arg)
             group_found = False
-        elif group_id not in groups_found:  # group not present in filtered (platform) data set
+        elif group_ids.isdisjoint(groups_found):  # group not present in filtered (platform) data set
             print('[!] Group not part of the data set: ' + group_arg)
             group_found = False
 
     return group_found
 
 
+@phase(PHASE_MAPPING)
 def _get_software_techniques(groups, platform, domain):
     """
     Get all techniques (in a dict) from the provided list of groups in relation to the software these groups use,
@@ -79,9 +123,7 @@ def _get_software_techniques(groups, platform, domain):
 
     # groups is a YAML file
     if os.path.isfile(str(groups)):
-        _yaml = init_yaml()
-        with open(groups, 'r') as yaml_file:
-            config = _yaml.load(yaml_file)
+        config = load_yaml_file(groups)
 
         for group in config['groups']:
             if group['enabled']:
@@ -106,13 +148,15 @@ def _get_software_techniques(groups, platform, domain):
     # groups are provided as arguments via the command line
     else:
         software_by_group = load_attack_data(DATA_TYPE_CUSTOM_SOFTWARE_BY_GROUP)
+        group_ids = _resolve_group_ids(groups)
+        platform = set(platform)
 
         for s in software_by_group:
             # software matches the ATT&CK Matrix and platform
             # and the group is a group we are interested in
             if s['x_mitre_platforms']:  # there is software that do not have a platform, skip those
-                if domain in s['x_mitre_domains'] and len(set(s['x_mitre_platforms']).intersection(set(platform))) > 0 and \
-                        (groups[0] == 'all' or s['group_id'].lower() in groups or _is_in_group(s['aliases'], groups) or s['name'].lower() in groups):
+                if domain in s['x_mitre_domains'] and not platform.isdisjoint(s['x_mitre_platforms']) and \
+                        (groups[0] == 'all' or s['group_id'] in group_ids):
                     if s['group_id'] not in groups_dict:
                         groups_dict[s['group_id']] = {'group_name': s['name']}
                         groups_dict[s['group_id']]['techniques'] = set()
@@ -122,36 +166,18 @@ def _get_software_techniques(groups, platform, domain):
 
 
 def _generate_group_id(group_name, campaign):
-    # CG_GROUPS = { group_name+campaign: id } }
     """
-    Generate a custom group id.
+    Generate a custom group id. The id is derived from a hash of the group name and campaign, which makes it stable
+    across runs and independent of the order in which groups are loaded (e.g. within parallel worker processes).
     :param group_name: group name as used within the YAML file
     :param campaign: campaign as used within the YAML file
-    :return: custom group identifier string (e.g. CG0001)
-    """
-    global CG_GROUPS
-
-    if not CG_GROUPS:
-        new_id = 1
-    elif group_name + campaign not in CG_GROUPS:
-        new_id = len(CG_GROUPS) + 1
-
-    if group_name + campaign not in CG_GROUPS:
-        length = len(str(new_id))
-        if length > 9:
-            cg_id = 'CG00' + str(new_id)
-        elif length > 99:
-            cg_id = 'CG0' + str(new_id)
-        elif length > 999:
-            cg_id = 'CG' + str(new_id)
-        else:
-            cg_id = 'CG000' + str(new_id)
-
-        CG_GROUPS[group_name + campaign] = cg_id
-
-    return CG_GROUPS[group_name + campaign]
+    :return: custom group identifier string (e.g. CG1F3A9C04B2D7)
+    """
+    digest = hashlib.sha1((group_name + '\0' + campaign).encode('utf-8')).hexdigest()
+    return 'CG' + digest[:12].upper()
 
 
+@phase(PHASE_MAPPING)
 def _get_group_techniques(groups, platform, file_type, domain):
     """
     Get all techniques (in a dict) from the provided list of groups
@@ -167,9 +193,7 @@ def _get_group_techniques(groups, platform, file_type, domain):
 
     # groups is a YAML file
     if file_type == FILE_TYPE_GROUP_ADMINISTRATION:
-        _yaml = init_yaml()
-        with open(groups, 'r') as yaml_file:
-            config = _yaml.load(yaml_file)
+        config = load_yaml_file(groups)
 
         domain_in_file = 'enterprise-attack' if 'domain' not in config.keys() else config['domain']
         if domain_in_file != domain:
@@ -195,25 +219,19 @@ def _get_group_techniques(groups, platform, file_type, domain):
                 groups_dict[group_id]['software'] = group.get('software_id', None)
     else:
         # groups are provided as arguments via the command line
-        all_groups_tech = load_attack_data(DATA_TYPE_CUSTOM_TECH_BY_GROUP)
-
-        for gr in all_groups_tech:
-            platforms = gr['x_mitre_platforms']
-            if not platforms:
-                # we just set this to an random legit value, because for pre-attack 'platform' is not used
-                platforms = ['Windows']
-
-            # group matches the: matrix/stage, platform and the group(s) we are interested in
-            if domain in gr['x_mitre_domains'] and len(set(platforms).intersection(set(platform))) > 0 and \
-                    (groups[0] == 'all' or gr['group_id'].lower() in groups or _is_in_group(gr['aliases'], groups) or gr['name'].lower() in groups):
-                if gr['group_id'] not in groups_dict:
-                    groups_found.add(gr['group_id'])
-                    groups_dict[gr['group_id']] = {'group_name': gr['name']}
-                    groups_dict[gr['group_id']]['techniques'] = set()
-                    groups_dict[gr['group_id']]['weight'] = dict()
+        group_techniques = _get_group_techniques_index(domain, platform)
+        if groups[0] == 'all':
+            group_ids = group_techniques.keys()
+        else:
+            group_ids = _resolve_group_ids(groups)
 
-                groups_dict[gr['group_id']]['techniques'].add(gr['technique_id'])
-                groups_dict[gr['group_id']]['weight'][gr['technique_id']] = 1
+        # keep the order of the ATT&CK data when adding the group(s) we are interested in
+        for group_id, values in group_techniques.items():
+            if group_id in group_ids:
+                groups_found.add(group_id)
+                groups_dict[group_id] = {'group_name': values['group_name']}
+                groups_dict[group_id]['techniques'] = set(values['techniques'])
+                groups_dict[group_id]['weight'] = dict((t, 1) for t in values['techniques'])
 
         # do not call '_are_groups_found' when groups is a YAML file
         # (this could contain groups that do not exists within ATT&CK)
@@ -275,6 +293,50 @@ def _get_visibility_techniques(filename):
     return groups_dict, visibility_techniques, domain
 
 
+def _get_membership_bitsets(groups):
+    """
+    Create the techniques x groups matrix as one bitset per technique. Bit i is set when the technique is part of the
+    i-th group in the provided dict.
+    :param groups: a dict with data on groups
+    :return: dictionary {technique_id: bitset} (in order of appearance of the techniques)
+    """
+    bitsets = {}
+    for idx, values in enumerate(groups.values()):
+        bit = 1 << idx
+        for tech in values['techniques']:
+            bitsets[tech] = bitsets.get(tech, 0) | bit
+
+    return bitsets
+
+
+def _get_bitset_indexes(bitset):
+    """
+    Get the index of every bit that is set within the provided bitset, starting with the lowest bit.
+    :param bitset: bitset (integer)
+    :return: generator with bit indexes
+    """
+    while bitset:
+        lowest_bit = bitset & -bitset
+        yield lowest_bit.bit_length() - 1
+        bitset ^= lowest_bit
+
+
+def _get_shared_id_bitset(groups, other_groups):
+    """
+    Get a bitset of the groups in 'other_groups' that have a group ID which is also present in 'groups'.
+    :param groups: a dict with data on groups
+    :param other_groups: a dict with data on groups (overlay or software groups)
+    :return: bitset (integer)
+    """
+    bitset = 0
+    for idx, group in enumerate(other_groups.keys()):
+        if group in groups:
+            bitset |= 1 << idx
+
+    return bitset
+
+
+@phase(PHASE_MAPPING)
 def _get_technique_count(groups, groups_overlay, groups_software, overlay_type, all_techniques):
     """
     Create a dict with all involved techniques and their relevant count/score
@@ -285,82 +347,60 @@ def _get_technique_count(groups, groups_overlay, groups_software, overlay_type,
     :param all_techniques: dict containing all technique data for visibility or detection
     :return: dictionary, max_count
     """
-    # { technique_id: {count: ..., groups: set{} }
+    # { technique_id: {count: ..., groups: bitset, overlay: bitset, software: bitset} }
     techniques_dict = {}
 
-    for group, v in groups.items():
-        for tech in v['techniques']:
-            if tech not in techniques_dict:
-                techniques_dict[tech] = dict()
-                techniques_dict[tech]['groups'] = set()
-                techniques_dict[tech]['count'] = v['weight'][tech]
+    groups_values = list(groups.values())
+    groups_bitsets = _get_membership_bitsets(groups)
+    for tech, bitset in groups_bitsets.items():
+        count = 0
+        for idx in _get_bitset_indexes(bitset):
+            count += groups_values[idx]['weight'][tech]
+        techniques_dict[tech] = {'count': count, 'groups': bitset, 'overlay': 0, 'software': 0}
+
+    max_count = max(techniques_dict.values(), key=lambda k: k['count'])['count']
+
+    overlay_ids = list(groups_overlay.keys())
+    overlay_values = list(groups_overlay.values())
+    for tech, bitset in _get_membership_bitsets(groups_overlay).items():
+        if tech not in techniques_dict:
+            techniques_dict[tech] = {'count': 0, 'groups': 0, 'overlay': 0, 'software': 0}
+        techniques_dict[tech]['overlay'] = bitset
+
+        for idx in _get_bitset_indexes(bitset):
+            group = overlay_ids[idx]
+            # Only count the technique when it was not already counted by being part of 'groups'. Meaning the group in
+            # 'groups_overlay' was also part of 'groups' (match on Group ID) and the technique was already counted for
+            # that group / it is not a new technique for that group coming from a YAML file
+            if group in groups and tech in groups[group]['techniques']:
+                continue
 
             # We only want to increase the score when comparing groups and not for visibility or detection.
             # This allows to have proper sorting of the heat map, which in turn improves the ability to visually
             # compare this heat map with the detection/visibility ATT&CK Navigator layers.
-            else:
-                techniques_dict[tech]['count'] += v['weight'][tech]
-            techniques_dict[tech]['groups'].add(group)
-
-    max_count = max(techniques_dict.values(), key=lambda k: k['count'])['count']
-
-    # create dict {tech_id: score+max_tech_count} to be used for when doing an overlay of the type visibility or detection
-    if overlay_type != OVERLAY_TYPE_GROUP:
-        dict_tech_score = {}
-        list_tech = groups_overlay[overlay_type.upper()]['techniques']
-        for tech in list_tech:
-            if overlay_type == OVERLAY_TYPE_VISIBILITY:
-                dict_tech_score[tech] = calculate_score(all_techniques[tech]['visibility']) + max_count
+            if overlay_type == OVERLAY_TYPE_GROUP:
+                techniques_dict[tech]['count'] += overlay_values[idx]['weight'][tech]
+            elif overlay_type == OVERLAY_TYPE_VISIBILITY:
+                techniques_dict[tech]['count'] = calculate_score(all_techniques[tech]['visibility']) + max_count
             elif overlay_type == OVERLAY_TYPE_DETECTION:
-                dict_tech_score[tech] = calculate_score(all_techniques[tech]['detection'], zero_value=-1) + max_count
-
-    for group, v in groups_overlay.items():
-        for tech in v['techniques']:
-            if tech not in techniques_dict:
-                techniques_dict[tech] = dict()
-                techniques_dict[tech]['groups'] = set()
-                if overlay_type == OVERLAY_TYPE_GROUP:
-                    techniques_dict[tech]['count'] = v['weight'][tech]
-                else:
-                    techniques_dict[tech]['count'] = dict_tech_score[tech]
-            elif group in groups:
-                if tech not in groups[group]['techniques']:
-                    if overlay_type == OVERLAY_TYPE_GROUP:
-                        techniques_dict[tech]['count'] += v['weight'][tech]
-                    else:
-                        techniques_dict[tech]['count'] = dict_tech_score[tech]
-                    # Only do this when it was not already counted by being part of 'groups'.
-                    # Meaning the group in 'groups_overlay' was also part of 'groups' (match on Group ID) and the
-                    # technique was already counted for that group / it is not a new technique for that group coming
-                    # from a YAML file
-            else:
-                if overlay_type == OVERLAY_TYPE_GROUP:
-                    # increase count when the group in the YAML file is a custom group
-                    techniques_dict[tech]['count'] += v['weight'][tech]
-                else:
-                    techniques_dict[tech]['count'] = dict_tech_score[tech]
-
-            techniques_dict[tech]['groups'].add(group)
+                techniques_dict[tech]['count'] = calculate_score(all_techniques[tech]['detection'], zero_value=-1) + max_count
 
-    for group, v in groups_software.items():
-        for tech in v['techniques']:
-            if tech not in techniques_dict:
-                techniques_dict[tech] = dict()
-                techniques_dict[tech]['count'] = 0
-                # we will not adjust the scoring for groups_software. We will just set the the score to 0.
-                # This will later be used for the colouring of the heat map.
-            if 'groups' not in techniques_dict[tech]:
-                techniques_dict[tech]['groups'] = set()
-            techniques_dict[tech]['groups'].add(group)
+    for tech, bitset in _get_membership_bitsets(groups_software).items():
+        if tech not in techniques_dict:
+            # we will not adjust the scoring for groups_software. We will just set the the score to 0.
+            # This will later be used for the colouring of the heat map.
+            techniques_dict[tech] = {'count': 0, 'groups': 0, 'overlay': 0, 'software': 0}
+        techniques_dict[tech]['software'] = bitset
 
     return techniques_dict, max_count
 
 
+@phase(PHASE_MAPPING)
 def _get_technique_layer(techniques_count, groups, overlay, groups_software, overlay_file_type, overlay_type,
                          all_techniques):
     """
     Create the technique layer that will be part of the ATT&CK navigator json file
-    :param techniques_count: involved techniques with count (to be used within the scores)
+    :param techniques_count: involved techniques with count and group bitsets (to be used within the scores)
     :param groups: a dict with data on groups
     :param overlay: a dict with data on the groups to overlay
     :param groups_software: a dict with with data on which techniques are used within related software
@@ -371,7 +411,15 @@ def _get_technique_layer(techniques_count, groups, overlay, groups_software, ove
     """
     techniques_layer = []
 
-    # { technique_id: {count: ..., groups: set{} }
+    groups_values = list(groups.values())
+    overlay_values = list(overlay.values())
+    software_values = list(groups_software.values())
+
+    # overlay and software groups having a group ID that is also part of the groups (-g/--groups)
+    overlay_in_groups = _get_shared_id_bitset(groups, overlay)
+    software_in_groups = _get_shared_id_bitset(groups, groups_software)
+
+    # { technique_id: {count: ..., groups: bitset, overlay: bitset, software: bitset} }
     # add the technique count/scoring
     for tech, v in techniques_count.items():
         t = dict()
@@ -380,25 +428,37 @@ def _get_technique_layer(techniques_count, groups, overlay, groups_software, ove
         t['metadata'] = []
         metadata_dict = dict()
 
-        for group, values in groups.items():
-            if tech in values['techniques']:  # we do not color this one because that's done using the scoring
-                if 'Group' not in metadata_dict:
-                    metadata_dict['Group'] = set()
-                metadata_dict['Group'].add(values['group_name'])
+        for idx in _get_bitset_indexes(v['groups']):  # we do not color this one because that's done using the scoring
+            values = groups_values[idx]
+            if 'Group' not in metadata_dict:
+                metadata_dict['Group'] = set()
+            metadata_dict['Group'].add(values['group_name'])
 
-                # this will only be effective when loading a YAML files that have a value for the key 'campaign'
-                if 'campaign' in values:
-                    if 'Campaign' not in metadata_dict:
-                        metadata_dict['Campaign'] = set()
-                    metadata_dict['Campaign'].add(values['campaign'])
+            # this will only be effective when loading a YAML files that have a value for the key 'campaign'
+            if 'campaign' in values:
+                if 'Campaign' not in metadata_dict:
+                    metadata_dict['Campaign'] = set()
+                metadata_dict['Campaign'].add(values['campaign'])
 
         # change the color and add metadata to make the groups overlay visible
-        for group, values in overlay.items():
-            if tech in values['techniques']:
+        if v['overlay']:
+            # is the technique both present in the group (-g/--groups) and the groups overlay (-o/--overlay)
+            in_groups = v['groups'] or v['overlay'] & overlay_in_groups or v['software'] & software_in_groups
+
+            # determine the score for the color in case of an overlay with detection or visibility
+            s = None
+            if overlay_file_type == FILE_TYPE_TECHNIQUE_ADMINISTRATION:
+                if overlay_type == OVERLAY_TYPE_VISIBILITY:
+                    s = calculate_score(all_techniques[tech]['visibility'])
+                elif overlay_type == OVERLAY_TYPE_DETECTION:
+                    s = calculate_score(all_techniques[tech]['detection'], zero_value=-1)
+
+            for idx in _get_bitset_indexes(v['overlay']):
+                values = overlay_values[idx]
                 # Determine color:
-                if len(v['groups'].intersection(set(groups.keys()))) > 0:
+                if in_groups:
                     # if the technique is both present in the group (-g/--groups) and the groups overlay (-o/--overlay)
-                    metadata_dict['Group'].add(values['group_name'])
+                    metadata_dict.setdefault('Group', set()).add(values['group_name'])
 
                     # determine the color of the overlay:
                     # - using groups, it's normal orange
@@ -406,10 +466,8 @@ def _get_technique_layer(techniques_count, groups, overlay, groups_software, ove
                     # - using visibility, it's 4 variations of orange (score 1 to 4)
                     if overlay_file_type == FILE_TYPE_TECHNIQUE_ADMINISTRATION:
                         if overlay_type == OVERLAY_TYPE_VISIBILITY:
-                            s = calculate_score(all_techniques[tech]['visibility'])
                             t['color'] = COLOR_O_1 if s == 1 else COLOR_O_2 if s == 2 else COLOR_O_3 if s == 3 else COLOR_O_4 if s == 4 else ''
                         elif overlay_type == OVERLAY_TYPE_DETECTION:
-                            s = calculate_score(all_techniques[tech]['detection'], zero_value=-1)
                             t['color'] = COLOR_O_0 if s == 0 else COLOR_O_1 if s == 1 else COLOR_O_2 if s == 2 else COLOR_O_3 if s == 3 else COLOR_O_4 if s == 4 else COLOR_O_5 if s == 5 else ''
                     else:
                         t['color'] = COLOR_GROUP_OVERLAY_MATCH
@@ -417,10 +475,8 @@ def _get_technique_layer(techniques_count, groups, overlay, groups_software, ove
                     # the technique is only present in the overlay and not in the provided groups (-g/--groups)
                     if overlay_file_type == FILE_TYPE_TECHNIQUE_ADMINISTRATION:
                         if overlay_type == OVERLAY_TYPE_VISIBILITY:
-                            s = calculate_score(all_techniques[tech]['visibility'])
                             t['color'] = COLOR_V_1 if s == 1 else COLOR_V_2 if s == 2 else COLOR_V_3 if s == 3 else COLOR_V_4 if s == 4 else ''
                         elif overlay_type == OVERLAY_TYPE_DETECTION:
-                            s = calculate_score(all_techniques[tech]['detection'], zero_value=-1)
                             t['color'] = COLOR_D_0 if s == 0 else COLOR_D_1 if s == 1 else COLOR_D_2 if s == 2 else COLOR_D_3 if s == 3 else COLOR_D_4 if s == 4 else COLOR_D_5 if s == 5 else ''
                     else:
                         t['color'] = COLOR_GROUP_OVERLAY_NO_MATCH
@@ -435,13 +491,14 @@ def _get_technique_layer(techniques_count, groups, overlay, groups_software, ove
                         t['metadata'] = add_metadata_technique_object(all_techniques[tech], obj_type, t['metadata'])
 
         # change the color and add metadata to make the groups software overlay visible
-        for group, values in groups_software.items():
-            if tech in values['techniques']:
-                if t['score'] > 0:
-                    t['color'] = COLOR_GROUP_AND_SOFTWARE
-                else:
-                    t['color'] = COLOR_SOFTWARE
+        if v['software']:
+            if t['score'] > 0:
+                t['color'] = COLOR_GROUP_AND_SOFTWARE
+            else:
+                t['color'] = COLOR_SOFTWARE
 
+            for idx in _get_bitset_indexes(v['software']):
+                values = software_values[idx]
                 if 'Software groups' not in metadata_dict:
                     metadata_dict['Software groups'] = set()
                 metadata_dict['Software groups'].add(values['group_name'])
@@ -485,6 +542,41 @@ def _get_group_list(groups, file_type):
         return groups
 
 
+def _create_group_layer(groups_dict, overlay_dict, groups_software_dict, overlay_file_type, overlay_type,
+                        all_techniques, groups_list, overlay_list, platform, layer_name, domain, layer_settings):
+    """
+    Create the Navigator layer for the provided group(s), overlay and software groups.
+    :param groups_dict: a dict with data on groups
+    :param overlay_dict: a dict with data on the groups to overlay
+    :param groups_software_dict: a dict with with data on which techniques are used within related software
+    :param overlay_file_type: the file type of the YAML file as present in the key 'file_type'
+    :param overlay_type: group, visibility or detection
+    :param all_techniques: dictionary with all techniques loaded from techniques administration YAML file
+    :param groups_list: list of group names for the involved groups
+    :param overlay_list: list of group names for the involved overlay groups
+    :param platform: one or multiple ATT&CK platform values
+    :param layer_name: the name of the Navigator layer
+    :param domain: the specified domain
+    :param layer_settings: settings for the Navigator layer
+    :return: the layer as JSON string
+    """
+    technique_count, max_count = _get_technique_count(groups_dict, overlay_dict, groups_software_dict, overlay_type, all_techniques)
+    technique_layer = _get_technique_layer(technique_count, groups_dict, overlay_dict, groups_software_dict,
+                                           overlay_file_type, overlay_type, all_techniques)
+
+    desc = 'stage: attack | platform(s): ' + platform_to_name(platform, domain, separator=', ') + ' | group(s): ' \
+        + ', '.join(groups_list) + ' | overlay group(s): ' + ', '.join(overlay_list)
+
+    if not layer_name:
+        layer_name = 'Attack - ' + platform_to_name(platform, domain, separator=', ')
+
+    layer = get_layer_template_groups(layer_name, max_count, desc, platform, overlay_type, domain, layer_settings)
+    layer['techniques'] = technique_layer
+
+    with phase(PHASE_LAYER_SERIALIZATION):
+        return simplejson.dumps(layer).replace('}, ', '},\n')
+
+
 def generate_group_heat_map(groups, overlay, overlay_type, platform, software_groups, search_visibility,
                             search_detection, health_is_called, output_filename, layer_name, domain, layer_settings,
                             include_all_score_objs=False):
@@ -529,9 +621,7 @@ def generate_group_heat_map(groups, overlay, overlay_type, platform, software_gr
     # set the correct value for platform
     platform_yaml = None
     if groups_file_type == FILE_TYPE_GROUP_ADMINISTRATION:
-        _yaml = init_yaml()
-        with open(groups, 'r') as yaml_file:
-            group_file = _yaml.load(yaml_file)
+        group_file = load_yaml_file(groups)
 
         domain_in_file = 'enterprise-attack' if 'domain' not in group_file.keys() else group_file['domain']
         domain_in_argument = 'enterprise-attack' if domain == 'enterprise' else 'ics-attack' if domain == 'ics' else 'mobile-attack' if domain == 'mobile' else None
@@ -611,10 +701,6 @@ def generate_group_heat_map(groups, overlay, overlay_type, platform, software_gr
     elif software_groups:
         groups_software_dict = _get_software_techniques(groups, platform, domain)
 
-    technique_count, max_count = _get_technique_count(groups_dict, overlay_dict, groups_software_dict, overlay_type, all_techniques)
-    technique_layer = _get_technique_layer(technique_count, groups_dict, overlay_dict, groups_software_dict,
-                                           overlay_file_type, overlay_type, all_techniques)
-
     # make a list group names for the involved groups.
     if groups == ['all']:
         groups_list = ['all']
@@ -622,16 +708,9 @@ def generate_group_heat_map(groups, overlay, overlay_type, platform, software_gr
         groups_list = _get_group_list(groups_dict, groups_file_type)
     overlay_list = _get_group_list(overlay_dict, overlay_file_type)
 
-    desc = 'stage: attack | platform(s): ' + platform_to_name(platform, domain, separator=', ') + ' | group(s): ' \
-        + ', '.join(groups_list) + ' | overlay group(s): ' + ', '.join(overlay_list)
-
-    if not layer_name:
-        layer_name = 'Attack - ' + platform_to_name(platform, domain, separator=', ')
-
-    layer = get_layer_template_groups(layer_name, max_count, desc, platform, overlay_type, domain, layer_settings)
-    layer['techniques'] = technique_layer
-
-    json_string = simplejson.dumps(layer).replace('}, ', '},\n')
+    json_string = _create_group_layer(groups_dict, overlay_dict, groups_software_dict, overlay_file_type, overlay_type,
+                                      all_techniques, groups_list, overlay_list, platform, layer_name, domain,
+                                      layer_settings)
 
     if not output_filename:
         filename = '_'.join(groups_list)
@@ -642,3 +721,174 @@ def generate_group_heat_map(groups, overlay, overlay_type, platform, software_gr
         write_file(filename, json_string)
     else:
         write_file(output_filename, json_string)
+
+
+def _get_bulk_group_heat_maps(filename, platform, domain, overlay_dict, overlay_file_type, overlay_type,
+                              all_techniques, health_is_called, layer_settings):
+    """
+    Create and write the heat map, and the overlay heat map when an overlay is provided, for one group administration
+    YAML file. This function is executed within the worker processes of 'generate_group_heat_maps_bulk'.
+    :param filename: path to a group administration YAML file
+    :param platform: one or multiple ATT&CK platform values or None to use the platform(s) from the YAML file
+    :param domain: the specified domain
+    :param overlay_dict: a dict with the visibility or detection to overlay
+    :param overlay_file_type: the file type of the overlay YAML file as present in the key 'file_type'
+    :param overlay_type: visibility or detection
+    :param all_techniques: dictionary with all techniques loaded from techniques administration YAML file
+    :param health_is_called: boolean that specifies if detailed errors in the file will be printed
+    :param layer_settings: settings for the Navigator layer
+    :return: tuple with the groups dict, the platform(s) of the YAML file, the written layer files and the ATT&CK data
+    types loaded by the worker, or None when something went wrong
+    """
+    file_output.written_files = []
+    if not check_file(filename, file_type=FILE_TYPE_GROUP_ADMINISTRATION, health_is_called=health_is_called):
+        return None
+
+    groups_dict = _get_group_techniques(filename, platform, FILE_TYPE_GROUP_ADMINISTRATION, domain)
+    if groups_dict == -1:
+        print('[!] Skipped: ' + filename)
+        return None
+    if len(groups_dict) == 0:
+        print('[!] Empty layer, skipped: ' + filename)
+        return None
+
+    if platform is None:
+        platform = get_platform_from_yaml(load_yaml_file(filename), domain)
+        if not platform:
+            platform = list(PLATFORMS_ENTERPRISE.values()) if domain == 'enterprise-attack' else list(PLATFORMS_ICS.values() if domain == 'ics-attack' else list(PLATFORMS_MOBILE.values()))
+
+    report_name = os.path.splitext(os.path.basename(filename))[0]
+    groups_list = _get_group_list(groups_dict, FILE_TYPE_GROUP_ADMINISTRATION)
+
+    json_string = _create_group_layer(groups_dict, {}, {}, None, OVERLAY_TYPE_GROUP, None, groups_list, [], platform,
+                                      report_name, domain, layer_settings)
+    write_file(create_output_filename('attack', report_name), json_string)
+
+    if overlay_dict:
+        overlay_list = _get_group_list(overlay_dict, overlay_file_type)
+        json_string = _create_group_layer(groups_dict, overlay_dict, {}, overlay_file_type, overlay_type,
+                                          all_techniques, groups_list, overlay_list, platform, report_name, domain,
+                                          layer_settings)
+        write_file(create_output_filename('attack', report_name + '-overlay_' + '_'.join(overlay_list)), json_string)
+
+    return groups_dict, platform, file_output.written_files, loaded_attack_data_types
+
+
+def generate_group_heat_maps_bulk(path, overlay, overlay_type, platform, search_visibility, search_detection,
+                                  health_is_called, output_filename, layer_name, domain, layer_settings,
+                                  include_all_score_objs=False):
+    """
+    Create heat maps for all group administration YAML files within a directory (e.g. 'threat-actor-data') in one run:
+    a heat map per file, an overlay heat map per file when a visibility or detection overlay is provided and one
+    aggregate heat map for all files. The score of a technique within the aggregate heat map is the sum of the weights
+    of that technique in all files. The YAML files are processed in parallel using one worker process per CPU core.
+    :param path: directory containing group administration YAML files
+    :param overlay: a technique administration YAML file with the visibility or detection to overlay
+    :param overlay_type: visibility or detection
+    :param platform: one or multiple ATT&CK platform values or None
+    :param search_visibility: visibility EQL search query
+    :param search_detection: detection EQL search query
+    :param health_is_called: boolean that specifies if detailed errors in the file will be printed
+    :param output_filename: output filename defined by the user for the aggregate heat map
+    :param layer_name: the name of the Navigator layer for the aggregate heat map
+    :param domain: the specified domain
+    :param layer_settings: settings for the Navigator layer
+    :param include_all_score_objs: include all score objects within the score_logbook for the EQL query
+    :return: returns None when something went wrong
+    """
+    from shared_attack_data import attack_data_pool
+
+    if not os.path.isdir(path):
+        print('[!] The provided path is not a directory: ' + path)
+        return None
+
+    filenames = sorted([os.path.join(path, f) for f in os.listdir(path)
+                        if f.endswith(('.yaml', '.yml')) and os.path.isfile(os.path.join(path, f))])
+    if not filenames:
+        print('[!] No YAML files found in: ' + path)
+        return None
+
+    domain = 'mobile-attack' if domain == 'mobile' else 'ics-attack' if domain == 'ics' else 'enterprise-attack'
+
+    if platform is not None:
+        if 'all' in [p.lower() for p in platform if p is not None]:
+            platform = list(PLATFORMS_ENTERPRISE.values()) if domain == 'enterprise-attack' else list(PLATFORMS_ICS.values() if domain == 'ics-attack' else list(PLATFORMS_MOBILE.values()))
+        else:
+            if not check_platform(platform, domain=domain):
+                return None
+            platform = get_platform_in_correct_capitalisation(platform, domain)
+
+    # load the visibility or detection to overlay only once for all YAML files
+    overlay_dict = {}
+    overlay_file_type = None
+    all_techniques = None
+    if overlay:
+        overlay = overlay[0]
+        if overlay_type not in [OVERLAY_TYPE_VISIBILITY, OVERLAY_TYPE_DETECTION] or not os.path.isfile(overlay):
+            print('[!] Only a technique administration YAML file can be overlaid in bulk. Specify the type of overlay using -t/--overlay-type: visibility or detection.')
+            return None
+        overlay_file_type = check_file(overlay, FILE_TYPE_TECHNIQUE_ADMINISTRATION, health_is_called=health_is_called)
+        if not overlay_file_type:
+            return None  # the overlay_file_type is not of the expected type
+
+        if search_detection or search_visibility:
+            overlay = techniques_search(overlay, search_visibility, search_detection,
+                                        include_all_score_objs=include_all_score_objs)
+            if not overlay:
+                return None  # something went wrong in executing the search or 0 results where returned
+
+        if overlay_type == OVERLAY_TYPE_VISIBILITY:
+            overlay_dict, all_techniques, domain_overlay = _get_visibility_techniques(overlay)
+        else:
+            overlay_dict, all_techniques, domain_overlay = _get_detection_techniques(overlay)
+        if domain_overlay != domain:
+            print('[!] The domain specified in the overlay YAML file conflicts with the given value for the -d/--domain argument.')
+            return None
+
+    # the workers attach to the ATT&CK data loaded once by this process
+    with attack_data_pool([DATA_TYPE_CUSTOM_TECH_BY_GROUP, DATA_TYPE_CUSTOM_TECH_BY_SOFTWARE,
+                           DATA_TYPE_CUSTOM_SOFTWARE_BY_GROUP]) as executor:
+        futures = [executor.submit(_get_bulk_group_heat_maps, filename, platform, domain, overlay_dict,
+                                   overlay_file_type, overlay_type, all_techniques, health_is_called, layer_settings)
+                   for filename in filenames]
+        results = [f.result() for f in futures]
+
+    # combine the groups of all YAML files into one aggregate heat map (keep the order of the files)
+    groups_dict = {}
+    groups_list = []
+    aggregate_platform = set()
+    for result in results:
+        if result is None:
+            continue
+        file_groups, file_platform, written_files, attack_data_types = result
+        # the layers are written and the ATT&CK data is loaded by the workers, but these are part of this run as well
+        file_output.written_files.extend(written_files)
+        loaded_attack_data_types.update(attack_data_types)
+        for group_id, values in file_groups.items():
+            # the same group (and campaign) within multiple files results in the same group ID: sum the weights
+            if group_id in groups_dict:
+                aggregate_group = groups_dict[group_id]
+                aggregate_group['techniques'].update(values['techniques'])
+                for tech, weight in values['weight'].items():
+                    aggregate_group['weight'][tech] = aggregate_group['weight'].get(tech, 0) + weight
+            else:
+                groups_dict[group_id] = values
+                groups_list.extend(_get_group_list({group_id: values}, FILE_TYPE_GROUP_ADMINISTRATION))
+        aggregate_platform.update(file_platform)
+
+    if not groups_dict:
+        print('[!] Empty layer.')
+        return None
+
+    if platform is None:
+        platforms = PLATFORMS_ENTERPRISE if domain == 'enterprise-attack' else PLATFORMS_ICS if domain == 'ics-attack' else PLATFORMS_MOBILE
+        platform = [p for p in platforms.values() if p in aggregate_platform]
+
+    if not layer_name:
+        layer_name = 'Attack - ' + os.path.basename(os.path.normpath(path))
+
+    json_string = _create_group_layer(groups_dict, {}, {}, None, OVERLAY_TYPE_GROUP, None, groups_list, [], platform,
+                                      layer_name, domain, layer_settings)
+    if not output_filename:
+        output_filename = create_output_filename('attack', 'aggregate_' + os.path.basename(os.path.normpath(path)))
+    write_file(output_filename, json_string)
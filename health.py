@@ -1,121 +1,172 @@
+import hashlib
 import os
-import pickle
 from difflib import SequenceMatcher
 from constants import *
+from file_state import get_file_state, update_file_state, get_file_cache, update_file_cache
+from instrumentation import phase
 
 
-def _print_error_msg(msg, print_error):
-    if print_error:
-        print(msg)
-    return True
-
-
-def _update_health_state(current, update):
-    if current or update:
-        return True
-    else:
-        return update
-
-
-def _is_file_modified(filename):
+def _add_finding(findings, rule, message, item=None, path=None, details=None):
     """
-    Check if the provided file was modified since the last check
-    :param filename: file location
-    :return: true when modified else false
+    Add a finding of a health check rule to the list of findings.
+    :param findings: list of findings
+    :param rule: ID of the health check rule
+    :param message: the error message
+    :param item: technique ID or data source name to which the finding applies
+    :param path: location of the finding within the YAML file
+    :param details: list of values which are printed below the message
+    :return: True
     """
-    last_modified_file = 'cache/last-modified_' + os.path.basename(filename).rstrip('.yaml')
-
-    def _update_modified_date(date):
-        with open(last_modified_file, 'wb') as fd:
-            pickle.dump(date, fd)
-
-    if not os.path.exists(last_modified_file):
-        last_modified = os.path.getmtime(filename)
-        _update_modified_date(last_modified)
-
-        return True
-    else:
-        with open(last_modified_file, 'rb') as f:
-            last_modified_cache = pickle.load(f)
-            last_modified_current = os.path.getmtime(filename)
-
-            if last_modified_cache != last_modified_current:
-                _update_modified_date(last_modified_current)
-                return True
-            else:
-                return False
+    finding = {'rule': rule, 'item': item, 'path': path, 'message': message}
+    if details:
+        finding['details'] = details
+    findings.append(finding)
+    return True
 
 
-def _get_health_state_cache(filename):
+def _print_findings(findings, print_error):
     """
-    Get file health state from disk
-    :param filename: file location
-    :return: the cached error state
+    Print the error messages of the provided findings.
+    :param findings: list of findings
+    :param print_error: specify if the error messages should be printed or not
+    :return:
     """
-    last_error_file = 'cache/last-error-state_' + os.path.basename(filename).rstrip('.yaml')
-
-    if os.path.exists(last_error_file):
-        with open(last_error_file, 'rb') as f:
-            last_error_state_cache = pickle.load(f)
-
-        return last_error_state_cache
+    if print_error:
+        for finding in findings:
+            print(finding['message'])
+            for value in finding.get('details', []):
+                print('    - ' + value)
 
 
 def _update_health_state_cache(filename, has_error):
     """
-    Write the file health state to disk if changed
+    Store the file health state
     :param filename: file location
+    :param has_error: True when the file contains errors, otherwise False
     """
     # the function 'check_health_data_sources' will call this function without providing a filename when
     # 'check_health_data_sources' is called from '_events_to_yaml' within 'eql_yaml.py'
     if filename:
-        last_error_file = 'cache/last-error-state_' + os.path.basename(filename).rstrip('.yaml')
-
-        def _update(error):
-            with open(last_error_file, 'wb') as fd:
-                pickle.dump(error, fd)
-
-        if not os.path.exists(last_error_file):
-            _update(has_error)
-        else:
-            error_state_cache = _get_health_state_cache(filename)
-            if error_state_cache != has_error:
-                _update(has_error)
+        update_file_state(filename, has_error=has_error)
 
 
-def _check_for_similar_values(values, values_key_name, health_is_called=False):
+def _get_similar_value_pairs(values):
+    """
+    Get the pairs of values which are a very close match (a SequenceMatcher ratio above 0.8, but not identical).
+    Instead of comparing every pair of values, candidate pairs are selected using an index on the character bigrams
+    of the values and their length. A pair of different values with a ratio above 0.8 always shares a bigram and the
+    length of the shortest value is more than 2/3 of the longest value. The full ratio is only calculated for the
+    candidates which pass the cheaper upper bounds (real_quick_ratio and quick_ratio).
+    :param values: list of unique values
+    :return: dictionary {index of value: set(index of similar value, ...)}
+    """
+    # { bigram: [index of value, ...] }
+    bigram_index = {}
+    for idx, value in enumerate(values):
+        for bigram in set(value[i:i + 2] for i in range(len(value) - 1)):
+            bigram_index.setdefault(bigram, []).append(idx)
+
+    similar = {}
+    for idx, value in enumerate(values):
+        candidates = set()
+        for bigram in set(value[i:i + 2] for i in range(len(value) - 1)):
+            candidates.update(bigram_index[bigram])
+
+        for candidate in candidates:
+            if candidate <= idx:
+                continue
+            other_value = values[candidate]
+            if min(len(value), len(other_value)) * 3 <= max(len(value), len(other_value)) * 2:
+                continue
+
+            matcher = SequenceMatcher(None, value, other_value)
+            if matcher.real_quick_ratio() <= 0.8 or matcher.quick_ratio() <= 0.8:
+                continue
+            # the ratio is not always symmetrical, so compare in both directions
+            if matcher.ratio() > 0.8 or SequenceMatcher(None, other_value, value).ratio() > 0.8:
+                similar.setdefault(idx, set()).add(candidate)
+                similar.setdefault(candidate, set()).add(idx)
+
+    return similar
+
+
+def _check_for_similar_values(values, values_key_name, findings):
     """
     Check if values within the provided list 'values' are a very close match.
     :param values: the list of values to check for close matches
-    :values_key_name: the kv-pair key name from which these values are originating
-    :health_is_called: specify if an error message should be printed or not
+    :param values_key_name: the kv-pair key name from which these values are originating
+    :param findings: list of findings to which a finding is added when similar values are found
+    :return: True if similar values are found, otherwise False
     """
-    values_non_empty = [v for v in values if v is not None]
+    values_unique = list(dict.fromkeys(v for v in values if v is not None))
     has_similar = False
     similar = set()
-    for i1 in values_non_empty:
-        for i2 in values_non_empty:
-            match_value = SequenceMatcher(None, i1, i2).ratio()
-            if match_value > 0.8 and match_value != 1:
-                similar.add(i1)
-                similar.add(i2)
+    similar_pairs = _get_similar_value_pairs(values_unique)
+    for idx, value in enumerate(values_unique):
+        for other_idx in sorted(similar_pairs.get(idx, [])):
+            similar.add(value)
+            similar.add(values_unique[other_idx])
 
     if len(similar) > 0:
-        has_similar = _print_error_msg(
-            '[!] There are values in the key-value pairs for \'' + values_key_name + '\' which are very similar. Correct where necessary:', health_is_called)
-        for s in similar:
-            _print_error_msg('    - ' + s, health_is_called)
+        has_similar = _add_finding(findings, 'similar-values',
+                                   '[!] There are values in the key-value pairs for \'' + values_key_name + '\' which are very similar. Correct where necessary:',
+                                   path=values_key_name, details=list(similar))
 
     return has_similar
 
 
-def _check_health_score_object(yaml_object, object_type, tech_id, health_is_called):
+def _get_block_hash(block):
+    """
+    Get a hash of the content of a technique or data source block within a YAML file. The type of every value is
+    part of the hash, because the health checks depend on it (e.g. a date versus a string).
+    :param block: technique or data source block (dict, list or value)
+    :return: hex digest
+    """
+    def _canonical(obj):
+        if isinstance(obj, dict):
+            return 'd', tuple((_canonical(k), _canonical(v)) for k, v in obj.items())
+        elif isinstance(obj, list):
+            return 'l', tuple(_canonical(v) for v in obj)
+        else:
+            return type(obj).__name__, repr(obj)
+
+    return hashlib.sha1(repr((HEALTH_RULES_VERSION, _canonical(block))).encode('utf-8')).hexdigest()
+
+
+def _check_health_blocks(filename, blocks, check_function):
+    """
+    Execute the health checks for every technique or data source block. The checks are only executed for blocks that
+    changed since the last check: the results for all other blocks are taken from the cache.
+    :param filename: file location (None when the content does not originate from a file)
+    :param blocks: list with the arguments for 'check_function' per block
+    :param check_function: function that checks one block and returns (findings, applicable_to values)
+    :return: list with the results (findings, applicable_to values) per block
+    """
+    cache = get_file_cache(filename, 'health_blocks') or {}
+    new_cache = {}
+    results = []
+    for block in blocks:
+        block_hash = _get_block_hash(block)
+        if block_hash in cache:
+            new_cache[block_hash] = cache[block_hash]
+        else:
+            new_cache[block_hash] = check_function(*block)
+        results.append(new_cache[block_hash])
+
+    # only the blocks that are currently part of the file are kept
+    if filename and new_cache.keys() != cache.keys():
+        update_file_cache(filename, 'health_blocks', new_cache)
+    return results
+
+
+def _check_health_score_object(yaml_object, object_type, tech_id, findings, path):
     """
     Check the health of a score_logbook inside a visibility or detection YAML object
     :param yaml_object: YAML file lines
     :param object_type: 'detection' or 'visibility'
     :param tech_id: ATT&CK technique ID
-    :param health_is_called: boolean that specifies if detailed errors in the file will be printed
+    :param findings: list of findings to which the findings of this check are added
+    :param path: location of the visibility or detection YAML object within the YAML file
     :return: True if the YAML file is unhealthy, otherwise False
     """
     has_error = False
@@ -133,33 +184,34 @@ def _check_health_score_object(yaml_object, object_type, tech_id, health_is_call
         yaml_object['score_logbook'] = [yaml_object['score_logbook']]
 
     try:
-        for score_obj in yaml_object['score_logbook']:
+        for i, score_obj in enumerate(yaml_object['score_logbook']):
+            score_path = '%s.score_logbook[%d]' % (path, i)
             for key in ['date', 'score', 'comment']:
                 if key not in score_obj:
-                    has_error = _print_error_msg('[!] Technique ID: ' + tech_id + ' is MISSING a key-value pair in a ' +
-                                                 object_type + ' score object within the \'score_logbook\': ' + key, health_is_called)
+                    has_error = _add_finding(findings, 'score-key-missing', '[!] Technique ID: ' + tech_id + ' is MISSING a key-value pair in a ' +
+                                             object_type + ' score object within the \'score_logbook\': ' + key, tech_id, score_path)
 
             if score_obj['score'] is None:
-                has_error = _print_error_msg('[!] Technique ID: ' + tech_id + ' has an EMPTY key-value pair in a ' +
-                                             object_type + ' score object within the \'score_logbook\': score', health_is_called)
+                has_error = _add_finding(findings, 'score-empty', '[!] Technique ID: ' + tech_id + ' has an EMPTY key-value pair in a ' +
+                                         object_type + ' score object within the \'score_logbook\': score', tech_id, score_path)
 
             elif not isinstance(score_obj['score'], int):
-                has_error = _print_error_msg('[!] Technique ID: ' + tech_id + ' has an INVALID score format in a ' + object_type +
-                                             ' score object within the \'score_logbook\': ' + score_obj['score'] + '  (should be an integer)', health_is_called)
+                has_error = _add_finding(findings, 'score-invalid-format', '[!] Technique ID: ' + tech_id + ' has an INVALID score format in a ' + object_type +
+                                         ' score object within the \'score_logbook\': ' + score_obj['score'] + '  (should be an integer)', tech_id, score_path)
 
             if 'auto_generated' in score_obj:
                 if not isinstance(score_obj['auto_generated'], bool):
-                    has_error = _print_error_msg(
-                        '[!] Technique ID: ' + tech_id + ' has an INVALID \'auto_generated\' value in a ' + object_type + ' score object within the \'score_logbook\': should be set to \'true\' or \'false\'', health_is_called)
+                    has_error = _add_finding(findings, 'auto-generated-invalid',
+                                             '[!] Technique ID: ' + tech_id + ' has an INVALID \'auto_generated\' value in a ' + object_type + ' score object within the \'score_logbook\': should be set to \'true\' or \'false\'', tech_id, score_path)
 
             if isinstance(score_obj['score'], int):
                 if score_obj['date'] is None and ((score_obj['score'] > -1 and object_type == 'detection') or (score_obj['score'] > 0 and object_type == 'visibility')):
-                    has_error = _print_error_msg('[!] Technique ID: ' + tech_id + ' has an EMPTY key-value pair in a ' +
-                                                 object_type + ' score object within the \'score_logbook\': date', health_is_called)
+                    has_error = _add_finding(findings, 'date-empty', '[!] Technique ID: ' + tech_id + ' has an EMPTY key-value pair in a ' +
+                                             object_type + ' score object within the \'score_logbook\': date', tech_id, score_path)
 
                 if not (score_obj['score'] >= min_score and score_obj['score'] <= max_score):
-                    has_error = _print_error_msg(
-                        '[!] Technique ID: ' + tech_id + ' has an INVALID ' + object_type + ' score in a score object within the \'score_logbook\': ' + str(score_obj['score']) + '  (should be between ' + str(min_score) + ' and ' + str(max_score) + ')', health_is_called)
+                    has_error = _add_finding(findings, 'score-out-of-range',
+                                             '[!] Technique ID: ' + tech_id + ' has an INVALID ' + object_type + ' score in a score object within the \'score_logbook\': ' + str(score_obj['score']) + '  (should be between ' + str(min_score) + ' and ' + str(max_score) + ')', tech_id, score_path)
 
                 if not score_obj['date'] is None:
                     try:
@@ -170,31 +222,101 @@ def _check_health_score_object(yaml_object, object_type, tech_id, health_is_call
                         # pylint: disable=pointless-statement
                         score_obj['date'].day
                     except AttributeError:
-                        has_error = _print_error_msg('[!] Technique ID: ' + tech_id + ' has an INVALID data format in a ' + object_type +
-                                                     ' score object within the \'score_logbook\': ' + score_obj['date'] + '  (should be YYYY-MM-DD without quotes)', health_is_called)
+                        has_error = _add_finding(findings, 'date-invalid-format', '[!] Technique ID: ' + tech_id + ' has an INVALID data format in a ' + object_type +
+                                                 ' score object within the \'score_logbook\': ' + score_obj['date'] + '  (should be YYYY-MM-DD without quotes)', tech_id, score_path)
     except KeyError:
         pass
 
     return has_error
 
 
-def _check_health_techniques(filename, technique_content, health_is_called):
+def _check_health_technique(tech, technique):
+    """
+    Check on errors in the detection and visibility objects of one technique within the technique administration
+    YAML file.
+    :param tech: ATT&CK technique ID
+    :param technique: dict with the lists of detection and visibility objects of the technique
+    :return: the findings and a list with all applicable_to values of the technique
+    """
+    from generic import set_yaml_dv_comments
+    findings = []
+    all_applicable_to = []
+
+    for obj_type in ['detection', 'visibility']:
+        if obj_type not in technique:
+            _add_finding(findings, 'object-missing', '[!] Technique ID: ' + tech + ' is MISSING a key-value pair: ' + obj_type, tech,
+                         'techniques[%s]' % tech)
+        else:
+            obj_applicable_to = []
+            for i, obj in enumerate(technique[obj_type]):
+                obj = set_yaml_dv_comments(obj)
+                obj_path = 'techniques[%s].%s[%d]' % (tech, obj_type, i)
+                obj_keys = ['applicable_to', 'comment', 'score_logbook']
+                obj_keys_list = ['applicable_to']
+                obj_keys_not_none = ['applicable_to']
+                if obj_type == 'detection':
+                    obj_keys.append('location')
+                    obj_keys_list.append('location')
+                    obj_keys_not_none.append('location')
+
+                for okey in obj_keys:
+                    if okey not in obj:
+                        _add_finding(findings, 'key-missing', '[!] Technique ID: ' + tech +
+                                     ' is MISSING a key-value pair in \'' + obj_type + '\': ' + okey, tech, obj_path)
+
+                for okey in obj_keys_list:
+                    if okey in obj:
+                        if not isinstance(obj[okey], list):
+                            _add_finding(findings, 'key-not-list', '[!] Technique ID: ' + tech + ' the key-value pair \'' + okey +
+                                         '\' in \'' + obj_type + '\' is NOT a list', tech, obj_path + '.' + okey)
+
+                for okey in obj_keys_not_none:
+                    if okey in obj and isinstance(obj[okey], list):
+                        none_count = 0
+                        for item in obj[okey]:
+                            if item is None:
+                                none_count += 1
+                        if none_count == 1:
+                            _add_finding(findings, 'value-empty', '[!] Technique ID: ' + tech + ' the key-value pair \'' + okey + '\' in \'' +
+                                         obj_type + '\' has an EMPTY value  (an empty string is allowed: \'\')', tech, obj_path + '.' + okey)
+                        elif none_count > 1:
+                            _add_finding(findings, 'value-empty', '[!] Technique ID: ' + tech + ' the key-value pair \'' + okey + '\' in \'' + obj_type +
+                                         '\' has multiple EMPTY values  (an empty string is allowed: \'\')', tech, obj_path + '.' + okey)
+
+                _check_health_score_object(obj, obj_type, tech, findings, obj_path)
+
+                if 'applicable_to' in obj and isinstance(obj['applicable_to'], list):
+                    all_applicable_to.extend(obj['applicable_to'])
+                    obj_applicable_to.extend(obj['applicable_to'])
+
+                    if obj_type == 'visibility' and len(set(obj['applicable_to'])) > 1 and 'all' in [a.lower() for a in obj['applicable_to'] if a is not None]:
+                        _add_finding(findings, 'applicable-to-all-combined', '[!] Technique ID: ' + tech + ' the key-value pair \'applicable_to\' in \'' + obj_type +
+                                     '\' has \'all\' as a value that is not exclusively used (\'all\' can not be combined ' +
+                                     'with other applicable_to values in a visibility object).', tech, obj_path + '.applicable_to')
+
+            if len(obj_applicable_to) > len(set(obj_applicable_to)):
+                _add_finding(findings, 'applicable-to-duplicate', '[!] Technique ID: ' + tech + ' the key-value pair \'applicable_to\' in \'' + obj_type +
+                             '\' has DUPLICATE system values (a system can only be part of one ' +
+                             'applicable_to key-value pair within the same technique).', tech, 'techniques[%s].%s' % (tech, obj_type))
+
+    return findings, all_applicable_to
+
+
+def _get_health_findings_techniques(filename, technique_content):
     """
     Check on errors in the provided technique administration YAML file.
     :param filename: YAML file location
     :param technique_content: content of the YAML file in a list of dicts
-    :param health_is_called: boolean that specifies if detailed errors in the file will be printed to stdout
-    :return:
+    :return: list of findings
     """
-    from generic import load_techniques
-    has_error = False
+    findings = []
 
     # Check domain attribute (is optional):
     domain = 'enterprise-attack'
     if 'domain' in technique_content:
         if not technique_content['domain'].lower() in DETTECT_DOMAIN_SUPPORT:
-            has_error = _print_error_msg('[!] INVALID domain value in technique administration file: %s. Must be one of: %s' %
-                                         (technique_content['domain'], ', '.join(DETTECT_DOMAIN_SUPPORT)), health_is_called)
+            _add_finding(findings, 'domain-invalid', '[!] INVALID domain value in technique administration file: %s. Must be one of: %s' %
+                         (technique_content['domain'], ', '.join(DETTECT_DOMAIN_SUPPORT)), path='domain')
         else:
             domain = technique_content['domain']
 
@@ -207,10 +329,10 @@ def _check_health_techniques(filename, technique_content, health_is_called):
             platform = ['empty']
         for p in platform:
             if p.lower() not in supported_platforms.keys():
-                has_error = _print_error_msg(
-                    '[!] EMPTY or INVALID value for \'platform\' within the technique administration '
-                    'file: %s (should be value(s) of: [%s] or all)' % (p, ', '.join(list(supported_platforms.values()))),
-                    health_is_called)
+                _add_finding(findings, 'platform-invalid',
+                             '[!] EMPTY or INVALID value for \'platform\' within the technique administration '
+                             'file: %s (should be value(s) of: [%s] or all)' % (p, ', '.join(list(supported_platforms.values()))),
+                             path='platform')
 
     # create a list of ATT&CK technique IDs and check for duplicates
     tech_ids = list(map(lambda x: x['technique_id'], technique_content['techniques']))
@@ -219,98 +341,182 @@ def _check_health_techniques(filename, technique_content, health_is_called):
         if tech not in tech_dup:
             tech_dup.add(tech)
         else:
-            has_error = _print_error_msg('[!] Duplicate technique ID: ' + tech, health_is_called)
+            _add_finding(findings, 'technique-id-duplicate', '[!] Duplicate technique ID: ' + tech, tech, 'techniques[%s]' % tech)
 
         # check if the technique has a valid format
         if not REGEX_YAML_TECHNIQUE_ID_FORMAT.match(tech):
-            has_error = _print_error_msg('[!] Invalid technique ID: ' + tech, health_is_called)
+            _add_finding(findings, 'technique-id-invalid', '[!] Invalid technique ID: ' + tech, tech, 'techniques[%s]' % tech)
+
+    # combine the detection and visibility objects per technique ID (as is also done by 'load_techniques'), without
+    # loading the file again. Techniques without any detection or visibility object are not checked.
+    # { technique_id: {detection: [...], visibility: [...]} }
+    techniques = {}
+    for d in technique_content['techniques']:
+        for obj_type in ['detection', 'visibility']:
+            if obj_type in d:
+                if isinstance(d[obj_type], dict):  # There is just one detection/visibility entry
+                    techniques.setdefault(d['technique_id'], {}).setdefault(obj_type, []).append(d[obj_type])
+                elif isinstance(d[obj_type], list):  # There are multiple detection/visibility entries
+                    for obj in d[obj_type]:
+                        techniques.setdefault(d['technique_id'], {}).setdefault(obj_type, []).append(obj)
 
     all_applicable_to = set()
+    for tech_findings, tech_applicable_to in _check_health_blocks(filename, list(techniques.items()), _check_health_technique):
+        findings.extend(tech_findings)
+        all_applicable_to.update(tech_applicable_to)
 
-    techniques = load_techniques(filename)
-    for tech, v in techniques[0].items():
-        for obj_type in ['detection', 'visibility']:
-            if obj_type not in v:
-                has_error = _print_error_msg('[!] Technique ID: ' + tech + ' is MISSING a key-value pair: ' + obj_type, health_is_called)
-            else:
-                obj_applicable_to = []
-                for obj in v[obj_type]:
-                    obj_keys = ['applicable_to', 'comment', 'score_logbook']
-                    obj_keys_list = ['applicable_to']
-                    obj_keys_not_none = ['applicable_to']
-                    if obj_type == 'detection':
-                        obj_keys.append('location')
-                        obj_keys_list.append('location')
-                        obj_keys_not_none.append('location')
-
-                    for okey in obj_keys:
-                        if okey not in obj:
-                            has_error = _print_error_msg('[!] Technique ID: ' + tech +
-                                                         ' is MISSING a key-value pair in \'' + obj_type + '\': ' + okey, health_is_called)
-
-                    for okey in obj_keys_list:
-                        if okey in obj:
-                            if not isinstance(obj[okey], list):
-                                has_error = _print_error_msg('[!] Technique ID: ' + tech + ' the key-value pair \'' + okey +
-                                                             '\' in \'' + obj_type + '\' is NOT a list', health_is_called)
-
-                    for okey in obj_keys_not_none:
-                        if okey in obj and isinstance(obj[okey], list):
-                            none_count = 0
-                            for item in obj[okey]:
-                                if item is None:
-                                    none_count += 1
-                            if none_count == 1:
-                                has_error = _print_error_msg('[!] Technique ID: ' + tech + ' the key-value pair \'' + okey + '\' in \'' +
-                                                             obj_type + '\' has an EMPTY value  (an empty string is allowed: \'\')', health_is_called)
-                            elif none_count > 1:
-                                has_error = _print_error_msg('[!] Technique ID: ' + tech + ' the key-value pair \'' + okey + '\' in \'' + obj_type +
-                                                             '\' has multiple EMPTY values  (an empty string is allowed: \'\')', health_is_called)
-
-                    health = _check_health_score_object(obj, obj_type, tech, health_is_called)
-                    has_error = _update_health_state(has_error, health)
-
-                    if 'applicable_to' in obj and isinstance(obj['applicable_to'], list):
-                        all_applicable_to.update(obj['applicable_to'])
-                        obj_applicable_to.extend(obj['applicable_to'])
-
-                        if obj_type == 'visibility' and len(set(obj['applicable_to'])) > 1 and 'all' in [a.lower() for a in obj['applicable_to'] if a is not None]:
-                            has_error = _print_error_msg('[!] Technique ID: ' + tech + ' the key-value pair \'applicable_to\' in \'' + obj_type +
-                                                         '\' has \'all\' as a value that is not exclusively used (\'all\' can not be combined ' +
-                                                         'with other applicable_to values in a visibility object).', health_is_called)
-
-                if len(obj_applicable_to) > len(set(obj_applicable_to)):
-                    has_error = _print_error_msg('[!] Technique ID: ' + tech + ' the key-value pair \'applicable_to\' in \'' + obj_type +
-                                                 '\' has DUPLICATE system values (a system can only be part of one ' +
-                                                 'applicable_to key-value pair within the same technique).', health_is_called)
-
-    has_error = has_error if not _check_for_similar_values(all_applicable_to, 'applicable_to', health_is_called) else True
+    _check_for_similar_values(all_applicable_to, 'applicable_to', findings)
+
+    return findings
+
+
+def _check_health_techniques(filename, technique_content, health_is_called):
+    """
+    Check on errors in the provided technique administration YAML file.
+    :param filename: YAML file location
+    :param technique_content: content of the YAML file in a list of dicts
+    :param health_is_called: boolean that specifies if detailed errors in the file will be printed to stdout
+    :return: list of findings
+    """
+    findings = _get_health_findings_techniques(filename, technique_content)
+    _print_findings(findings, health_is_called)
+    has_error = len(findings) > 0
 
     if has_error and not health_is_called:
         print(HEALTH_ERROR_TXT + filename)
 
     _update_health_state_cache(filename, has_error)
 
+    return findings
 
-def check_health_data_sources(filename, ds_content, health_is_called, no_print=False, src_eql=False):
+
+def _check_health_data_source(ds_global_obj):
+    """
+    Check on errors in the data source details objects of one data source within the data source administration
+    YAML file.
+    :param ds_global_obj: data source object
+    :return: the findings and a list with all applicable_to values of the data source
+    """
+    findings = []
+    ds_objects_applicable_to = []
+    ds_name = ds_global_obj['data_source_name']
+    ds_path = 'data_sources[%s]' % ds_name
+
+    for key_global in ['data_source_name', 'data_source']:
+        if key_global not in ds_global_obj:
+            _add_finding(findings, 'key-missing', '[!] Data source: \'' + ds_global_obj['data_source_name'] +
+                         '\' is MISSING a key-value pair: ' + key_global, ds_name, ds_path)
+
+    if 'data_source' in ds_global_obj:
+        if not isinstance(ds_global_obj['data_source'], list):
+            ds_global_obj['data_source'] = [ds_global_obj['data_source']]
+
+        glb_obj_applicable_to = []
+        for i, ds_details_obj in enumerate(ds_global_obj['data_source']):
+            obj_path = '%s.data_source[%d]' % (ds_path, i)
+            obk_keys = ['applicable_to', 'date_registered', 'date_connected',
+                        'products', 'available_for_data_analytics', 'comment', 'data_quality']
+            obj_keys_list = ['applicable_to', 'products']
+            obj_keys_not_none = ['applicable_to', 'products']
+
+            for okey in obk_keys:
+                if okey not in ds_details_obj:
+                    _add_finding(findings, 'key-missing', '[!] Data source: \'' + ds_global_obj['data_source_name'] +
+                                 '\' is MISSING a key-value pair: ' + okey, ds_name, obj_path)
+
+            for okey in obj_keys_list:
+                if okey in ds_details_obj:
+                    if not isinstance(ds_details_obj[okey], list):
+                        _add_finding(findings, 'key-not-list', '[!] Data source: \'' + ds_global_obj['data_source_name'] + '\' the key-value pair \'' + okey +
+                                     '\' is NOT a list', ds_name, obj_path + '.' + okey)
+
+            for okey in obj_keys_not_none:
+                if okey in ds_details_obj and isinstance(ds_details_obj[okey], list):
+                    none_count = 0
+                    for item in ds_details_obj[okey]:
+                        if item is None:
+                            none_count += 1
+                    if none_count == 1:
+                        _add_finding(findings, 'value-empty', '[!] Data source: \'' + ds_global_obj['data_source_name'] + '\' the key-value pair \'' + okey +
+                                     '\' has an EMPTY value  (an empty string is allowed: \'\')', ds_name, obj_path + '.' + okey)
+                    elif none_count > 1:
+                        _add_finding(findings, 'value-empty', '[!] Data source: \'' + ds_global_obj['data_source_name'] + '\' the key-value pair \'' + okey +
+                                     '\' has an EMPTY values  (an empty string is allowed: \'\')', ds_name, obj_path + '.' + okey)
+
+            for key in ['date_registered', 'date_connected']:
+                if key in ds_details_obj and not ds_details_obj[key] is None:
+                    try:
+                        # pylint: disable=pointless-statement
+                        ds_details_obj[key].year
+                        # pylint: disable=pointless-statement
+                        ds_details_obj[key].month
+                        # pylint: disable=pointless-statement
+                        ds_details_obj[key].day
+                    except AttributeError:
+                        _add_finding(findings, 'date-invalid-format', '[!] Data source: \'' + ds_global_obj['data_source_name'] + '\' has an INVALID data format for the key-value pair \'' + key
+                                     + '\': ' + ds_details_obj[key] + '  (should be YYYY-MM-DD without quotes)', ds_name, obj_path + '.' + key)
+
+            if 'available_for_data_analytics' in ds_details_obj:
+                if not isinstance(ds_details_obj['available_for_data_analytics'], bool):
+                    _add_finding(findings, 'available-for-data-analytics-invalid', '[!] Data source: \'' + ds_global_obj['data_source_name'] +
+                                 '\' has an INVALID \'available_for_data_analytics\' value: should be set to \'true\' or \'false\'', ds_name,
+                                 obj_path + '.available_for_data_analytics')
+
+            if 'data_quality' in ds_details_obj:
+                if isinstance(ds_details_obj['data_quality'], dict):
+                    for dimension in ['device_completeness', 'data_field_completeness', 'timeliness', 'consistency', 'retention']:
+                        if dimension not in ds_details_obj['data_quality']:
+                            _add_finding(findings, 'data-quality-missing', '[!] Data source: \'' + ds_global_obj['data_source_name'] +
+                                         '\' is MISSING a key-value pair in \'data_quality\': ' + dimension, ds_name, obj_path + '.data_quality')
+                        else:
+                            if isinstance(ds_details_obj['data_quality'][dimension], int):
+                                if not 0 <= ds_details_obj['data_quality'][dimension] <= 5:
+                                    _add_finding(findings, 'data-quality-out-of-range', '[!] Data source: \'' + ds_global_obj['data_source_name'] + '\' has an INVALID data quality score for the dimension \''
+                                                 + dimension + '\': ' + str(ds_details_obj['data_quality'][dimension]) + '  (should be between 0 and 5)', ds_name,
+                                                 obj_path + '.data_quality.' + dimension)
+                            else:
+                                _add_finding(findings, 'data-quality-invalid-format', '[!] Data source: \'' + ds_global_obj['data_source_name'] + '\' has an INVALID data quality score for the dimension \'' +
+                                             dimension + '\': ' + str(ds_details_obj['data_quality'][dimension]) + '  (should be an an integer)', ds_name,
+                                             obj_path + '.data_quality.' + dimension)
+                else:
+                    _add_finding(findings, 'data-quality-not-dict', '[!] Data source: \'' + ds_global_obj['data_source_name'] +
+                                 '\' the key-value pair \'data_quality\' is NOT a dictionary with data quality dimension scores', ds_name,
+                                 obj_path + '.data_quality')
+
+            if 'applicable_to' in ds_details_obj and isinstance(ds_details_obj['applicable_to'], list):
+                ds_objects_applicable_to.extend(ds_details_obj['applicable_to'])
+                glb_obj_applicable_to.extend(ds_details_obj['applicable_to'])
+
+                if len(ds_details_obj['applicable_to']) > 1 and 'all' in [a.lower() for a in ds_details_obj['applicable_to'] if a is not None]:
+                    _add_finding(findings, 'applicable-to-all-combined', '[!] Data source: \'' + ds_global_obj['data_source_name'] + '\' has \'all\' as system value ' +
+                                 'within the key-value pair \'applicable_to\', plus additional systems (the build-in system \'all\' ' +
+                                 'cannot be combined with other systems).', ds_name, obj_path + '.applicable_to')
+
+        if len(glb_obj_applicable_to) > len(set(glb_obj_applicable_to)):
+            _add_finding(findings, 'applicable-to-duplicate', '[!] Data source: \'' + ds_global_obj['data_source_name'] + '\' has DUPLICATE system values ' +
+                         'within the key-value pair \'applicable_to\' (a system can only be part of one ' +
+                         'applicable_to key-value pair within the same data source).', ds_name, ds_path + '.data_source')
+
+    return findings, ds_objects_applicable_to
+
+
+def _get_health_findings_data_sources(filename, ds_content, src_eql=False):
     """
     Check on errors in the provided data sources administration YAML file.
     :param filename: YAML file location
     :param ds_content: content of the YAML file in a list of dicts
-    :param health_is_called: boolean that specifies if detailed errors in the file will be printed to stdout
-    :param no_print: specifies if the non-detailed error message is printed to stdout or not
     :param src_eql: if True, skip certain checks that can fail because EQL filtered out some data source and the
     ATT&CK Platform is not part of the EQL search result
-    :return: False if no errors have been found, otherwise True
+    :return: list of findings
     """
-    has_error = False
+    findings = []
 
     # Check domain attribute (is optional):
     domain = 'enterprise-attack'
     if 'domain' in ds_content:
         if not ds_content['domain'].lower() in DETTECT_DOMAIN_SUPPORT:
-            has_error = _print_error_msg('[!] INVALID domain value in data source administration file: %s. Should be one of: %s' %
-                                         (ds_content['domain'], ', '.join(DETTECT_DOMAIN_SUPPORT)), health_is_called)
+            _add_finding(findings, 'domain-invalid', '[!] INVALID domain value in data source administration file: %s. Should be one of: %s' %
+                         (ds_content['domain'], ', '.join(DETTECT_DOMAIN_SUPPORT)), path='domain')
         else:
             domain = ds_content['domain']
 
@@ -327,134 +533,68 @@ def check_health_data_sources(filename, ds_content, health_is_called, no_print=F
                     platform = ['empty']
                 for p in platform:
                     if p.lower() not in supported_platforms.keys() and p.lower() != 'all':
-                        has_error = _print_error_msg(
-                            '[!] EMPTY or INVALID value for \'platform\' within the data source administration file\'s \'systems\' key-value pair: '
-                            '%s (should be value(s) of: [%s] or all)' % (p, ', '.join(list(supported_platforms.values()))),
-                            health_is_called)
+                        _add_finding(findings, 'systems-platform-invalid',
+                                     '[!] EMPTY or INVALID value for \'platform\' within the data source administration file\'s \'systems\' key-value pair: '
+                                     '%s (should be value(s) of: [%s] or all)' % (p, ', '.join(list(supported_platforms.values()))),
+                                     path='systems')
 
                 # check applicable_to value
                 applicable_to = system['applicable_to']
                 if applicable_to is None or applicable_to == '' or applicable_to.lower() == 'all':
-                    has_error = _print_error_msg(
-                            '[!] EMPTY or INVALID value for \'applicable_to\' within the data source administration file\'s \'systems\' key-value pair: '
-                            '%s (should be any string value except an empty string and \'all\')' % applicable_to,
-                            health_is_called)
+                    _add_finding(findings, 'systems-applicable-to-invalid',
+                                 '[!] EMPTY or INVALID value for \'applicable_to\' within the data source administration file\'s \'systems\' key-value pair: '
+                                 '%s (should be any string value except an empty string and \'all\')' % applicable_to,
+                                 path='systems')
                 elif applicable_to.lower() not in systems_applicable_to:
                     systems_applicable_to.add(applicable_to.lower())
                 else:
-                    has_error = _print_error_msg(
-                            '[!] DUPLICATE \'applicable_to\' value within the data source administration file\'s \'systems\' key-value pair: '
-                            '%s' % applicable_to, health_is_called)
+                    _add_finding(findings, 'systems-applicable-to-duplicate',
+                                 '[!] DUPLICATE \'applicable_to\' value within the data source administration file\'s \'systems\' key-value pair: '
+                                 '%s' % applicable_to, path='systems')
         else:
-            has_error = _print_error_msg('[!] The data source administration file is MISSING the key-value pair \'systems\'',
-                                         health_is_called)
+            _add_finding(findings, 'systems-missing', '[!] The data source administration file is MISSING the key-value pair \'systems\'',
+                         path='systems')
 
     ds_objects_applicable_to = set()
+    for ds_findings, ds_applicable_to in _check_health_blocks(filename, [(ds_global_obj, ) for ds_global_obj in ds_content['data_sources']],
+                                                              _check_health_data_source):
+        findings.extend(ds_findings)
+        ds_objects_applicable_to.update(ds_applicable_to)
 
-    for ds_global_obj in ds_content['data_sources']:
-        for key_global in ['data_source_name', 'data_source']:
-            if key_global not in ds_global_obj:
-                has_error = _print_error_msg('[!] Data source: \'' + ds_global_obj['data_source_name'] +
-                                             '\' is MISSING a key-value pair: ' + key_global, health_is_called)
-
-        if 'data_source' in ds_global_obj:
-            if not isinstance(ds_global_obj['data_source'], list):
-                ds_global_obj['data_source'] = [ds_global_obj['data_source']]
-
-            glb_obj_applicable_to = []
-            for ds_details_obj in ds_global_obj['data_source']:
-                obk_keys = ['applicable_to', 'date_registered', 'date_connected',
-                            'products', 'available_for_data_analytics', 'comment', 'data_quality']
-                obj_keys_list = ['applicable_to', 'products']
-                obj_keys_not_none = ['applicable_to', 'products']
-
-                for okey in obk_keys:
-                    if okey not in ds_details_obj:
-                        has_error = _print_error_msg('[!] Data source: \'' + ds_global_obj['data_source_name'] +
-                                                     '\' is MISSING a key-value pair: ' + okey, health_is_called)
-
-                for okey in obj_keys_list:
-                    if okey in ds_details_obj:
-                        if not isinstance(ds_details_obj[okey], list):
-                            has_error = _print_error_msg('[!] Data source: \'' + ds_global_obj['data_source_name'] + '\' the key-value pair \'' + okey +
-                                                         '\' is NOT a list', health_is_called)
-
-                for okey in obj_keys_not_none:
-                    if okey in ds_details_obj and isinstance(ds_details_obj[okey], list):
-                        none_count = 0
-                        for item in ds_details_obj[okey]:
-                            if item is None:
-                                none_count += 1
-                        if none_count == 1:
-                            has_error = _print_error_msg('[!] Data source: \'' + ds_global_obj['data_source_name'] + '\' the key-value pair \'' + okey +
-                                                         '\' has an EMPTY value  (an empty string is allowed: \'\')', health_is_called)
-                        elif none_count > 1:
-                            has_error = _print_error_msg('[!] Data source: \'' + ds_global_obj['data_source_name'] + '\' the key-value pair \'' + okey +
-                                                         '\' has an EMPTY values  (an empty string is allowed: \'\')', health_is_called)
-
-                for key in ['date_registered', 'date_connected']:
-                    if key in ds_details_obj and not ds_details_obj[key] is None:
-                        try:
-                            # pylint: disable=pointless-statement
-                            ds_details_obj[key].year
-                            # pylint: disable=pointless-statement
-                            ds_details_obj[key].month
-                            # pylint: disable=pointless-statement
-                            ds_details_obj[key].day
-                        except AttributeError:
-                            has_error = _print_error_msg('[!] Data source: \'' + ds_global_obj['data_source_name'] + '\' has an INVALID data format for the key-value pair \'' + key
-                                                         + '\': ' + ds_details_obj[key] + '  (should be YYYY-MM-DD without quotes)', health_is_called)
-
-                if 'available_for_data_analytics' in ds_details_obj:
-                    if not isinstance(ds_details_obj['available_for_data_analytics'], bool):
-                        has_error = _print_error_msg('[!] Data source: \'' + ds_global_obj['data_source_name'] +
-                                                     '\' has an INVALID \'available_for_data_analytics\' value: should be set to \'true\' or \'false\'', health_is_called)
-
-                if 'data_quality' in ds_details_obj:
-                    if isinstance(ds_details_obj['data_quality'], dict):
-                        for dimension in ['device_completeness', 'data_field_completeness', 'timeliness', 'consistency', 'retention']:
-                            if dimension not in ds_details_obj['data_quality']:
-                                has_error = _print_error_msg('[!] Data source: \'' + ds_global_obj['data_source_name'] +
-                                                             '\' is MISSING a key-value pair in \'data_quality\': ' + dimension, health_is_called)
-                            else:
-                                if isinstance(ds_details_obj['data_quality'][dimension], int):
-                                    if not 0 <= ds_details_obj['data_quality'][dimension] <= 5:
-                                        has_error = _print_error_msg('[!] Data source: \'' + ds_global_obj['data_source_name'] + '\' has an INVALID data quality score for the dimension \''
-                                                                     + dimension + '\': ' + str(ds_details_obj['data_quality'][dimension]) + '  (should be between 0 and 5)', health_is_called)
-                                else:
-                                    has_error = _print_error_msg('[!] Data source: \'' + ds_global_obj['data_source_name'] + '\' has an INVALID data quality score for the dimension \'' +
-                                                                 dimension + '\': ' + str(ds_details_obj['data_quality'][dimension]) + '  (should be an an integer)', health_is_called)
-                    else:
-                        has_error = _print_error_msg('[!] Data source: \'' + ds_global_obj['data_source_name'] +
-                                                     '\' the key-value pair \'data_quality\' is NOT a dictionary with data quality dimension scores', health_is_called)
-
-                if 'applicable_to' in ds_details_obj and isinstance(ds_details_obj['applicable_to'], list):
-                    ds_objects_applicable_to.update(ds_details_obj['applicable_to'])
-                    glb_obj_applicable_to.extend(ds_details_obj['applicable_to'])
-
-                    if len(ds_details_obj['applicable_to']) > 1 and 'all' in [a.lower() for a in ds_details_obj['applicable_to'] if a is not None]:
-                        has_error = _print_error_msg('[!] Data source: \'' + ds_global_obj['data_source_name'] + '\' has \'all\' as system value ' +
-                                                     'within the key-value pair \'applicable_to\', plus additional systems (the build-in system \'all\' ' +
-                                                     'cannot be combined with other systems).', health_is_called)
-
-            if len(glb_obj_applicable_to) > len(set(glb_obj_applicable_to)):
-                has_error = _print_error_msg('[!] Data source: \'' + ds_global_obj['data_source_name'] + '\' has DUPLICATE system values ' +
-                                             'within the key-value pair \'applicable_to\' (a system can only be part of one ' +
-                                             'applicable_to key-value pair within the same data source).', health_is_called)
     if not src_eql:
         for ds_a in ds_objects_applicable_to:
             if ds_a.lower() not in systems_applicable_to and ds_a.lower() != 'all':
-                has_error = _print_error_msg('[!] The \'applicable_to\' value: \'%s\' within the data source administration file is used '
-                                             'by a data source details object without being specified within the \'systems\' '
-                                             'key-value pair' % ds_a, health_is_called)
+                _add_finding(findings, 'applicable-to-not-in-systems',
+                             '[!] The \'applicable_to\' value: \'%s\' within the data source administration file is used '
+                             'by a data source details object without being specified within the \'systems\' '
+                             'key-value pair' % ds_a, path='data_sources')
 
     if 'exceptions' in ds_content:
         for tech in ds_content['exceptions']:
             tech_id = str(tech['technique_id'])
 
-        if not REGEX_YAML_TECHNIQUE_ID_FORMAT.match(tech_id) and tech_id != 'None':
-            has_error = _print_error_msg(
-                '[!] INVALID technique ID in the \'exceptions\' list of data source administration file: ' + tech_id, health_is_called)
+            if not REGEX_YAML_TECHNIQUE_ID_FORMAT.match(tech_id) and tech_id != 'None':
+                _add_finding(findings, 'exception-technique-id-invalid',
+                             '[!] INVALID technique ID in the \'exceptions\' list of data source administration file: ' + tech_id, tech_id,
+                             'exceptions')
+
+    return findings
+
+
+def check_health_data_sources(filename, ds_content, health_is_called, no_print=False, src_eql=False):
+    """
+    Check on errors in the provided data sources administration YAML file.
+    :param filename: YAML file location
+    :param ds_content: content of the YAML file in a list of dicts
+    :param health_is_called: boolean that specifies if detailed errors in the file will be printed to stdout
+    :param no_print: specifies if the non-detailed error message is printed to stdout or not
+    :param src_eql: if True, skip certain checks that can fail because EQL filtered out some data source and the
+    ATT&CK Platform is not part of the EQL search result
+    :return: False if no errors have been found, otherwise True
+    """
+    findings = _get_health_findings_data_sources(filename, ds_content, src_eql)
+    _print_findings(findings, health_is_called)
+    has_error = len(findings) > 0
 
     if has_error and not health_is_called and not no_print:
         print(HEALTH_ERROR_TXT + filename)
@@ -464,47 +604,104 @@ def check_health_data_sources(filename, ds_content, health_is_called, no_print=F
     return has_error
 
 
-def _check_health_group(filename, group_content, health_is_called):
+def _get_health_findings_group(group_content):
     """
     Check on errors in the provided group administration YAML file.
-    :param filename: YAML file location
     :param group_content: content of the YAML file in a list of dicts
-    :param health_is_called: boolean that specifies if detailed errors in the file will be printed to stdout
-    :return:
+    :return: list of findings
     """
-    has_error = False
+    findings = []
 
     # Check domain attribute (is optional):
-    domain = 'enterprise-attack'
     if 'domain' in group_content:
         if not group_content['domain'].lower() in DETTECT_DOMAIN_SUPPORT:
-            has_error = _print_error_msg('[!] INVALID domain value in group administration file: %s. Must be one of: %s' %
-                                         (group_content['domain'], ', '.join(DETTECT_DOMAIN_SUPPORT)), health_is_called)
-        else:
-            domain = group_content['domain']
+            _add_finding(findings, 'domain-invalid', '[!] INVALID domain value in group administration file: %s. Must be one of: %s' %
+                         (group_content['domain'], ', '.join(DETTECT_DOMAIN_SUPPORT)), path='domain')
+
+    return findings
+
+
+def _check_health_group(filename, group_content, health_is_called):
+    """
+    Check on errors in the provided group administration YAML file.
+    :param filename: YAML file location
+    :param group_content: content of the YAML file in a list of dicts
+    :param health_is_called: boolean that specifies if detailed errors in the file will be printed to stdout
+    :return: list of findings
+    """
+    findings = _get_health_findings_group(group_content)
+    _print_findings(findings, health_is_called)
+    has_error = len(findings) > 0
 
     if has_error and not health_is_called:
         print(HEALTH_ERROR_TXT + filename)
 
     _update_health_state_cache(filename, has_error)
 
+    return findings
+
+
+def get_health_findings(filename, file_type):
+    """
+    Get the findings of all health checks on the provided YAML file, without printing them.
+    :param filename: YAML file location
+    :param file_type: currently FILE_TYPE_TECHNIQUE_ADMINISTRATION, FILE_TYPE_DATA_SOURCE_ADMINISTRATION and
+    FILE_TYPE_GROUP_ADMINISTRATION are supported
+    :return: list of findings: dicts with the keys rule, item, path, message and (optionally) details
+    """
+    from generic import init_yaml
+
+    _yaml = init_yaml()
+    with open(filename, 'r') as yaml_file:
+        yaml_content = _yaml.load(yaml_file)
 
-def check_yaml_file_health(filename, file_type, health_is_called):
+    if file_type == FILE_TYPE_DATA_SOURCE_ADMINISTRATION:
+        return _get_health_findings_data_sources(filename, yaml_content)
+    elif file_type == FILE_TYPE_TECHNIQUE_ADMINISTRATION:
+        return _get_health_findings_techniques(filename, yaml_content)
+    elif file_type == FILE_TYPE_GROUP_ADMINISTRATION:
+        return _get_health_findings_group(yaml_content)
+    return []
+
+
+def export_health_findings(filename, file_type, output_filename=None):
+    """
+    Write the findings of all health checks on the provided YAML file to a JSON file.
+    :param filename: YAML file location
+    :param file_type: the file type of the YAML file as present in the key 'file_type'
+    :param output_filename: output filename defined by the user
+    :return:
+    """
+    import simplejson
+    from file_output import write_file, create_output_filename
+
+    findings = get_health_findings(filename, file_type)
+    report = {'file': filename, 'file_type': file_type, 'has_error': len(findings) > 0, 'findings': findings}
+
+    if not output_filename:
+        output_filename = create_output_filename('health', os.path.splitext(os.path.basename(filename))[0])
+    write_file(output_filename, simplejson.dumps(report, indent=2))
+
+
+@phase(PHASE_HEALTH)
+def check_yaml_file_health(filename, file_type, health_is_called, file_state=None):
     """
     Check on errors in the provided YAML file.
     :param filename: YAML file location
     :param file_type: currently FILE_TYPE_TECHNIQUE_ADMINISTRATION and FILE_TYPE_DATA_SOURCE_ADMINISTRATION is supported
     :param health_is_called: boolean that specifies if detailed errors in the file will be printed to stdout
+    :param file_state: the state of the file as retrieved from the state store (retrieved when not provided)
     :return:
     """
-    from generic import init_yaml
+    from generic import load_yaml_file
 
     # first we check if the file was modified. Otherwise, the health check is skipped for performance reasons
-    if _is_file_modified(filename) or health_is_called:
+    if file_state is None:
+        file_state = get_file_state(filename)
 
-        _yaml = init_yaml()
-        with open(filename, 'r') as yaml_file:
-            yaml_content = _yaml.load(yaml_file)
+    if 'has_error' not in file_state or health_is_called:
+
+        yaml_content = load_yaml_file(filename)
 
         if file_type == FILE_TYPE_DATA_SOURCE_ADMINISTRATION:
             check_health_data_sources(filename, yaml_content, health_is_called)
@@ -513,5 +710,212 @@ def check_yaml_file_health(filename, file_type, health_is_called):
         elif file_type == FILE_TYPE_GROUP_ADMINISTRATION:
             _check_health_group(filename, yaml_content, health_is_called)
 
-    elif _get_health_state_cache(filename):
+    elif file_state['has_error']:
         print(HEALTH_ERROR_TXT + filename)
+
+
+def _get_health_files(paths):
+    """
+    Get the YAML files to check from the provided files, directories (searched recursively) and glob patterns.
+    :param paths: list of files, directories and/or glob patterns
+    :return: list of files
+    """
+    import glob
+
+    filenames = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in sorted(os.walk(path)):
+                filenames.extend([os.path.join(root, f) for f in sorted(files) if f.endswith(('.yaml', '.yml'))])
+        elif os.path.isfile(path):
+            filenames.append(path)
+        else:
+            matches = sorted(glob.glob(path, recursive=True))
+            if not matches:
+                print('[!] File, directory or pattern does not match any file: ' + path)
+            filenames.extend([f for f in matches if os.path.isfile(f)])
+
+    return list(dict.fromkeys(filenames))
+
+
+def _get_file_health_report(filename):
+    """
+    Check the health of one YAML file and collect the data needed for the checks across files. This function is
+    executed within the worker processes of 'check_health_files'. The report is stored in the state store and reused
+    when the file did not change.
+    :param filename: YAML file location
+    :return: dictionary with the file, file_type, domain, findings and the data for the checks across files
+    """
+    from generic import init_yaml
+
+    file_state = get_file_state(filename)
+    if 'health_report' in file_state:
+        return file_state['health_report']
+
+    report = {'file': filename, 'file_type': None, 'domain': None, 'findings': [], 'systems': [], 'applicable_to': {}}
+    try:
+        _yaml = init_yaml()
+        with open(filename, 'r') as yaml_file:
+            yaml_content = _yaml.load(yaml_file)
+    except Exception as e:
+        _add_finding(report['findings'], 'file-invalid', '[!] File: \'' + filename + '\' is not a valid YAML file: ' + str(e).replace('\n', ' '))
+        return report
+
+    if not hasattr(yaml_content, 'keys') or 'file_type' not in yaml_content.keys():
+        _add_finding(report['findings'], 'file-invalid', '[!] File: \'' + filename + '\' does not contain a file_type key.')
+        return report
+
+    report['file_type'] = yaml_content['file_type']
+    report['domain'] = yaml_content.get('domain', 'enterprise-attack')
+
+    try:
+        if report['file_type'] == FILE_TYPE_DATA_SOURCE_ADMINISTRATION:
+            version = yaml_content.get('version', 0)
+            if not isinstance(version, (int, float)) or version < FILE_TYPE_DATA_SOURCE_ADMINISTRATION_VERSION:
+                _add_finding(report['findings'], 'file-version-outdated', '[!] File: \'' + filename + '\' has an old version of the data source '
+                             'administration file (%s). Upgrade the file to version %s by running DeTT&CT with this file.' %
+                             (version, FILE_TYPE_DATA_SOURCE_ADMINISTRATION_VERSION), path='version')
+            else:
+                report['findings'] = _get_health_findings_data_sources(filename, yaml_content)
+                report['systems'] = [s['applicable_to'].lower() for s in yaml_content.get('systems', [])
+                                     if isinstance(s, dict) and isinstance(s.get('applicable_to', None), str)]
+
+        elif report['file_type'] == FILE_TYPE_TECHNIQUE_ADMINISTRATION:
+            report['findings'] = _get_health_findings_techniques(filename, yaml_content)
+
+            # applicable_to: {app_to: ..., tech_id: [...]} - we have app_to in here to preserve the casing when printing
+            techniques = yaml_content.get('techniques', None)
+            for tech in techniques if isinstance(techniques, list) else []:
+                if not isinstance(tech, dict) or not isinstance(tech.get('technique_id', None), str):
+                    continue
+                visibility = tech.get('visibility', [])
+                for vis in [visibility] if isinstance(visibility, dict) else visibility if isinstance(visibility, list) else []:
+                    if isinstance(vis, dict) and isinstance(vis.get('applicable_to', None), list):
+                        for a in vis['applicable_to']:
+                            if isinstance(a, str) and a.lower() != 'all':
+                                app_tech = report['applicable_to'].setdefault(a.lower(), {'app_to': a, 'tech_id': []})
+                                if tech['technique_id'] not in app_tech['tech_id']:
+                                    app_tech['tech_id'].append(tech['technique_id'])
+
+        elif report['file_type'] == FILE_TYPE_GROUP_ADMINISTRATION:
+            report['findings'] = _get_health_findings_group(yaml_content)
+
+        else:
+            report['file_type'] = None  # not a DeTT&CT administration file: nothing to check
+    except Exception as e:
+        # the health checks assume a minimal structure of the file, which is not there
+        _add_finding(report['findings'], 'health-check-failed', '[!] File: \'' + filename + '\' could not be checked '
+                     'for errors, the structure of the file is invalid: ' + type(e).__name__ + ': ' + str(e))
+
+    if report['file_type'] is None and not report['findings']:
+        return report
+
+    update_file_state(filename, has_error=len(report['findings']) > 0, health_report=report)
+    return report
+
+
+def _check_health_across_files(reports):
+    """
+    Check the 'applicable_to' values within the visibility objects of technique administration files against the
+    'systems' of the data source administration files within the same directory and of the same domain.
+    :param reports: list with the health report per file
+    :return:
+    """
+    # { (directory, domain): {'systems': set(applicable_to, ...), 'files': [...]} }
+    data_source_systems = {}
+    for report in reports:
+        if report['file_type'] == FILE_TYPE_DATA_SOURCE_ADMINISTRATION:
+            ds = data_source_systems.setdefault((os.path.dirname(os.path.abspath(report['file'])), report['domain']),
+                                                {'systems': set(), 'files': []})
+            ds['systems'].update(report['systems'])
+            ds['files'].append(os.path.basename(report['file']))
+
+    for report in reports:
+        if report['file_type'] == FILE_TYPE_TECHNIQUE_ADMINISTRATION:
+            ds = data_source_systems.get((os.path.dirname(os.path.abspath(report['file'])), report['domain']), None)
+            if ds is None:
+                continue
+            for app_to_low, v in report['applicable_to'].items():
+                if app_to_low not in ds['systems']:
+                    _add_finding(report['findings'], 'applicable-to-not-in-systems',
+                                 '[!] The \'applicable_to\' value: \'%s\' within the visibility objects of the technique(s) %s is not '
+                                 'specified within the \'systems\' key-value pair of the data source administration file(s): %s' %
+                                 (v['app_to'], ', '.join(v['tech_id']), ', '.join(ds['files'])), v['app_to'], 'techniques')
+
+
+def _get_junit_report(reports):
+    """
+    Create a JUnit XML report with a test case per file. Files with findings are reported as a failure.
+    :param reports: list with the health report per file
+    :return: XML string
+    """
+    import xml.etree.ElementTree as ET
+
+    failures = len([r for r in reports if r['findings']])
+    testsuites = ET.Element('testsuites')
+    suite = ET.SubElement(testsuites, 'testsuite', name='dettect-health', tests=str(len(reports)),
+                          failures=str(failures), errors='0')
+    for report in reports:
+        testcase = ET.SubElement(suite, 'testcase', classname=report['file_type'] or 'unknown', name=report['file'])
+        if report['findings']:
+            failure = ET.SubElement(testcase, 'failure', message='%d possible error(s)' % len(report['findings']),
+                                    type='health')
+            lines = []
+            for finding in report['findings']:
+                lines.append('%s: %s' % (finding['rule'], finding['message']))
+                lines.extend(['    - ' + d for d in finding.get('details', [])])
+            failure.text = '\n'.join(lines)
+
+    return ET.tostring(testsuites, encoding='unicode')
+
+
+def check_health_files(paths, processes=None, output_filename=None, json_report=False, junit_report=False):
+    """
+    Check the health of all technique, data source and group administration YAML files within the provided files,
+    directories and/or glob patterns. The files are checked in parallel using a process pool. Besides the checks per
+    file, the 'applicable_to' values of technique administration files are checked against the 'systems' of the data
+    source administration files within the same directory.
+    :param paths: list of files, directories and/or glob patterns
+    :param processes: the number of worker processes (default is the number of CPU cores)
+    :param output_filename: output filename defined by the user for the JSON and/or JUnit report
+    :param json_report: write the findings to a JSON report
+    :param junit_report: write the findings to a JUnit XML report
+    :return: True if no errors have been found, otherwise False
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    from file_output import write_file, create_output_filename
+
+    filenames = _get_health_files(paths)
+    if not filenames:
+        print('[!] No YAML files found to check.')
+        return False
+
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        reports = [r for r in executor.map(_get_file_health_report, filenames) if r['file_type'] or r['findings']]
+
+    _check_health_across_files(reports)
+    for report in reports:
+        report['has_error'] = len(report['findings']) > 0
+
+    for report in reports:
+        if report['findings']:
+            print('[!] ' + report['file'] + ' (' + (report['file_type'] or 'unknown file type') + '):')
+            for finding in report['findings']:
+                print('    ' + finding['message'])
+                for value in finding.get('details', []):
+                    print('        - ' + value)
+            print('')
+
+    error_count = len([r for r in reports if r['findings']])
+    print('Checked %d file(s): %d with possible errors.' % (len(reports), error_count))
+
+    if not output_filename:
+        output_filename = create_output_filename('health', 'report')
+    if json_report:
+        import simplejson
+        write_file(output_filename, simplejson.dumps({'files': [{k: r[k] for k in ['file', 'file_type', 'has_error', 'findings']}
+                                                                for r in reports]}, indent=2))
+    if junit_report:
+        write_file(output_filename, _get_junit_report(reports), extension='xml')
+
+    return error_count == 0
@@ -0,0 +1,116 @@
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# record the wall time, call count and peak memory per phase (enabled with the '--timings' argument)
+_timings_enabled = False
+
+# functions that are called at the end of every phase (see 'register_hook')
+_hooks = []
+
+# per phase a dictionary with the number of calls, total and self wall time and the peak memory
+_phase_stats = {}
+
+# the phases that are running, as lists [name, start time, wall time of nested phases, peak memory]
+_phase_stack = []
+
+
+def enable_timings():
+    """
+    Enable the recording of the wall time, call count and peak memory per phase. The peak memory is traced with
+    tracemalloc, which slows down the run.
+    :return:
+    """
+    global _timings_enabled
+    _timings_enabled = True
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def register_hook(hook):
+    """
+    Register a function that is called at the end of every phase, also when the timings are not enabled.
+    :param hook: function called with the arguments: name of the phase, wall time in seconds and the peak memory in
+    bytes (None when the timings are not enabled)
+    :return:
+    """
+    _hooks.append(hook)
+
+
+def unregister_hook(hook):
+    """
+    Remove a function registered with 'register_hook'.
+    :param hook: the registered function
+    :return:
+    """
+    _hooks.remove(hook)
+
+
+@contextmanager
+def phase(name):
+    """
+    Measure a phase of the pipeline (see the PHASE_* constants). Can be used as context manager and as decorator.
+    Nested phases are included in the total time of the outer phase, but not in its self time.
+    :param name: name of the phase
+    :return:
+    """
+    if not _timings_enabled and not _hooks:
+        yield
+        return
+
+    if _timings_enabled:
+        if _phase_stack:
+            _phase_stack[-1][3] = max(_phase_stack[-1][3], tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+
+    current = [name, time.perf_counter(), 0.0, 0]
+    _phase_stack.append(current)
+    try:
+        yield
+    finally:
+        _phase_stack.pop()
+        wall_time = time.perf_counter() - current[1]
+        peak_memory = None
+        if _timings_enabled:
+            peak_memory = max(current[3], tracemalloc.get_traced_memory()[1])
+            stats = _phase_stats.setdefault(name, {'calls': 0, 'total_time': 0.0, 'self_time': 0.0, 'peak_memory': 0})
+            stats['calls'] += 1
+            # a phase calling itself (e.g. loading ATT&CK data that depends on other ATT&CK data) is counted once
+            if not any(p[0] == name for p in _phase_stack):
+                stats['total_time'] += wall_time
+            stats['self_time'] += wall_time - current[2]
+            stats['peak_memory'] = max(stats['peak_memory'], peak_memory)
+        if _phase_stack:
+            _phase_stack[-1][2] += wall_time
+            _phase_stack[-1][3] = max(_phase_stack[-1][3], peak_memory or 0)
+
+        for hook in _hooks:
+            hook(name, wall_time, peak_memory)
+
+
+def get_timings():
+    """
+    Get the recorded timings.
+    :return: dictionary with per phase the number of calls, total and self wall time in seconds and the peak memory
+    in bytes
+    """
+    return {name: dict(stats) for name, stats in _phase_stats.items()}
+
+
+def print_timings(total_time):
+    """
+    Print the recorded timings as a table, sorted on the self time. Phases executed within worker processes are not
+    included.
+    :param total_time: wall time of the complete run in seconds
+    :return:
+    """
+    print('\n{:<24}{:>8}{:>12}{:>12}{:>16}'.format('Phase', 'Calls', 'Total (s)', 'Self (s)', 'Peak mem (MB)'))
+    print('-' * 72)
+    for name, stats in sorted(_phase_stats.items(), key=lambda s: s[1]['self_time'], reverse=True):
+        print('{:<24}{:>8}{:>12.3f}{:>12.3f}{:>16.1f}'.format(name, stats['calls'], stats['total_time'],
+                                                             stats['self_time'], stats['peak_memory'] / 1024 ** 2))
+    other_time = total_time - sum(s['self_time'] for s in _phase_stats.values())
+    peak_memory = max([s['peak_memory'] for s in _phase_stats.values()] + [tracemalloc.get_traced_memory()[1]])
+    print('{:<24}{:>8}{:>12.3f}{:>12.3f}{:>16}'.format('(other)', '', other_time, other_time, ''))
+    print('-' * 72)
+    print('{:<24}{:>8}{:>12.3f}{:>12}{:>16.1f}'.format('total', '', total_time, '', peak_memory / 1024 ** 2))
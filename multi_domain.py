@@ -0,0 +1,139 @@
+import simplejson
+import file_output
+from generic import *
+from file_output import write_file, create_output_filename
+from data_source_mapping import generate_data_sources_layer
+from technique_mapping import generate_visibility_layer, generate_detection_layer
+
+# per mode the file type of the administration files and the regex to find these files within a directory
+MULTI_DOMAIN_MODES = {'datasource': (FILE_TYPE_DATA_SOURCE_ADMINISTRATION, REGEX_YAML_FILE_TYPE_DATA_SOURCE),
+                      'visibility': (FILE_TYPE_TECHNIQUE_ADMINISTRATION, REGEX_YAML_FILE_TYPE_TECHNIQUE),
+                      'detection': (FILE_TYPE_TECHNIQUE_ADMINISTRATION, REGEX_YAML_FILE_TYPE_TECHNIQUE)}
+
+DOMAIN_DATA_TYPES = {'enterprise-attack': DATA_TYPE_STIX_ALL_TECH_ENTERPRISE, 'ics-attack': DATA_TYPE_STIX_ALL_TECH_ICS,
+                     'mobile-attack': DATA_TYPE_STIX_ALL_TECH_MOBILE}
+
+
+def _get_administration_files(paths, regex_file_type):
+    """
+    Get the administration YAML files from the provided files and/or directories. Within a directory, only YAML files
+    with the file_type matching the provided regex are selected.
+    :param paths: list of files and/or directories
+    :param regex_file_type: regex matching the file_type of the administration files
+    :return: list of files
+    """
+    filenames = []
+    for path in paths:
+        if os.path.isdir(path):
+            for f in sorted(os.listdir(path)):
+                f = os.path.join(path, f)
+                if f.endswith(('.yaml', '.yml')) and os.path.isfile(f):
+                    # only look for the file_type, instead of loading the complete YAML file
+                    with open(f, 'r') as yaml_file:
+                        if regex_file_type.search(yaml_file.read()):
+                            filenames.append(f)
+        else:
+            filenames.append(path)
+    return list(dict.fromkeys(filenames))
+
+
+def _get_covered_techniques(layer_file):
+    """
+    Get the techniques that are covered within a layer: the techniques with a score above 0 (visibility and detection
+    layers) or with a color (data source layers).
+    :param layer_file: filename of the Navigator layer
+    :return: set of technique IDs
+    """
+    with open(layer_file, 'r') as f:
+        layer = simplejson.load(f)
+    return set(t['techniqueID'] for t in layer['techniques']
+               if ((t.get('score') or 0) > 0 if 'score' in t else t.get('color')))
+
+
+def _generate_domain_layers(domain, filenames, mode, layer_settings):
+    """
+    Generate the layers for all administration files of one ATT&CK domain. This function is executed within the
+    worker processes of 'generate_multi_domain_layers'.
+    :param domain: the ATT&CK domain of the files
+    :param filenames: the administration YAML files
+    :param mode: datasource, visibility or detection
+    :param layer_settings: settings for the Navigator layer
+    :return: list with per file a dictionary with the file, the layer files, the covered techniques and their count
+    """
+    technique_count = len(load_attack_data(DOMAIN_DATA_TYPES[domain]))
+
+    summary = []
+    for filename in filenames:
+        file_output.written_files = []
+        if mode == 'datasource':
+            generate_data_sources_layer(filename, None, None, layer_settings)
+        elif mode == 'visibility':
+            generate_visibility_layer(filename, False, None, None, layer_settings)
+        else:
+            generate_detection_layer(filename, False, None, None, layer_settings)
+
+        covered = set()
+        for layer_file in file_output.written_files:
+            covered.update(_get_covered_techniques(layer_file))
+        summary.append({'file': filename, 'layers': file_output.written_files, 'covered': sorted(covered),
+                        'covered_techniques': len(covered), 'techniques': technique_count,
+                        'coverage': round(len(covered) / technique_count * 100, 1) if technique_count else 0})
+    return summary
+
+
+def generate_multi_domain_layers(paths, mode, health_is_called, output_filename, layer_settings):
+    """
+    Generate the data source, visibility or detection layers for administration files of multiple ATT&CK domains
+    (Enterprise, ICS and Mobile). The domains are processed concurrently, in one worker process per domain, which
+    share the ATT&CK data loaded by this process. Besides the layers per file, a combined summary with the coverage per
+    file and domain is written.
+    :param paths: list of administration YAML files and/or directories containing these files
+    :param mode: datasource, visibility or detection
+    :param health_is_called: boolean that specifies if detailed errors in the file will be printed
+    :param output_filename: output filename defined by the user for the summary
+    :param layer_settings: settings for the Navigator layer
+    :return: returns None when something went wrong
+    """
+    from shared_attack_data import attack_data_pool
+
+    file_type, regex_file_type = MULTI_DOMAIN_MODES[mode]
+    domain_files = {}
+    for filename in _get_administration_files(paths, regex_file_type):
+        if not check_file(filename, file_type, health_is_called):
+            print('[!] Skipped: ' + filename)
+            continue
+        yaml_content = load_yaml_file(filename)
+        domain = 'enterprise-attack' if 'domain' not in yaml_content.keys() else yaml_content['domain']
+        domain_files.setdefault(domain, []).append(filename)
+    if not domain_files:
+        print('[!] No ' + file_type.replace('-', ' ') + ' YAML files found.')
+        return None
+
+    domains = sorted(domain_files.keys(), key=DETTECT_DOMAIN_SUPPORT.index)
+    with attack_data_pool([DOMAIN_DATA_TYPES[d] for d in domains], max_workers=len(domains)) as executor:
+        futures = [executor.submit(_generate_domain_layers, d, domain_files[d], mode, layer_settings) for d in domains]
+        results = [f.result() for f in futures]
+
+    # the combined summary: per domain the coverage of all files together, and the coverage per file
+    summary = {'mode': mode, 'domains': {}}
+    print('\n{:<20}{:<56}{:>12}'.format('Domain', 'File', 'Coverage'))
+    print('-' * 88)
+    for domain, files in zip(domains, results):
+        covered = set()
+        for f in files:
+            covered.update(f.pop('covered'))
+            # the layers are written by the workers, but are outputs of this run as well
+            file_output.written_files.extend(f['layers'])
+            print('{:<20}{:<56}{:>11}%'.format(domain, os.path.basename(f['file'])[:55], f['coverage']))
+        technique_count = files[0]['techniques']
+        summary['domains'][domain] = {'covered_techniques': len(covered), 'techniques': technique_count,
+                                      'coverage': round(len(covered) / technique_count * 100, 1) if technique_count else 0,
+                                      'files': files}
+        print('{:<20}{:<56}{:>11}%'.format(domain, '(all files)', summary['domains'][domain]['coverage']))
+    print('')
+
+    if not output_filename:
+        output_filename = create_output_filename(mode, 'multi_domain_summary')
+    elif output_filename.endswith('.json'):
+        output_filename = output_filename.replace('.json', '')
+    write_file(output_filename, simplejson.dumps(summary, indent=4))
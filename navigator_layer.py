@@ -50,36 +50,24 @@ def determine_and_set_show_sub_techniques(techniques_layer):
     :param techniques_layer: dict with items for the Navigator layer file
     :return:
     """
+    techniques = set(t['techniqueID'] for t in techniques_layer if len(t['techniqueID']) == 5)
+    parents_of_sub_techniques = set(t['techniqueID'][:5] for t in techniques_layer if len(t['techniqueID']) == 9)
+
     # determine if technique needs to be collapsed to show sub-techniques
     # show subtechniques when technique contains subtechniques:
     for t in techniques_layer:
         if len(t['techniqueID']) == 5:
-            show_sub_techniques = False
-            for subtech in techniques_layer:
-                if len(subtech['techniqueID']) == 9:
-                    if t['techniqueID'] in subtech['techniqueID']:
-                        show_sub_techniques = True
-                        break
-            t['showSubtechniques'] = show_sub_techniques
+            t['showSubtechniques'] = t['techniqueID'] in parents_of_sub_techniques
     # add technique with showSubtechnique attribute, when sub-technique is present and technique isn't:
     techniques_to_add = {}
     for subtech in techniques_layer:
         if len(subtech['techniqueID']) == 9:
-            technique_present = False
-            # Is technique already added:
-            if subtech['techniqueID'][:5] in techniques_to_add.keys():
-                technique_present = True
-            # Is technique already in the techniques_layer:
-            else:
-                for t in techniques_layer:
-                    if len(t['techniqueID']) == 5:
-                        if t['techniqueID'] in subtech['techniqueID']:
-                            technique_present = True
-            if not technique_present:
+            tech_id = subtech['techniqueID'][:5]
+            if tech_id not in techniques and tech_id not in techniques_to_add:
                 new_tech = dict()
-                new_tech['techniqueID'] = subtech['techniqueID'][:5]
+                new_tech['techniqueID'] = tech_id
                 new_tech['showSubtechniques'] = True
-                techniques_to_add[new_tech['techniqueID']] = new_tech
+                techniques_to_add[tech_id] = new_tech
     techniques_layer.extend(list(techniques_to_add.values()))
 
 
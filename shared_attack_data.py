@@ -0,0 +1,60 @@
+import pickle
+from contextlib import contextmanager
+from datetime import datetime as dt
+from multiprocessing import shared_memory
+import generic
+
+
+def publish_attack_data(data_types):
+    """
+    Load the ATT&CK data of the provided data types once and publish it into a shared memory block, from which the
+    workers of a process pool can attach to it (see 'attach_attack_data').
+    :param data_types: list with the desired data types, see DATATYPE_XX constants.
+    :return: SharedMemory object, to be closed and unlinked by the caller
+    """
+    attack_data = {data_type: generic.load_attack_data(data_type) for data_type in data_types}
+    data = pickle.dumps(attack_data, protocol=pickle.HIGHEST_PROTOCOL)
+
+    shm = shared_memory.SharedMemory(create=True, size=len(data))
+    shm.buf[:len(data)] = data
+    return shm
+
+
+def attach_attack_data(name):
+    """
+    Attach to the ATT&CK data published by 'publish_attack_data' and keep it in memory, so 'load_attack_data' does
+    not load the ATT&CK data from the cache (or the TAXII server) within this process. Used as the initializer of the
+    pool's worker processes.
+    :param name: name of the shared memory block
+    :return:
+    """
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        # the objects are read straight from the shared memory block, without copying the block itself
+        attack_data = pickle.loads(shm.buf)
+    finally:
+        shm.close()
+
+    generic.keep_attack_data_in_memory = True
+    for data_type, data in attack_data.items():
+        generic._attack_data_in_memory[data_type] = (data, dt.now())
+
+
+@contextmanager
+def attack_data_pool(data_types, max_workers=None):
+    """
+    Process pool of which the workers get the ATT&CK data of the provided data types from shared memory, instead of
+    each worker loading it from the cache.
+    :param data_types: list with the data types used by the workers, see DATATYPE_XX constants.
+    :param max_workers: the number of worker processes (default is the number of CPU cores)
+    :return: ProcessPoolExecutor
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    shm = publish_attack_data(data_types)
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=attach_attack_data, initargs=(shm.name,)) as executor:
+            yield executor
+    finally:
+        shm.close()
+        shm.unlink()
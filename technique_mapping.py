@@ -3,6 +3,7 @@ import xlsxwriter
 from datetime import datetime
 from generic import *
 from file_output import *
+from instrumentation import phase
 from navigator_layer import *
 # Imports for pandas and plotly are because of performance reasons in the function that uses these libraries.
 
@@ -38,7 +39,8 @@ def _write_layer(layer, mapped_techniques, filename_prefix, name, output_filenam
     :return:
     """
     layer['techniques'] = mapped_techniques
-    json_string = simplejson.dumps(layer).replace('}, ', '},\n')
+    with phase(PHASE_LAYER_SERIALIZATION):
+        json_string = simplejson.dumps(layer).replace('}, ', '},\n')
     if not output_filename:
         output_filename = create_output_filename(filename_prefix, name)
     else:
@@ -49,6 +51,7 @@ def _write_layer(layer, mapped_techniques, filename_prefix, name, output_filenam
     write_file(output_filename, json_string)
 
 
+@phase(PHASE_MAPPING)
 def _map_and_colorize_techniques_for_detections(my_techniques, domain):
     """
     Determine the color of the techniques based on the detection score in the given YAML file. Also, it will create
@@ -108,6 +111,7 @@ def _map_and_colorize_techniques_for_detections(my_techniques, domain):
     return mapped_techniques
 
 
+@phase(PHASE_MAPPING)
 def _map_and_colorize_techniques_for_visibility(my_techniques, platforms, domain):
     """
     Determine the color of the techniques based on the visibility score in the given YAML file.
@@ -192,6 +196,7 @@ def _map_and_colorize_techniques_for_visibility(my_techniques, platforms, domain
     return mapped_techniques
 
 
+@phase(PHASE_MAPPING)
 def _map_and_colorize_techniques_for_overlaid(my_techniques, platforms, domain):
     """
     Determine the color of the techniques based on both detection and visibility.
@@ -1,6 +1,7 @@
 from copy import deepcopy
 from constants import *
-from file_output import backup_file
+from file_output import backup_file, atomic_open
+from instrumentation import phase
 
 
 def _create_upgrade_text(file_type, file_version):
@@ -32,7 +33,7 @@ def _upgrade_data_source_yaml_10_to_11(file_lines):
     :param file_lines: array containing the lines within the data source admin. file
     :return: array with new lines to be written to disk
     """
-    from generic import ask_yes_no, fix_date_and_remove_null, init_yaml, get_platform_from_yaml
+    from generic import ask_yes_no, get_yaml_lines, init_yaml, get_platform_from_yaml
 
     # we will first do a health check on the data source admin file version 1.0. Having health issues in the file could
     # result in an upgraded file with errors.
@@ -91,9 +92,7 @@ Default = " + yaml_file['name'] + "\n\n >>   (Press Enter to use the default): "
             'data_source': [ds_details_obj]
         })
 
-    # remove the single quotes around the date
-    new_lines = fix_date_and_remove_null(yaml_file_new, '', input_type='ruamel')
-    return new_lines
+    return get_yaml_lines(yaml_file_new)
 
 
 def _check_yaml_file_health_v10(file_lines):
@@ -171,6 +170,7 @@ def _check_yaml_file_health_v10(file_lines):
         return True
 
 
+@phase(PHASE_UPGRADE_CHECK)
 def upgrade_yaml_file(filename, file_type, file_version):
     """
     Main function to upgrade the YAML file to a new version
@@ -212,7 +212,7 @@ def upgrade_yaml_file(filename, file_type, file_version):
 
     if is_upgraded:
         # write the upgraded file to disk
-        with open(filename, 'w') as f:
+        with atomic_open(filename) as f:
             f.writelines(file_new_lines)
             print('Written upgraded file: ' + filename)
 